@@ -49,9 +49,14 @@ setup(
         'PyPDF2',
     ],
 
+    extras_require={
+        'pymupdf': ['PyMuPDF'],
+    },
+
     entry_points={
         'console_scripts': [
             'aoikpdfbookmark=aoikpdfbookmark.aoikpdfbookmark:main',
+            'aoikpdfbookmark-benchmark=aoikpdfbookmark.benchmark:main',
         ],
     },
 )
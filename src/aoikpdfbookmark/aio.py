@@ -0,0 +1,642 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import asyncio
+import multiprocessing
+import pickle
+import queue
+import sys
+import traceback
+
+from .api import Extractor
+from .decryption import open_decrypted_pdf
+
+
+# Message kind of a page's bookmark lines
+_MSG_PAGE = 'page'
+
+# Message kind of job success
+_MSG_DONE = 'done'
+
+# Message kind of job error
+_MSG_ERROR = 'error'
+
+# Seconds to wait for a terminated worker to exit before killing it
+_TERMINATE_TIMEOUT = 1.0
+
+
+#
+def _put_error(msg_queue):
+    """
+    Put current exception into message queue. The exception is sent as is
+    if picklable, otherwise as RuntimeError with the traceback text.
+
+    @param msg_queue: Message queue.
+
+    @return: None.
+    """
+    # Get exception info
+    exc = sys.exc_info()[1]
+
+    #
+    try:
+        # Test whether the exception is picklable
+        pickle.loads(pickle.dumps(exc))
+    # If the exception is not picklable
+    except Exception:
+        # Use RuntimeError with the traceback text
+        exc = RuntimeError(traceback.format_exc())
+
+    # Put the error message
+    msg_queue.put((_MSG_ERROR, exc))
+
+
+#
+def _extract_job(extractor, msg_queue, input_file_path, config, password):
+    """
+    Job function that extracts bookmark lines, and puts each page's bookmark
+    lines into message queue as the page is completed.
+
+    @param extractor: Extractor object of the worker process.
+
+    @param msg_queue: Bounded message queue. Putting blocks while it is
+    full, so a slow consumer pauses the worker.
+
+    @param input_file_path: Input PDF file path.
+
+    @param config: ExtractConfig object.
+
+    @param password: Input PDF file's password.
+
+    @return: None.
+    """
+    # Number of bookmark lines sent, in a list so the function below sees
+    # changes
+    sent_count_s = [0]
+
+    # Create a function that sends new bookmark lines after each page
+    def page_done_func(page_num, bookmark_line_s):
+        # Put the page's bookmark lines
+        msg_queue.put(
+            (_MSG_PAGE, (page_num, bookmark_line_s[sent_count_s[0]:])))
+
+        # Store number of bookmark lines sent
+        sent_count_s[0] = len(bookmark_line_s)
+
+    # Open input file
+    with open(input_file_path, 'rb') as input_file:
+        # Get decrypted copy if the input file is encrypted
+        input_file = open_decrypted_pdf(input_file, password=password)
+
+        # Extract bookmark lines
+        extractor.extract(input_file, config, page_done_func=page_done_func)
+
+
+#
+def _write_job(
+    extractor,
+    msg_queue,
+    input_file_path,
+    output_file_path,
+    bookmark_lines,
+    config,
+    password,
+):
+    """
+    Job function that writes a PDF file with bookmarks.
+
+    @param extractor: Extractor object of the worker process.
+
+    @param msg_queue: Message queue.
+
+    @param input_file_path: Input PDF file path.
+
+    @param output_file_path: Output PDF file path.
+
+    @param bookmark_lines: A list of bookmark lines.
+
+    @param config: WriteConfig object.
+
+    @param password: Input PDF file's password.
+
+    @return: None.
+    """
+    # Open input file
+    with open(input_file_path, 'rb') as input_file:
+        # Get decrypted copy if the input file is encrypted
+        input_file = open_decrypted_pdf(input_file, password=password)
+
+        # Open output file
+        with open(output_file_path, 'wb') as output_file:
+            # Write output file with bookmarks
+            extractor.write(
+                input_file, output_file, bookmark_lines, config=config)
+
+
+#
+def _worker_main(job_queue, msg_queue):
+    """
+    Worker process function that runs jobs from job queue one at a time,
+    until it gets None. Jobs share one extractor, so font objects stay warm
+    across jobs.
+
+    @param job_queue: Job queue. Each job is a (job function, arguments)
+    tuple.
+
+    @param msg_queue: Bounded message queue of the job being run. Each job
+    ends with a final message.
+
+    @return: None.
+    """
+    # Create extractor shared by jobs
+    extractor = Extractor()
+
+    # For each job
+    while True:
+        # Get a job
+        job = job_queue.get()
+
+        # If told to stop
+        if job is None:
+            # Stop
+            break
+
+        # Get job function and arguments
+        job_func, args = job
+
+        #
+        try:
+            # Run the job
+            job_func(extractor, msg_queue, *args)
+
+            # Put the success message
+            msg_queue.put((_MSG_DONE, None))
+        # If have error
+        except BaseException:
+            # Put the error message
+            _put_error(msg_queue)
+
+
+#
+class _Worker(object):
+    """
+    A long-lived worker process with its job queue and bounded message
+    queue.
+    """
+
+    def __init__(self, mp_context, queue_size):
+        """
+        Initialize object, start the worker process.
+
+        @param mp_context: multiprocessing context.
+
+        @param queue_size: Max number of messages the worker can send ahead
+        of the consumer.
+
+        @return: None.
+        """
+        # Job queue
+        self.job_queue = mp_context.Queue()
+
+        # Bounded message queue
+        self.msg_queue = mp_context.Queue(maxsize=queue_size)
+
+        # Worker process
+        self.process = mp_context.Process(
+            target=_worker_main, args=(self.job_queue, self.msg_queue))
+
+        # Kill the worker if this process exits
+        self.process.daemon = True
+
+        # Start the worker
+        self.process.start()
+
+    def stop(self, terminate=False):
+        """
+        Stop the worker process.
+
+        @param terminate: Whether terminate the worker, e.g. while it runs a
+        job. Otherwise it is told to stop after its current job. A worker
+        not exiting in time after being terminated is killed.
+
+        @return: None.
+        """
+        # If terminating
+        if terminate:
+            # Do not wait for queued jobs to be flushed to the dead worker
+            self.job_queue.cancel_join_thread()
+
+            # If the worker is running
+            if self.process.is_alive():
+                # Stop the worker
+                self.process.terminate()
+
+                # Wait for the worker to exit
+                self.process.join(_TERMINATE_TIMEOUT)
+
+                # If the worker is still running
+                if self.process.is_alive():
+                    # Kill the worker
+                    self.process.kill()
+        # If not terminating
+        else:
+            # Tell the worker to stop
+            self.job_queue.put(None)
+
+        # Wait for the worker to exit
+        self.process.join()
+
+
+#
+class AsyncBookmarkService(object):
+    """
+    Runs CPU-heavy extraction and writing in worker processes for asyncio
+    code. Requires Python 3.7+.
+
+    Worker processes are long-lived and take jobs one at a time, so
+    extractors and their font caches stay warm across calls. At most
+    "max_workers" workers exist at once across all calls. Each worker sends
+    its job's results through a bounded queue, so a slow consumer pauses the
+    worker instead of buffering without limit. Cancelling a call, or closing
+    an "iter_pages" generator early, terminates its worker, which is
+    replaced on demand. Call "close" to stop idle workers.
+
+    Configs and bookmark generating functions are sent to worker processes,
+    so they must be picklable, e.g. use "bookmarks_uri" or a module-level
+    function as handler. Config's diagnostics log is not used in workers.
+    """
+
+    def __init__(
+        self,
+        max_workers=None,
+        queue_size=64,
+        poll_interval=0.05,
+        mp_context=None,
+    ):
+        """
+        Initialize object.
+
+        @param max_workers: Max number of worker processes existing at once.
+        None means number of CPUs.
+
+        @param queue_size: Max number of messages a worker can send ahead of
+        the consumer.
+
+        @param poll_interval: Seconds to wait for a message before checking
+        whether the worker is alive.
+
+        @param mp_context: multiprocessing context used to start workers.
+        None means the default context.
+
+        @return: None.
+        """
+        # Max number of worker processes existing at once
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+
+        # Max number of messages a worker can send ahead
+        self.queue_size = queue_size
+
+        # Seconds to wait for a message
+        self.poll_interval = poll_interval
+
+        # multiprocessing context
+        self.mp_context = mp_context or multiprocessing
+
+        # Semaphore that limits running jobs. Created in the event loop on
+        # first use.
+        self._semaphore = None
+
+        # A list of idle workers
+        self._idle_worker_s = []
+
+    def _get_semaphore(self):
+        """
+        Get the semaphore that limits running jobs.
+
+        @return: asyncio.Semaphore object.
+        """
+        # If the semaphore is not created
+        if self._semaphore is None:
+            # Create the semaphore
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        # Return the semaphore
+        return self._semaphore
+
+    def _get_message(self, msg_queue, process):
+        """
+        Get a message from a worker, waiting up to the poll interval. Run in
+        a thread.
+
+        @param msg_queue: Message queue.
+
+        @param process: Worker process.
+
+        @return: A (kind, value) tuple, or None if no message yet.
+        """
+        #
+        try:
+            # Get a message
+            return msg_queue.get(timeout=self.poll_interval)
+        # If no message yet
+        except queue.Empty:
+            # If the worker exited without sending a final message
+            if not process.is_alive() and msg_queue.empty():
+                # Return error message
+                return (_MSG_ERROR, RuntimeError(
+                    'Error: Worker process exited with code {}.'.format(
+                        process.exitcode)))
+
+            # Return no message
+            return None
+
+    async def _stop_worker(self, worker):
+        """
+        Terminate a worker in a thread, so waiting for it to exit does not
+        block the event loop.
+
+        @param worker: _Worker object.
+
+        @return: None.
+        """
+        # Get event loop
+        loop = asyncio.get_running_loop()
+
+        # Terminate the worker and wait for it to exit
+        await loop.run_in_executor(None, worker.stop, True)
+
+    async def _get_worker(self):
+        """
+        Get an idle worker, or start a new one.
+
+        @return: _Worker object.
+        """
+        # While have idle workers
+        while self._idle_worker_s:
+            # Get an idle worker
+            worker = self._idle_worker_s.pop()
+
+            # If the worker is alive
+            if worker.process.is_alive():
+                # Return the worker
+                return worker
+
+            # Clean up the dead worker
+            await self._stop_worker(worker)
+
+        # Start a new worker
+        return _Worker(self.mp_context, self.queue_size)
+
+    async def _run_job(self, job_func, args):
+        """
+        Run a job in a worker process, and yield its messages.
+
+        @param job_func: Job function. Its first arguments are the worker's
+        extractor and message queue.
+
+        @param args: Job function's other arguments.
+
+        @return: An async generator of (kind, value) messages. It ends after
+        the final message.
+        """
+        # Get event loop
+        loop = asyncio.get_running_loop()
+
+        # Wait for a free worker slot
+        async with self._get_semaphore():
+            # Get a worker
+            worker = await self._get_worker()
+
+            # Whether the job's final message is received
+            job_is_done = False
+
+            #
+            try:
+                # Give the job to the worker
+                worker.job_queue.put((job_func, tuple(args)))
+
+                # For each message
+                while True:
+                    # Get a message without blocking the event loop
+                    message = await loop.run_in_executor(
+                        None,
+                        self._get_message,
+                        worker.msg_queue,
+                        worker.process,
+                    )
+
+                    # If no message yet
+                    if message is None:
+                        # Wait again
+                        continue
+
+                    # Whether the message is final. Set before yielding, as
+                    # the consumer may stop at an error message.
+                    job_is_done = message[0] != _MSG_PAGE
+
+                    # Yield the message
+                    yield message
+
+                    # If the message is final
+                    if job_is_done:
+                        # Stop
+                        break
+            finally:
+                # If the job is done and the worker is alive
+                if job_is_done and worker.process.is_alive():
+                    # Keep the worker for later jobs
+                    self._idle_worker_s.append(worker)
+                # If the job is not done, e.g. the call is cancelled, or the
+                # worker has died
+                else:
+                    # Stop the worker
+                    await self._stop_worker(worker)
+
+    def close(self):
+        """
+        Stop idle worker processes. Workers running jobs are not affected.
+        Workers are started again on demand if the service is used after
+        closing.
+
+        @return: None.
+        """
+        # While have idle workers
+        while self._idle_worker_s:
+            # Stop an idle worker
+            self._idle_worker_s.pop().stop()
+
+    async def iter_pages(self, input_file_path, config, password=None):
+        """
+        Extract bookmark lines in a worker process, yielding each page's
+        bookmark lines as the page is completed.
+
+        @param input_file_path: Input PDF file path.
+
+        @param config: ExtractConfig object.
+
+        @param password: Input PDF file's password.
+
+        @return: An async generator of (page number, list of bookmark lines)
+        tuples.
+        """
+        # Get worker messages generator
+        message_iter = self._run_job(
+            _extract_job, (input_file_path, config, password))
+
+        #
+        try:
+            # For each message from the worker
+            async for kind, value in message_iter:
+                # If the message is an error
+                if kind == _MSG_ERROR:
+                    # Raise the error
+                    raise value
+
+                # If the message is a page's bookmark lines
+                if kind == _MSG_PAGE:
+                    # Yield the page's bookmark lines
+                    yield value
+        finally:
+            # Stop the worker now if it is still running, e.g. the consumer
+            # stopped early, instead of when the generator is collected
+            await message_iter.aclose()
+
+    async def extract_bookmarks(self, input_file_path, config, password=None):
+        """
+        Extract bookmark lines in a worker process.
+
+        @param input_file_path: Input PDF file path.
+
+        @param config: ExtractConfig object.
+
+        @param password: Input PDF file's password.
+
+        @return: A list of bookmark lines.
+        """
+        # A list of bookmark lines
+        bookmark_line_s = []
+
+        # For each page's bookmark lines
+        async for _, page_line_s in self.iter_pages(
+            input_file_path, config, password=password
+        ):
+            # Add the page's bookmark lines
+            bookmark_line_s.extend(page_line_s)
+
+        # Return bookmark lines
+        return bookmark_line_s
+
+    async def write_with_bookmarks(
+        self,
+        input_file_path,
+        output_file_path,
+        bookmark_lines,
+        config=None,
+        password=None,
+    ):
+        """
+        Write a copy of a PDF file with bookmarks in a worker process.
+
+        @param input_file_path: Input PDF file path.
+
+        @param output_file_path: Output PDF file path.
+
+        @param bookmark_lines: A list of bookmark lines.
+
+        @param config: WriteConfig object. None means default.
+
+        @param password: Input PDF file's password.
+
+        @return: None.
+        """
+        # Get worker messages generator
+        message_iter = self._run_job(
+            _write_job,
+            (
+                input_file_path,
+                output_file_path,
+                list(bookmark_lines),
+                config,
+                password,
+            ),
+        )
+
+        #
+        try:
+            # For each message from the worker
+            async for kind, value in message_iter:
+                # If the message is an error
+                if kind == _MSG_ERROR:
+                    # Raise the error
+                    raise value
+        finally:
+            # Stop the worker now if it is still running
+            await message_iter.aclose()
+
+
+# Service used by module-level functions. Created on first use.
+_DEFAULT_SERVICE = None
+
+
+#
+def get_default_service():
+    """
+    Get the service used by module-level functions, with default limits.
+
+    @return: AsyncBookmarkService object.
+    """
+    global _DEFAULT_SERVICE
+
+    # If the service is not created
+    if _DEFAULT_SERVICE is None:
+        # Create the service
+        _DEFAULT_SERVICE = AsyncBookmarkService()
+
+    # Return the service
+    return _DEFAULT_SERVICE
+
+
+#
+async def extract_bookmarks(
+    input_file_path,
+    config,
+    password=None,
+    service=None,
+):
+    """
+    Extract bookmark lines in a worker process. See
+    "AsyncBookmarkService.extract_bookmarks".
+
+    @param service: AsyncBookmarkService object. None means the default
+    service.
+    """
+    # Return bookmark lines
+    return await (service or get_default_service()).extract_bookmarks(
+        input_file_path, config, password=password)
+
+
+#
+async def write_with_bookmarks(
+    input_file_path,
+    output_file_path,
+    bookmark_lines,
+    config=None,
+    password=None,
+    service=None,
+):
+    """
+    Write a copy of a PDF file with bookmarks in a worker process. See
+    "AsyncBookmarkService.write_with_bookmarks".
+
+    @param service: AsyncBookmarkService object. None means the default
+    service.
+    """
+    # Write the file
+    await (service or get_default_service()).write_with_bookmarks(
+        input_file_path,
+        output_file_path,
+        bookmark_lines,
+        config=config,
+        password=password,
+    )
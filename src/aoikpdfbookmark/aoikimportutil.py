@@ -4,18 +4,27 @@ File ID: 3ngd7IH
 """
 from __future__ import absolute_import
 
+import hashlib
 import imp
+import json
+import marshal
+import os
 import os.path
 import sys
+import tempfile
 
 
 try:
+    from urllib.error import HTTPError ## Py3
+    from urllib.request import Request ## Py3
     from urllib.request import urlopen ## Py3
 except ImportError:
+    from urllib2 import HTTPError ## Py2
+    from urllib2 import Request ## Py2
     from urllib2 import urlopen ## Py2
 
 #/
-__version__ = '0.2.3'
+__version__ = '0.3.0'
 
 #/ define |exec_| and |raise_| that are 2*3 compatible.
 ##
@@ -108,6 +117,7 @@ def add_to_sys_modules(mod_name, mod_obj=None):
 def import_module_by_code(mod_code, mod_name, sys_add=True, sys_use=True):
     """Create a module object by code.
     @param mod_code: the code that the module contains.
+    Can be a code object from func |compile_code_cached|.
 
     @param mod_name: module name.
 
@@ -308,7 +318,17 @@ def import_module_by_name(mod_name,
     return mod_obj
 
 #/
-def import_module_by_path(mod_path, mod_name, sys_add=True, sys_use=True):
+## A dict that maps (module name, module file absolute path) to (code hash,
+##  module object), for modules loaded by func |import_module_by_path| with
+##  arg |reuse| on.
+_PATH_MOD_INFO_S = {}
+
+#/
+def import_module_by_path(mod_path, mod_name, sys_add=True, sys_use=True,
+    bytecode_cache=True,
+    cache_dir=None,
+    reuse=False,
+    ):
     """Import a module by module file path.
 
     @param mod_path: module file path.
@@ -318,11 +338,77 @@ def import_module_by_path(mod_path, mod_name, sys_add=True, sys_use=True):
     @param sys_use: see func |import_module_by_code|'s same name arg.
 
     @param sys_add: see func |import_module_by_code|'s same name arg.
+
+    @param bytecode_cache: whether cache compiled bytecode, keyed by hash of
+     the module code. See func |compile_code_cached|.
+
+    @param cache_dir: bytecode cache dir.
+    If None, use the |__pycache__| dir beside the module file.
+    Python's own bytecode file of the module is not touched, because the
+     module is imported under arbitrary name.
+
+    @param reuse: whether reuse the module object loaded before by this func
+     from the same path as the same name, if the module code is unchanged.
+    If the module code is changed, the module is executed again, regardless
+     of |sys_use|.
     """
     #/
-    mod_code = open(mod_path).read()
+    with open(mod_path, 'rb') as mod_file:
+        mod_code = mod_file.read()
     ## raise error
 
+    #/
+    code_hash = get_code_hash(mod_code, mod_path)
+
+    #/
+    mod_key = (mod_name, os.path.abspath(mod_path))
+
+    #/
+    if reuse:
+        #/
+        mod_info = _PATH_MOD_INFO_S.get(mod_key, None)
+
+        #/
+        if mod_info is not None and mod_info[0] == code_hash:
+            #/
+            mod_obj = mod_info[1]
+
+            #/
+            if sys_add:
+                add_to_sys_modules(mod_name=mod_name, mod_obj=mod_obj)
+
+            #/
+            return mod_obj
+
+        #/ code changed or not loaded before, execute the module.
+        sys_use = False
+
+    #/
+    if bytecode_cache:
+        #/
+        if cache_dir is None:
+            cache_dir = os.path.join(
+                os.path.dirname(os.path.abspath(mod_path)), '__pycache__')
+
+        #/ e.g. |hello.aoikimportutil.cpython-36.pyc|.
+        ## The name differs from Python's own |hello.cpython-36.pyc|.
+        cache_name = os.path.splitext(os.path.basename(mod_path))[0] \
+            + '.aoikimportutil'
+
+        #/
+        mod_code = compile_code_cached(
+            mod_code,
+            file_name=mod_path,
+            cache_dir=cache_dir,
+            cache_name=cache_name,
+            code_hash=code_hash,
+        )
+        ## raise error
+    else:
+        #/
+        mod_code = compile(mod_code, mod_path, 'exec')
+        ## raise error
+
     #/
     mod_obj = import_module_by_code(
         mod_code=mod_code,
@@ -335,11 +421,267 @@ def import_module_by_path(mod_path, mod_name, sys_add=True, sys_use=True):
     #/
     mod_obj.__file__ = mod_path
 
+    #/
+    if reuse:
+        _PATH_MOD_INFO_S[mod_key] = (code_hash, mod_obj)
+
     #/
     return mod_obj
 
 #/
-def import_module_by_http(uri, mod_name, sys_use=True, sys_add=True):
+def write_file_atomic(file_path, data):
+    """Write data to a file atomically, so that concurrent processes never
+     read a partially written file.
+
+    @param file_path: file path.
+
+    @param data: bytes to write.
+    """
+    #/
+    dir_path = os.path.dirname(file_path)
+
+    #/
+    if not os.path.isdir(dir_path):
+        try:
+            os.makedirs(dir_path)
+        except OSError:
+            ## created by another process
+            pass
+
+    #/
+    fd, tmp_path = tempfile.mkstemp(dir=dir_path, suffix='.tmp')
+
+    try:
+        #/
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+
+        #/ |os.replace| overwrites existing file on Windows too.
+        getattr(os, 'replace', os.rename)(tmp_path, file_path)
+    except Exception:
+        #/
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+        #/
+        raise
+
+#/
+def get_bytecode_cache_tag():
+    """Get the tag of the running Python's bytecode format, used in cached
+     bytecode file names. E.g. |cpython-36|.
+    """
+    #/
+    cache_tag = getattr(getattr(sys, 'implementation', None), 'cache_tag', None)
+
+    #/ Py2
+    if not cache_tag:
+        cache_tag = 'py%s%s' % sys.version_info[:2]
+
+    #/
+    return cache_tag
+
+#/
+def get_code_hash(mod_code, file_name):
+    """Get hash of module code, used as key of cached bytecode.
+
+    @param mod_code: module code, str or bytes.
+
+    @param file_name: file name shown in tracebacks.
+    The file name is stored in the code object, so is part of the key.
+    """
+    #/
+    if isinstance(mod_code, bytes):
+        mod_code_bytes = mod_code
+    else:
+        mod_code_bytes = mod_code.encode('utf-8')
+
+    #/
+    hash_obj = hashlib.sha1(mod_code_bytes)
+
+    hash_obj.update(b'\0' + file_name.encode('utf-8'))
+
+    #/
+    return hash_obj.digest()
+
+#/
+def compile_code_cached(mod_code, file_name, cache_dir=None, cache_name=None,
+    code_hash=None,
+    ):
+    """Compile module code into a code object, using a bytecode cache keyed by
+     hash of the code.
+
+    A cached bytecode file starts with the interpreter's magic number and the
+     code hash, so a stale or foreign file is never used.
+
+    @param mod_code: module code, str or bytes.
+
+    @param file_name: file name shown in tracebacks.
+
+    @param cache_dir: bytecode cache dir.
+    If None, compile without cache.
+
+    @param cache_name: cached bytecode file's name, without the interpreter's
+     cache tag and |.pyc| extension.
+    If None, the code hash is used, so each version of the code has its own
+     file. If given, each version overwrites the file.
+
+    @param code_hash: code hash from func |get_code_hash|.
+    If None, computed.
+    """
+    #/
+    if cache_dir is None:
+        return compile(mod_code, file_name, 'exec')
+
+    #/
+    if code_hash is None:
+        code_hash = get_code_hash(mod_code, file_name)
+
+    #/
+    if cache_name is None:
+        cache_name = hashlib.sha1(code_hash).hexdigest()
+
+    #/
+    code_file_path = os.path.join(
+        cache_dir,
+        '%s.%s.pyc' % (cache_name, get_bytecode_cache_tag()),
+    )
+
+    #/
+    header = imp.get_magic() + code_hash
+
+    #/
+    try:
+        with open(code_file_path, 'rb') as code_file:
+            data = code_file.read()
+    except (IOError, OSError):
+        data = None
+
+    #/
+    if data is not None and data.startswith(header):
+        try:
+            return marshal.loads(data[len(header):])
+        except (ValueError, EOFError, TypeError):
+            ## corrupted, compile again below
+            pass
+
+    #/
+    code_obj = compile(mod_code, file_name, 'exec')
+    ## raise error
+
+    #/
+    try:
+        write_file_atomic(code_file_path, header + marshal.dumps(code_obj))
+    except (IOError, OSError):
+        ## cache dir not writable, use the code object without caching
+        pass
+
+    #/
+    return code_obj
+
+#/
+def fetch_http_cached(uri, cache_dir, offline=False):
+    """Download a file via HTTP, using an on-disk cache revalidated with
+     |ETag| and |Last-Modified|.
+
+    A cached file is revalidated by sending |If-None-Match| and
+     |If-Modified-Since| headers. A |304 Not Modified| response means the
+     cached file is used without downloading again.
+
+    @param uri: HTTP URI of the file.
+
+    @param cache_dir: cache dir.
+
+    @param offline: whether use the cached file without network access.
+    If on and the file is not cached, raise |IOError|.
+
+    Return a tuple of (file data, whether the data is from cache).
+    """
+    #/
+    entry_name = hashlib.sha1(uri.encode('utf-8')).hexdigest()
+
+    data_file_path = os.path.join(cache_dir, entry_name + '.data')
+
+    meta_file_path = os.path.join(cache_dir, entry_name + '.json')
+
+    #/
+    try:
+        with open(meta_file_path, 'rb') as meta_file:
+            meta = json.loads(meta_file.read().decode('utf-8'))
+
+        with open(data_file_path, 'rb') as data_file:
+            cached_data = data_file.read()
+    except (IOError, OSError, ValueError):
+        meta = None
+
+        cached_data = None
+
+    #/
+    if offline:
+        #/
+        if cached_data is None:
+            raise IOError('Module is not cached for offline use.\n URI is |%s|' % uri)
+
+        #/
+        return cached_data, True
+
+    #/
+    req = Request(uri)
+
+    #/
+    if cached_data is not None:
+        #/
+        if meta.get('etag'):
+            req.add_header('If-None-Match', meta['etag'])
+
+        #/
+        if meta.get('last_modified'):
+            req.add_header('If-Modified-Since', meta['last_modified'])
+
+    #/
+    try:
+        resp = urlopen(req)
+        ## raise error
+    except HTTPError as e:
+        #/
+        if e.code == 304 and cached_data is not None:
+            return cached_data, True
+
+        #/
+        raise
+
+    #/
+    try:
+        #/
+        data = resp.read()
+        ## raise error
+
+        #/
+        headers = resp.info()
+
+        meta = {
+            'uri': uri,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+        }
+    finally:
+        resp.close()
+
+    #/ write data file first, so that meta file never refers to missing data.
+    write_file_atomic(data_file_path, data)
+
+    write_file_atomic(meta_file_path, json.dumps(meta).encode('utf-8'))
+
+    #/
+    return data, False
+
+#/
+def import_module_by_http(uri, mod_name, sys_use=True, sys_add=True,
+    cache_dir=None,
+    offline=False,
+    ):
     """Download module code via HTTP and create the module object from the code.
 
     @param uri: HTTP URI of the module file.
@@ -349,14 +691,50 @@ def import_module_by_http(uri, mod_name, sys_use=True, sys_add=True):
     @param sys_use: see func |import_module_by_code|'s same name arg.
 
     @param sys_add: see func |import_module_by_code|'s same name arg.
+
+    @param cache_dir: cache dir of downloaded code and compiled bytecode.
+    If None, download and compile every time.
+    See func |fetch_http_cached|.
+
+    @param offline: whether use cached code without network access.
+    Requires |cache_dir|.
     """
-    #/
-    resp = urlopen(uri)
-    ## raise error
+    #/ avoid downloading if an existing module is to be used anyway.
+    if sys_use:
+        mod_obj_old = sys.modules.get(mod_name, None)
+
+        if mod_obj_old is not None:
+            return mod_obj_old
 
     #/
-    mod_code = resp.read()
-    ## raise error
+    if cache_dir is None:
+        #/
+        if offline:
+            raise ValueError('Offline mode requires a cache dir.')
+
+        #/
+        resp = urlopen(uri)
+        ## raise error
+
+        #/
+        mod_code = resp.read()
+        ## raise error
+    else:
+        #/
+        mod_code, _ = fetch_http_cached(
+            uri,
+            cache_dir=os.path.join(cache_dir, 'http'),
+            offline=offline,
+        )
+        ## raise error
+
+        #/
+        mod_code = compile_code_cached(
+            mod_code,
+            file_name=uri,
+            cache_dir=os.path.join(cache_dir, 'bytecode'),
+        )
+        ## raise error
 
     #/
     mod_obj = import_module_by_code(
@@ -468,6 +846,9 @@ def load_obj(
     attr_chain_sep='.',
     retn_mod=False,
     uri_parts=None,
+    bytecode_cache=True,
+    cache_dir=None,
+    reuse=False,
     ):
     """Load an object from a module (specified by module name in Python namespace)
      or from a module file (specified by module file path).
@@ -498,6 +879,15 @@ def load_obj(
     @param attr_chain_sep: see func |load_obj|'s same name arg.
 
     @retn_mod: see func |load_obj|'s same name arg.
+
+    @param bytecode_cache: see func |import_module_by_path|'s same name arg.
+    Only applies when |uri| specifies a module file path.
+
+    @param cache_dir: see func |import_module_by_path|'s same name arg.
+    Only applies when |uri| specifies a module file path.
+
+    @param reuse: see func |import_module_by_path|'s same name arg.
+    Only applies when |uri| specifies a module file path.
     """
     #/
     if uri_parts is None:
@@ -538,6 +928,9 @@ def load_obj(
             mod_name=mod_name,
             sys_use=sys_use,
             sys_add=sys_add,
+            bytecode_cache=bytecode_cache,
+            cache_dir=cache_dir,
+            reuse=reuse,
         )
         ## raise error
 
@@ -574,6 +967,8 @@ def load_obj_http(
     attr_chain_sep='.',
     retn_mod=False,
     uri_parts=None,
+    cache_dir=None,
+    offline=False,
     ):
     """Load an object from a remote module file downloaded via HTTP.
 
@@ -595,6 +990,10 @@ def load_obj_http(
     @param attr_chain_sep: see func |load_obj|'s same name arg.
 
     @retn_mod: see func |load_obj|'s same name arg.
+
+    @param cache_dir: see func |import_module_by_http|'s same name arg.
+
+    @param offline: see func |import_module_by_http|'s same name arg.
     """
     #/
     if uri_parts is None:
@@ -622,6 +1021,8 @@ def load_obj_http(
         mod_name=mod_name,
         sys_use=sys_use,
         sys_add=sys_add,
+        cache_dir=cache_dir,
+        offline=offline,
     )
 
     #/
@@ -656,6 +1057,9 @@ def load_obj_local_or_remote(
     mod_attr_sep='::',
     attr_chain_sep='.',
     retn_mod=False,
+    cache_dir=None,
+    offline=False,
+    reuse=False,
     ):
     """Load an object from local or remote (using HTTP).
 
@@ -679,6 +1083,16 @@ def load_obj_local_or_remote(
     @param attr_chain_sep: see func |load_obj| or |load_obj_http|'s same name arg.
 
     @retn_mod: see func |load_obj| or |load_obj_http|'s same name arg.
+
+    @param cache_dir: see func |load_obj_http|'s same name arg.
+    Only applies to remote loading.
+    Local module files use bytecode cache dir |__pycache__| beside them.
+
+    @param offline: see func |load_obj_http|'s same name arg.
+    Only applies to remote loading.
+
+    @param reuse: see func |load_obj|'s same name arg.
+    Only applies to local loading.
     """
     #/
     uri_parts = uri_split(uri=uri, mod_attr_sep=mod_attr_sep)
@@ -697,6 +1111,7 @@ def load_obj_local_or_remote(
             attr_chain_sep=attr_chain_sep,
             retn_mod=retn_mod,
             uri_parts=uri_parts,
+            reuse=reuse,
         )
     #/
     elif prot in ('http', 'https'):
@@ -710,6 +1125,8 @@ def load_obj_local_or_remote(
             attr_chain_sep=attr_chain_sep,
             retn_mod=retn_mod,
             uri_parts=uri_parts,
+            cache_dir=cache_dir,
+            offline=offline,
         )
     #/
     else:
@@ -0,0 +1,464 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import itertools
+
+from .aoikimportutil import load_obj_local_or_remote
+from .bookmark import parse_bookmarks
+from .decryption import open_decrypted_pdf
+from .diagnostics import NULL_LOG
+from .fontcache import FontCache
+from .linemerge import LineMerger
+from .pdfmaker import copy_pdf_add_bookmarks
+from .pdfparser import parse_pdf
+from .pdfparser import PdfminerBackend
+from .rules import load_rules
+from .rules import RuleSet
+from .runninglines import find_running_lines
+
+
+#
+class ExtractConfig(object):
+    """
+    Configuration of extracting bookmark lines from a PDF file by layout
+    analysis.
+    """
+
+    def __init__(
+        self,
+        bookmarks_uri=None,
+        handler=None,
+        rules_path=None,
+        npages=None,
+        backend=None,
+        running_pages=0,
+        keep_running=False,
+        merge_min_size=None,
+        skip_textless=False,
+        log=None,
+    ):
+        """
+        Initialize object.
+
+        @param bookmarks_uri: Bookmark generating function URI, e.g.
+        "my_gen.py::generate_bookmark". The function's module is loaded for
+        each job under its own name, so jobs do not share module state.
+
+        @param handler: Bookmark generating function. Used instead of
+        "bookmarks_uri" if given. It is shared by jobs using this config.
+
+        @param rules_path: Bookmark rules file path, used instead of
+        "bookmarks_uri" if given. See argument "--rules".
+
+        @param npages: Max number of pages to process. 0 or None means all
+        pages.
+
+        @param backend: Extraction backend name. None means pdfminer.
+
+        @param running_pages: See argument "--running-pages". 0 means not
+        finding running headers and footers.
+
+        @param keep_running: Whether pass running headers and footers to the
+        handler.
+
+        @param merge_min_size: See argument "--merge-lines". None means not
+        merging.
+
+        @param skip_textless: Whether skip layout analysis of pages without
+        text. pdfminer backend only.
+
+        @param log: DiagnosticLog object passed to the handler. None means
+        dropping the handler's diagnostics.
+
+        @return: None.
+        """
+        # If none of generating function URI, function, and rules file path
+        # is given
+        if bookmarks_uri is None and handler is None and rules_path is None:
+            # Raise error
+            raise ValueError(
+                'Error: One of "bookmarks_uri", "handler", and "rules_path" is'
+                ' required.')
+
+        # Bookmark generating function URI
+        self.bookmarks_uri = bookmarks_uri
+
+        # Bookmark generating function
+        self.handler = handler
+
+        # Bookmark rules file path
+        self.rules_path = rules_path
+
+        # Max number of pages to process
+        self.npages = npages
+
+        # Extraction backend name
+        self.backend = backend
+
+        # Max number of pages a non-running line can recur on
+        self.running_pages = running_pages
+
+        # Whether pass running headers and footers to the handler
+        self.keep_running = keep_running
+
+        # Min font size of lines to merge
+        self.merge_min_size = merge_min_size
+
+        # Whether skip layout analysis of pages without text
+        self.skip_textless = skip_textless
+
+        # Diagnostics log
+        self.log = log
+
+
+#
+class WriteConfig(object):
+    """
+    Configuration of writing a PDF file with bookmarks. See function
+    "pdfmaker.copy_pdf_add_bookmarks" for arguments.
+    """
+
+    def __init__(
+        self,
+        npages=None,
+        strict=False,
+        page_mode=None,
+        encrypt_password=None,
+        file_id=None,
+    ):
+        """
+        Initialize object.
+
+        @param npages: Max number of pages to process.
+
+        @param strict: Strict mode that aborts if input PDF file has errors.
+
+        @param page_mode: Output PDF file's page mode character.
+
+        @param encrypt_password: User password to encrypt output file with.
+
+        @param file_id: Output file identifier bytes.
+
+        @return: None.
+        """
+        # Max number of pages to process
+        self.npages = npages
+
+        # Strict mode
+        self.strict = strict
+
+        # Page mode character
+        self.page_mode = page_mode
+
+        # User password to encrypt output file with
+        self.encrypt_password = encrypt_password
+
+        # Output file identifier bytes
+        self.file_id = file_id
+
+
+#
+class Extractor(object):
+    """
+    Long-lived object that runs bookmark jobs, possibly concurrently in
+    threads, sharing warm state: font objects are shared by documents via
+    one font cache.
+
+    Jobs keep all other state to themselves. Each job's bookmark generating
+    module is loaded under its own name without being added to
+    "sys.modules".
+    """
+
+    def __init__(self, font_cache=None):
+        """
+        Initialize object.
+
+        @param font_cache: FontCache object shared by jobs, e.g. returned by
+        "fontcache.install_font_cache" to also use disk caches. None means a
+        new in-memory font cache.
+
+        @return: None.
+        """
+        # Font cache shared by jobs
+        self.font_cache = font_cache \
+            if font_cache is not None else FontCache(None)
+
+        # Job ID counter, used to name generating modules
+        self._job_id_iter = itertools.count(1)
+
+    def load_handler(self, config):
+        """
+        Get the bookmark generating function of a job.
+
+        @param config: ExtractConfig object.
+
+        @return: Bookmark generating function.
+        """
+        # If the function is given
+        if config.handler is not None:
+            # Return the function
+            return config.handler
+
+        # If rules file path is given
+        if config.rules_path is not None:
+            # Load and compile bookmark rules. The compiled rules object is
+            # used as generating function.
+            return load_rules(config.rules_path)
+
+        # Get module name unique to the job
+        mod_name = 'aoikpdfbookmark._bookmark_job{}'.format(
+            next(self._job_id_iter))
+
+        # Load the function from a new module object, without using or
+        # adding to "sys.modules"
+        return load_obj_local_or_remote(
+            config.bookmarks_uri,
+            mod_name=mod_name,
+            sys_use=False,
+            sys_add=False,
+        )
+
+    def extract(self, pdf_file, config, password=None, page_done_func=None):
+        """
+        Extract bookmark lines from a PDF file.
+
+        @param pdf_file: PDF file object.
+
+        @param config: ExtractConfig object.
+
+        @param password: PDF file's password.
+
+        @param page_done_func: A function called after each page is completed,
+        with the page number and the list of bookmark lines so far. See
+        argument "page_done_func" of function "parse_pdf".
+
+        @return: A list of bookmark lines.
+        """
+        # Get bookmark generating function
+        genfunc = self.load_handler(config)
+
+        # A list of bookmark lines
+        bookmark_line_s = []
+
+        # Create a wrapping function to collect bookmark lines
+        def handler(info):
+            # Call the generating function
+            bookmark_line = genfunc(info)
+
+            # If the result is a bookmark line
+            if bookmark_line is not None:
+                # Add the bookmark line to list
+                bookmark_line_s.append(bookmark_line)
+
+            # Return the result
+            return bookmark_line
+
+        # If the generating function is compiled rules
+        if isinstance(genfunc, RuleSet):
+            # Create a page handler that decides all textlines of a page at
+            # once, to collect bookmark lines
+            def page_handler(info_s):
+                # Decide the page's textlines
+                page_bookmark_line_s = genfunc.match_page(info_s)
+
+                # Add the page's bookmark lines to list
+                bookmark_line_s.extend(page_bookmark_line_s)
+
+                # Return the page's bookmark lines
+                return page_bookmark_line_s
+        # If the generating function is not compiled rules
+        else:
+            # Pass textlines to the generating function one by one
+            page_handler = None
+
+        # If finding running lines
+        if config.running_pages:
+            # Find running lines without layout analysis
+            running_line_index = find_running_lines(
+                pdf_file=pdf_file,
+                npages=config.npages,
+                password=password,
+                max_pages=config.running_pages,
+                font_cache=self.font_cache,
+            )
+
+            # Set file seek pointer to beginning
+            pdf_file.seek(0)
+        # If not finding running lines
+        else:
+            # No running lines
+            running_line_index = None
+
+        # If using pdfminer backend
+        if config.backend in (None, PdfminerBackend.name):
+            # Create the backend that uses the shared font cache
+            backend = PdfminerBackend(
+                skip_textless=config.skip_textless,
+                font_cache=self.font_cache,
+            )
+        # If using other backend
+        else:
+            # Use the backend name
+            backend = config.backend
+
+        # Parse the PDF file to generate bookmark lines
+        parse_pdf(
+            pdf_file=pdf_file,
+            handler=handler,
+            npages=config.npages,
+            password=password,
+            running_line_index=running_line_index,
+            drop_running_lines=not config.keep_running,
+            line_merger=LineMerger(min_size=config.merge_min_size)
+            if config.merge_min_size is not None else None,
+            log=config.log or NULL_LOG,
+            backend=backend,
+            page_done_func=None if page_done_func is None
+            else lambda page_num, _: page_done_func(page_num, bookmark_line_s),
+            page_handler=page_handler,
+        )
+
+        # Return bookmark lines
+        return bookmark_line_s
+
+    def write(
+        self,
+        input_file,
+        output_file,
+        bookmark_lines,
+        config=None,
+        password=None,
+    ):
+        """
+        Copy a PDF file into output file, add bookmarks.
+
+        @param input_file: Input PDF file object.
+
+        @param output_file: Output PDF file object.
+
+        @param bookmark_lines: A list of bookmark lines.
+
+        @param config: WriteConfig object. None means default.
+
+        @param password: Input PDF file's password.
+
+        @return: None.
+        """
+        # If config is not given
+        if config is None:
+            # Use default config
+            config = WriteConfig()
+
+        # Copy PDF file, add bookmarks
+        copy_pdf_add_bookmarks(
+            input_file=input_file,
+            output_file=output_file,
+            bookmarks=parse_bookmarks(bookmark_lines, npages=config.npages),
+            npages=config.npages,
+            strict=config.strict,
+            page_mode=config.page_mode,
+            password=password,
+            encrypt_password=config.encrypt_password,
+            file_id=config.file_id,
+        )
+
+    def run(self, job):
+        """
+        Run a bookmark job.
+
+        @param job: BookmarkJob object.
+
+        @return: A list of bookmark lines.
+        """
+        # Open input file
+        with open(job.input_file_path, 'rb') as input_file:
+            # If the input file is encrypted, decrypt it once for both stages
+            input_file = open_decrypted_pdf(input_file, password=job.password)
+
+            # Get bookmark lines given
+            bookmark_line_s = job.bookmark_lines
+
+            # If bookmark lines are not given
+            if bookmark_line_s is None:
+                # Extract bookmark lines
+                bookmark_line_s = self.extract(input_file, job.extract_config)
+
+            # If output file path is given
+            if job.output_file_path is not None:
+                # Set input file seek pointer to beginning
+                input_file.seek(0)
+
+                # Open output file
+                with open(job.output_file_path, 'wb') as output_file:
+                    # Write output file with bookmarks
+                    self.write(
+                        input_file,
+                        output_file,
+                        bookmark_line_s,
+                        config=job.write_config,
+                    )
+
+        # Return bookmark lines
+        return bookmark_line_s
+
+
+#
+class BookmarkJob(object):
+    """
+    A job that extracts bookmarks from a PDF file, and optionally writes a
+    copy of the file with the bookmarks. Run it with "Extractor.run".
+    """
+
+    def __init__(
+        self,
+        input_file_path,
+        output_file_path=None,
+        extract_config=None,
+        write_config=None,
+        bookmark_lines=None,
+        password=None,
+    ):
+        """
+        Initialize object.
+
+        @param input_file_path: Input PDF file path.
+
+        @param output_file_path: Output PDF file path. None means not writing.
+
+        @param extract_config: ExtractConfig object. Required if
+        "bookmark_lines" is not given.
+
+        @param write_config: WriteConfig object. None means default.
+
+        @param bookmark_lines: A list of bookmark lines to use instead of
+        extracting them.
+
+        @param password: Input PDF file's password.
+
+        @return: None.
+        """
+        # If neither extract config nor bookmark lines is given
+        if extract_config is None and bookmark_lines is None:
+            # Raise error
+            raise ValueError(
+                'Error: Either "extract_config" or "bookmark_lines" is'
+                ' required.')
+
+        # Input PDF file path
+        self.input_file_path = input_file_path
+
+        # Output PDF file path
+        self.output_file_path = output_file_path
+
+        # Extract config
+        self.extract_config = extract_config
+
+        # Write config
+        self.write_config = write_config
+
+        # Bookmark lines given
+        self.bookmark_lines = bookmark_lines
+
+        # Input PDF file's password
+        self.password = password
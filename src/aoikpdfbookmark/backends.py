@@ -0,0 +1,607 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from collections import Counter
+
+from .linemerge import get_line_font
+
+
+# A list of registered extraction backend classes, default backend first
+_BACKEND_CLS_S = []
+
+
+#
+class CharRecord(object):
+    """
+    Character record produced by extraction backends other than pdfminer.
+
+    It has the attributes textline handlers use on pdfminer's LTChar items:
+    "fontname", "size", "x0", "y0", "x1", "y1", "matrix" and "get_text".
+    Coordinates are in PDF space, i.e. origin at page bottom-left.
+    """
+
+    __slots__ = ('text', 'fontname', 'size', 'x0', 'y0', 'x1', 'y1', 'matrix')
+
+    def __init__(self, text, fontname, size, bbox, baseline=None):
+        """
+        Initialize object.
+
+        @param text: Character text.
+
+        @param fontname: Font name.
+
+        @param size: Font size.
+
+        @param bbox: A (x0, y0, x1, y1) tuple.
+
+        @param baseline: Baseline's vertical offset. Default is bbox's bottom.
+
+        @return: None.
+        """
+        # Character text
+        self.text = text
+
+        # Font name
+        self.fontname = fontname
+
+        # Font size
+        self.size = size
+
+        # Bounding box
+        self.x0, self.y0, self.x1, self.y1 = bbox
+
+        # Text matrix. Its vertical translation is the baseline, as in LTChar.
+        self.matrix = (
+            size, 0, 0, size,
+            self.x0,
+            baseline if baseline is not None else self.y0,
+        )
+
+    @property
+    def bbox(self):
+        """
+        Bounding box.
+        """
+        return (self.x0, self.y0, self.x1, self.y1)
+
+    def get_text(self):
+        """
+        Get character text.
+
+        @return: Character text.
+        """
+        return self.text
+
+
+#
+class LineRecord(object):
+    """
+    Textline record produced by extraction backends other than pdfminer.
+
+    It has the attributes textline handlers use on pdfminer's LTTextLine
+    items: iterating yields character records, and it has "x0", "y0", "x1",
+    "y1" and "get_text".
+    """
+
+    __slots__ = ('char_s', 'x0', 'y0', 'x1', 'y1')
+
+    def __init__(self, char_s, bbox=None):
+        """
+        Initialize object.
+
+        @param char_s: A list of CharRecord objects.
+
+        @param bbox: A (x0, y0, x1, y1) tuple. Default is the union of
+        characters' bounding boxes.
+
+        @return: None.
+        """
+        # A list of character records
+        self.char_s = char_s
+
+        # If bounding box is not given
+        if bbox is None:
+            # Use the union of characters' bounding boxes
+            bbox = (
+                min(char.x0 for char in char_s),
+                min(char.y0 for char in char_s),
+                max(char.x1 for char in char_s),
+                max(char.y1 for char in char_s),
+            )
+
+        # Bounding box
+        self.x0, self.y0, self.x1, self.y1 = bbox
+
+    def __iter__(self):
+        """
+        Iterate character records.
+        """
+        return iter(self.char_s)
+
+    def __len__(self):
+        """
+        Get number of character records.
+        """
+        return len(self.char_s)
+
+    @property
+    def bbox(self):
+        """
+        Bounding box.
+        """
+        return (self.x0, self.y0, self.x1, self.y1)
+
+    def get_text(self):
+        """
+        Get line text, ending with a newline like LTTextLine's.
+
+        @return: Line text.
+        """
+        return ''.join(char.text for char in self.char_s) + '\n'
+
+
+#
+class PageRecord(object):
+    """
+    Page record yielded by extraction backends.
+    """
+
+    def __init__(self, page_num, page_item, bbox, line_s):
+        """
+        Initialize object.
+
+        @param page_num: Page number, 1-based.
+
+        @param page_item: Backend's page object, passed to textline handlers
+        as "info['page_item']". It is LTPage item for pdfminer backend.
+
+        @param bbox: Page box, a (x0, y0, x1, y1) tuple.
+
+        @param line_s: A list of (line item, textbox item) tuples in layout
+        order. Line items are LTTextLine items or LineRecord objects. Textbox
+        items can be None.
+
+        @return: None.
+        """
+        # Page number
+        self.page_num = page_num
+
+        # Backend's page object
+        self.page_item = page_item
+
+        # Page box
+        self.bbox = bbox
+
+        # A list of (line item, textbox item) tuples
+        self.line_s = line_s
+
+
+#
+class ExtractionBackend(object):
+    """
+    Base class of extraction backends.
+
+    A backend turns a PDF file into page records of textlines. Parsing
+    controls, running lines, line merging and textline handlers are applied
+    on top of the records by "parse_pdf", so they work with every backend.
+    """
+
+    # Backend name
+    name = None
+
+    @classmethod
+    def is_available(cls):
+        """
+        Test whether the backend's dependency packages are installed.
+
+        @return: Boolean.
+        """
+        return True
+
+    def iter_pages(
+        self, pdf_file, npages=None, password=None, page_filter=None
+    ):
+        """
+        Iterate page records of a PDF file.
+
+        @param pdf_file: PDF file to parse.
+
+        @param npages: Max number of pages to process. 0 or None means all
+        pages.
+
+        @param password: PDF file's password.
+
+        @param page_filter: A function that takes a page number and returns
+        whether to process the page. It is called right before each page is
+        processed, so it can change during iteration. None means all pages.
+
+        @return: A generator of PageRecord objects, in page order.
+        """
+        raise NotImplementedError()
+
+
+#
+class PymupdfBackend(ExtractionBackend):
+    """
+    Extraction backend using PyMuPDF, if installed.
+
+    Textlines are MuPDF's lines instead of pdfminer's layout analysis
+    results, so line grouping can differ for some documents.
+    """
+
+    name = 'pymupdf'
+
+    @classmethod
+    def is_available(cls):
+        """
+        Test whether package "PyMuPDF" is installed.
+
+        @return: Boolean.
+        """
+        #
+        try:
+            # Import PyMuPDF package
+            import fitz
+        except ImportError:
+            # Return False
+            return False
+
+        # Make linter happy
+        fitz = fitz
+
+        # Return True
+        return True
+
+    def iter_pages(
+        self, pdf_file, npages=None, password=None, page_filter=None
+    ):
+        """
+        Iterate page records of a PDF file. See class "ExtractionBackend".
+        """
+        #
+        try:
+            # Import PyMuPDF package
+            import fitz
+        except ImportError:
+            # Raise error
+            raise ValueError(
+                'Error: Package "PyMuPDF" is not installed.'
+                ' Try: "pip install PyMuPDF".'
+            )
+
+        # Open the document from the file's data
+        document = fitz.open(stream=pdf_file.read(), filetype='pdf')
+
+        #
+        try:
+            # If the document is encrypted
+            if document.needs_pass:
+                # Authenticate with the password
+                document.authenticate(
+                    password if password is not None else '')
+
+            # Get number of pages to process
+            page_count = document.page_count \
+                if not npages else min(npages, document.page_count)
+
+            # For each page index
+            for page_index in range(page_count):
+                # Get page number
+                page_num = page_index + 1
+
+                # If the page is not to process
+                if page_filter is not None and not page_filter(page_num):
+                    # Skip the page
+                    continue
+
+                # Yield the page record
+                yield self.get_page_record(page_num, document[page_index])
+        finally:
+            # Close the document
+            document.close()
+
+    @staticmethod
+    def get_page_record(page_num, page):
+        """
+        Create page record of a PyMuPDF page.
+
+        @param page_num: Page number.
+
+        @param page: PyMuPDF page object.
+
+        @return: PageRecord object.
+        """
+        # Get page height, to flip MuPDF's top-left origin to PDF space
+        page_height = page.rect.height
+
+        # A list of (line record, textbox item) tuples
+        line_s = []
+
+        # For each text block, top to bottom
+        for block in page.get_text('rawdict', sort=True)['blocks']:
+            # If the block is not a text block
+            if block.get('type') != 0:
+                # Ignore the block
+                continue
+
+            # For each line in the block
+            for line in block['lines']:
+                # A list of character records
+                char_s = []
+
+                # For each span in the line
+                for span in line['spans']:
+                    # For each character in the span
+                    for char in span['chars']:
+                        # Get character box
+                        x0, top, x1, bottom = char['bbox']
+
+                        # Add character record
+                        char_s.append(CharRecord(
+                            text=char['c'],
+                            fontname=span['font'],
+                            size=span['size'],
+                            bbox=(
+                                x0,
+                                page_height - bottom,
+                                x1,
+                                page_height - top,
+                            ),
+                            baseline=page_height - char['origin'][1],
+                        ))
+
+                # If the line has characters
+                if char_s:
+                    # Add line record
+                    line_s.append((LineRecord(char_s), None))
+
+        # Return page record
+        return PageRecord(
+            page_num=page_num,
+            page_item=page,
+            bbox=(0, 0, page.rect.width, page_height),
+            line_s=line_s,
+        )
+
+
+#
+def register_extraction_backend(backend_cls):
+    """
+    Register an extraction backend class. The first registered backend is the
+    default backend. Module "pdfparser" registers pdfminer backend.
+
+    @param backend_cls: ExtractionBackend subclass.
+
+    @return: The backend class.
+    """
+    # Add the backend class
+    _BACKEND_CLS_S.append(backend_cls)
+
+    # Return the backend class
+    return backend_cls
+
+
+#
+def get_extraction_backend_names(available_only=True):
+    """
+    Get registered extraction backend names.
+
+    @param available_only: Whether only backends whose dependency packages are
+    installed are returned.
+
+    @return: A list of backend names, default backend first.
+    """
+    # Return backend names
+    return [
+        backend_cls.name for backend_cls in _BACKEND_CLS_S
+        if not available_only or backend_cls.is_available()
+    ]
+
+
+#
+def get_extraction_backend(backend=None):
+    """
+    Get an extraction backend.
+
+    @param backend: Backend name, ExtractionBackend object, or None for the
+    default backend.
+
+    @return: ExtractionBackend object.
+    """
+    # If the backend is given as an object
+    if isinstance(backend, ExtractionBackend):
+        # Return the backend
+        return backend
+
+    # For each registered backend class
+    for backend_cls in _BACKEND_CLS_S:
+        # If the backend is the default or has the name
+        if backend is None or backend_cls.name == backend:
+            # If the backend's dependency packages are not installed
+            if not backend_cls.is_available():
+                # Raise error
+                raise ValueError(
+                    'Error: Extraction backend is not available: {}'.format(
+                        backend_cls.name))
+
+            # Return backend object
+            return backend_cls()
+
+    # Raise error
+    raise ValueError('Error: Unknown extraction backend: {}'.format(backend))
+
+
+#
+def get_line_record(line_item):
+    """
+    Get backend-neutral record of a line item, used to compare backends.
+
+    @param line_item: LTTextLine item or LineRecord object.
+
+    @return: A (text, font name, font size, bbox) tuple. Text is stripped and
+    white spaces are collapsed. Font name and size are None if the line has no
+    character.
+    """
+    # Get font name and size
+    fontname, size = get_line_font(line_item) or (None, None)
+
+    # Return the record
+    return (
+        ' '.join(line_item.get_text().split()),
+        fontname,
+        size,
+        (line_item.x0, line_item.y0, line_item.x1, line_item.y1),
+    )
+
+
+#
+def check_backend_conformance(backend, pdf_file, npages=None, password=None):
+    """
+    Check that a backend follows the extraction backend interface.
+
+    The backend is run twice, once over all pages and once with a page filter
+    that skips even pages, to check page order, "npages" and "page_filter".
+    Every line item must have a text, a bounding box inside the page box, and
+    characters with font name and size.
+
+    @param backend: ExtractionBackend object.
+
+    @param pdf_file: PDF file to parse.
+
+    @param npages: Max number of pages to process. 0 or None means all pages.
+
+    @param password: PDF file's password.
+
+    @return: A list of problem messages. Empty if the backend conforms.
+    """
+    # A list of problem messages
+    problem_s = []
+
+    # A list of page numbers yielded
+    page_num_s = []
+
+    # Tolerance of bounding box checks
+    tolerance = 1.0
+
+    # For each page record
+    for page_record in backend.iter_pages(
+        pdf_file, npages=npages, password=password
+    ):
+        # Get page number
+        page_num = page_record.page_num
+
+        # Add the page number
+        page_num_s.append(page_num)
+
+        # Get page box
+        page_x0, page_y0, page_x1, page_y1 = page_record.bbox
+
+        # For each line item
+        for line_item, _ in page_record.line_s:
+            # Get line record
+            text, fontname, size, bbox = get_line_record(line_item)
+
+            # Get prefix of problem messages
+            prefix = 'Page {} line {!r}: '.format(page_num, text[:30])
+
+            # If the line text does not end with newline
+            if not line_item.get_text().endswith('\n'):
+                # Add problem
+                problem_s.append(prefix + 'text does not end with newline')
+
+            # If the line has no character with font
+            if fontname is None or not size or size <= 0:
+                # Add problem
+                problem_s.append(prefix + 'no font name or size')
+
+            # Get line box
+            x0, y0, x1, y1 = bbox
+
+            # If the line box is invalid or outside the page box
+            if not (
+                x0 <= x1 and y0 <= y1
+                and x0 >= page_x0 - tolerance and x1 <= page_x1 + tolerance
+                and y0 >= page_y0 - tolerance and y1 <= page_y1 + tolerance
+            ):
+                # Add problem
+                problem_s.append(prefix + 'invalid bbox {}'.format(bbox))
+
+            # For each character item
+            for char_item in line_item:
+                # Get the character's matrix
+                matrix = getattr(char_item, 'matrix', None)
+
+                # If the character has font but no 6-number matrix
+                if getattr(char_item, 'fontname', None) is not None \
+                        and (matrix is None or len(matrix) != 6):
+                    # Add problem
+                    problem_s.append(prefix + 'character has no matrix')
+
+                    # Check next line
+                    break
+
+    # If pages are not in order
+    if page_num_s != sorted(set(page_num_s)):
+        # Add problem
+        problem_s.append('Pages not in order: {}'.format(page_num_s))
+
+    # If max number of pages is exceeded
+    if npages and len(page_num_s) > npages:
+        # Add problem
+        problem_s.append('More than {} pages yielded'.format(npages))
+
+    # Set input file seek pointer to beginning
+    pdf_file.seek(0)
+
+    # Get page numbers yielded with a filter skipping even pages
+    filtered_page_num_s = [
+        page_record.page_num for page_record in backend.iter_pages(
+            pdf_file,
+            npages=npages,
+            password=password,
+            page_filter=lambda page_num: page_num % 2 == 1,
+        )
+    ]
+
+    # If the filter is not respected
+    if filtered_page_num_s != [
+        page_num for page_num in page_num_s if page_num % 2 == 1
+    ]:
+        # Add problem
+        problem_s.append(
+            'Page filter not respected: {}'.format(filtered_page_num_s))
+
+    # Return problem messages
+    return problem_s
+
+
+#
+def compare_line_texts(reference_text_s, text_s):
+    """
+    Compare line texts of a backend with a reference backend's.
+
+    @param reference_text_s: A list of (page number, line text) tuples of
+    the reference backend.
+
+    @param text_s: A list of (page number, line text) tuples of the backend.
+
+    @return: Ratio of reference lines also produced by the backend, from 0
+    to 1. 1 if the reference has no lines.
+    """
+    # If the reference has no lines
+    if not reference_text_s:
+        # Return 1
+        return 1.0
+
+    # Count lines of the backend
+    text_count_s = Counter(text_s)
+
+    # Count reference lines also produced by the backend
+    match_count = sum(
+        min(count, text_count_s[key])
+        for key, count in Counter(reference_text_s).items()
+    )
+
+    # Return the ratio
+    return float(match_count) / len(reference_text_s)
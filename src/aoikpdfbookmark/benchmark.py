@@ -0,0 +1,310 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from argparse import ArgumentParser
+import os
+import os.path
+import sys
+import time
+
+from .backends import check_backend_conformance
+from .backends import compare_line_texts
+from .backends import get_extraction_backend
+from .backends import get_extraction_backend_names
+from .backends import get_line_record
+
+# Import module "pdfparser" to register pdfminer backend
+from . import pdfparser
+
+
+# Make linter happy
+pdfparser = pdfparser
+
+
+#
+def get_cmdargs_parser():
+    """
+    Create command arguments parser.
+
+    @return: An "ArgumentParser" instance.
+    """
+    # Create command arguments parser
+    parser = ArgumentParser(
+        description="""Run extraction backends over a local corpus of PDF\
+ files and compare their line output and throughput.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        'corpus_paths',
+        nargs='+',
+        metavar='PATH',
+        help="""PDF file path, or directory path to find PDF files in.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--backend',
+        dest='backend_names',
+        action='append',
+        default=None,
+        choices=get_extraction_backend_names(available_only=False),
+        help="""Backend to run. Can be given multiple times. Default is all\
+ available backends. The first backend is the reference of line output.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '-n', '--npages',
+        dest='npages',
+        type=int,
+        default=None,
+        metavar='N',
+        help="""Max number of pages to process per file.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--repeat',
+        dest='repeat',
+        type=int,
+        default=1,
+        metavar='N',
+        help="""Number of runs per file. The fastest run is used.\
+ Default is 1.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--check',
+        dest='check_is_on',
+        action='store_true',
+        help="""Check each backend's conformance to the extraction backend\
+ interface.\
+""",
+    )
+
+    # Return an "ArgumentParser" instance
+    return parser
+
+
+#
+def find_pdf_files(corpus_paths):
+    """
+    Find PDF files.
+
+    @param corpus_paths: A list of PDF file paths or directory paths.
+
+    @return: A sorted list of PDF file paths.
+    """
+    # A list of PDF file paths
+    pdf_path_s = []
+
+    # For each corpus path
+    for corpus_path in corpus_paths:
+        # If the path is a directory
+        if os.path.isdir(corpus_path):
+            # For each directory under the path
+            for dir_path, _, file_name_s in os.walk(corpus_path):
+                # For each file name
+                for file_name in file_name_s:
+                    # If the file is a PDF file
+                    if file_name.lower().endswith('.pdf'):
+                        # Add the file path
+                        pdf_path_s.append(os.path.join(dir_path, file_name))
+        # If the path is a file
+        else:
+            # Add the file path
+            pdf_path_s.append(corpus_path)
+
+    # Return sorted file paths
+    return sorted(pdf_path_s)
+
+
+#
+def run_backend(backend, pdf_path, npages=None, repeat=1):
+    """
+    Run a backend over a PDF file.
+
+    @param backend: ExtractionBackend object.
+
+    @param pdf_path: PDF file path.
+
+    @param npages: Max number of pages to process.
+
+    @param repeat: Number of runs. The fastest run is used.
+
+    @return: A (duration, page count, list of (page number, line text)
+    tuples) tuple.
+    """
+    # Fastest duration
+    duration = None
+
+    # For each run
+    for _ in range(max(repeat, 1)):
+        # A list of (page number, line text) tuples
+        text_s = []
+
+        # Page count
+        page_count = 0
+
+        # Open the file
+        with open(pdf_path, 'rb') as pdf_file:
+            # Get start time
+            start_time = time.time()
+
+            # For each page record
+            for page_record in backend.iter_pages(pdf_file, npages=npages):
+                # Increment page count
+                page_count += 1
+
+                # For each line item
+                for line_item, _ in page_record.line_s:
+                    # Add the line text
+                    text_s.append((
+                        page_record.page_num,
+                        get_line_record(line_item)[0],
+                    ))
+
+            # Get run duration
+            run_duration = time.time() - start_time
+
+        # If the run is the fastest
+        if duration is None or run_duration < duration:
+            # Store the duration
+            duration = run_duration
+
+    # Return result
+    return duration, page_count, text_s
+
+
+#
+def main(args=None):
+    """
+    Benchmark's main function.
+
+    @param args: Command arguments list.
+
+    @return: Exit code.
+    """
+    # Parse command arguments
+    args = get_cmdargs_parser().parse_args(args)
+
+    # Get backend names
+    backend_name_s = args.backend_names or get_extraction_backend_names()
+
+    # For each backend name
+    for backend_name in backend_name_s:
+        # If the backend's dependency packages are not installed
+        if backend_name not in get_extraction_backend_names():
+            # Print message
+            sys.stderr.write(
+                'Error: Extraction backend is not available: {}\n'.format(
+                    backend_name))
+
+            # Return non-zero exit code
+            return 1
+
+    # Get PDF file paths
+    pdf_path_s = find_pdf_files(args.corpus_paths)
+
+    # If no PDF files
+    if not pdf_path_s:
+        # Print message
+        sys.stderr.write('Error: No PDF files found.\n')
+
+        # Return non-zero exit code
+        return 1
+
+    # Exit code
+    exit_code = 0
+
+    # A dict that maps PDF file path to reference line texts
+    reference_text_s_s = {}
+
+    # Print header
+    sys.stdout.write('{:<12}{:>8}{:>8}{:>10}{:>10}{:>10}{:>8}\n'.format(
+        'backend', 'files', 'pages', 'lines', 'seconds', 'pages/s', 'match'))
+
+    # For each backend name
+    for backend_name in backend_name_s:
+        # Get backend
+        backend = get_extraction_backend(backend_name)
+
+        # Total duration
+        total_duration = 0.0
+
+        # Total page count
+        total_page_count = 0
+
+        # Total line count
+        total_line_count = 0
+
+        # A list of match ratios with reference lines
+        match_ratio_s = []
+
+        # For each PDF file path
+        for pdf_path in pdf_path_s:
+            # If conformance check is on
+            if args.check_is_on:
+                # Open the file
+                with open(pdf_path, 'rb') as pdf_file:
+                    # Check conformance
+                    problem_s = check_backend_conformance(
+                        backend, pdf_file, npages=args.npages)
+
+                # For each problem
+                for problem in problem_s:
+                    # Print the problem
+                    sys.stderr.write('{}: {}: {}\n'.format(
+                        backend_name, pdf_path, problem))
+
+                # If have problems
+                if problem_s:
+                    # Set non-zero exit code
+                    exit_code = 1
+
+            # Run the backend
+            duration, page_count, text_s = run_backend(
+                backend, pdf_path, npages=args.npages, repeat=args.repeat)
+
+            # Add to totals
+            total_duration += duration
+
+            total_page_count += page_count
+
+            total_line_count += len(text_s)
+
+            # Get reference line texts, from the first backend
+            reference_text_s = reference_text_s_s.setdefault(pdf_path, text_s)
+
+            # Add match ratio with reference lines
+            match_ratio_s.append(compare_line_texts(reference_text_s, text_s))
+
+        # Print backend's result
+        sys.stdout.write(
+            '{:<12}{:>8}{:>8}{:>10}{:>10.3f}{:>10.1f}{:>8.1%}\n'.format(
+                backend_name,
+                len(pdf_path_s),
+                total_page_count,
+                total_line_count,
+                total_duration,
+                total_page_count / total_duration if total_duration else 0.0,
+                sum(match_ratio_s) / len(match_ratio_s),
+            )
+        )
+
+    # Return exit code
+    return exit_code
+
+
+# If the module is run as a script
+if __name__ == '__main__':
+    # Call main function
+    sys.exit(main())
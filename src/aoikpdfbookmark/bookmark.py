@@ -2,160 +2,259 @@
 #
 from __future__ import absolute_import
 
+import pkgutil
+
+from .bookmarkexample import generate_bookmark
+
+
+# Example bookmark generating function's code, printed by "--example".
+# The function is defined in module "bookmarkexample", whose source is read as
+# text so that the printed code and the function never diverge.
+GENERATE_BOOKMARK_FUNC_CODE = pkgutil.get_data(
+    __name__.rpartition('.')[0], 'bookmarkexample.py').decode('utf-8')
+
+# Keep function "generate_bookmark" importable from this module, used by
+# default generating function URI "aoikpdfbookmark.bookmark::generate_bookmark"
+generate_bookmark = generate_bookmark
+
 
 #
-GENERATE_BOOKMARK_FUNC_CODE = r'''# coding: utf-8
-#
-import re
-import sys
+def get_bookmark_level(bookmark_line):
+    """
+    Get bookmark line's nesting level from its indentation. Each level of
+    nesting is indented by two spaces or one tab.
+
+    @param bookmark_line: A bookmark line.
+
+    @return: Zero-based nesting level.
+    """
+    # Expand tabs so that one tab is one indentation unit
+    bookmark_line = bookmark_line.expandtabs(2)
+
+    # Get indentation width
+    indent_width = len(bookmark_line) - len(bookmark_line.lstrip())
+
+    # Return nesting level
+    return indent_width // 2
 
 
 #
-def generate_bookmark(info):
+def format_bookmark_line(page_num, voffset, title, level=0):
     """
-    A textline handler to generate bookmark line.
-
-    PDFPageInterpreter parses each PDF page into a LTPage item.
-    PDFPageInterpreter passes the LTPage item to TextlineConverter.
-    TextlineConverter walks through the LTPage item, finds each LTTextLine
-    item in it, and passes an textline info dict to textline handler.
-    The textline info dict has these entries:
-    info = {
-        'page_num': Page number.
-        'line_item': LTTextLine item.
-        'line_text': Line text.
-    }
+    Format a bookmark line.
+
+    @param page_num: Page number.
+
+    @param voffset: Vertical offset.
 
-    @param info: Textline info dict. Format is explained above.
+    @param title: Bookmark title.
+
+    @param level: Zero-based nesting level. Default is 0.
 
     @return: A bookmark line in the format (no quotes):
-    "page_number|vertical_offset|bookmark_title", or None.
+    "page_number|vertical_offset|bookmark_title", indented by two spaces per
+    nesting level.
     """
-    # Get line text
-    line_text = info['line_text']
-
-    # Get line item
-    line_item = info['line_item']
-
-    # Get first character item from the line item
-    char1 = next(iter(line_item))
-
-    # Get page number
-    page_num = info['page_num']
-
-    # If first character's font size is GT 15,
-    # or the line text starts with digit,
-    # it is considered a section title that should be bookmarked.
-    if char1.size >= 15 or re.match(r'^\d([.]| )', line_text):
-        # Allow this line
-        pass
-    # Else it is not considered a section title that should be bookmarked.
-    else:
-        # Reject this line
-        return
-
-    # Get vertical offset
-    voffset = int(char1.y1)
-
-    # Get bookmark title
-    title = line_text.strip().encode('utf-8')
-
-    # Replace consecutive white spaces into one space
-    title = ' '.join(title.split())
-
-    # Get bookmark line
-    bookmark_line = '{page_num}|{voffset}|{title}'.format(
-        page_num=page_num,
-        voffset=voffset,
-        title=title,
-    )
+    # Return bookmark line
+    return '{}{}|{}|{}'.format('  ' * level, page_num, voffset, title)
 
-    # Get font info text
-    font_info_text = '{} {:.1f}'.format(
-        char1.fontname,
-        char1.size,
-    )
 
-    # Get info line
-    info_line = '{:<30}{}\n'.format(font_info_text, bookmark_line)
+#
+def make_bookmark_record(
+    page_num,
+    voffset,
+    title,
+    level=0,
+    color=None,
+    bold=False,
+    italic=False,
+    zoom=None,
+):
+    """
+    Make a bookmark record, the format-independent form of a bookmark read
+    from or written to bookmark files.
 
-    # Print info line to stderr
-    sys.stderr.write(info_line)
+    @param page_num: Page number.
 
-    # Return bookmark line
-    return bookmark_line
-'''
+    @param voffset: Vertical offset.
 
+    @param title: Bookmark title.
 
-# Execute the code to define function "generate_bookmark".
-# Using this way to define the function is because the code is used elsewhere
-# but repeating the same code in multiple places is not desired.
-exec(GENERATE_BOOKMARK_FUNC_CODE)
+    @param level: Zero-based nesting level. Default is 0.
 
+    @param color: A (red, green, blue) tuple of floats in [0, 1], or None.
 
-# Ensure function "generate_bookmark" is defined
-generate_bookmark = globals()['generate_bookmark']
+    @param bold: Whether the title is bold. Default is False.
+
+    @param italic: Whether the title is italic. Default is False.
+
+    @param zoom: Zoom factor, e.g. 1.0 for 100%. None means fitting page width
+    ("/FitH"). Default is None.
+
+    @return: Bookmark record dict.
+    """
+    # Return bookmark record dict
+    return {
+        'level': level,
+        'page_num': page_num,
+        'voffset': voffset,
+        'title': title,
+        'color': tuple(color) if color else None,
+        'bold': bool(bold),
+        'italic': bool(italic),
+        'zoom': zoom,
+    }
 
 
 #
-def parse_bookmarks(bookmarks, npages=None):
+def parse_bookmark_line(bookmark_line):
     """
-    Parse bookmark lines to specs. Each spec is an arguments list than can be
-    be used this way: "PyPDF2.PdfFileWriter.addBookmark(*spec)".
+    Parse a bookmark line to a bookmark record.
 
-    @param bookmarks: A list of bookmark lines.
+    @param bookmark_line: A bookmark line in the format (no quotes):
+    "page_number|vertical_offset|bookmark_title", indented by two spaces or
+    one tab per nesting level.
 
-    @param npages: Max number of pages to process. 0 or None means all pages.
-    Default is all pages.
+    @return: Bookmark record dict, or None if the line is empty.
+    """
+    # Get nesting level
+    level = get_bookmark_level(bookmark_line)
 
-    @return: A list of bookmark specs.
+    # Strip white spaces on both ends
+    bookmark_line = bookmark_line.strip()
+
+    # If after striping white spaces the bookmark line is empty
+    if not bookmark_line:
+        # Return None
+        return None
+
+    # Get page number, vertical offset, and bookmark title
+    page_num, voffset, title = bookmark_line.split('|', 2)
+
+    # Return bookmark record
+    return make_bookmark_record(
+        int(page_num), int(voffset), title, level=level)
+
+
+#
+def iter_bookmark_specs(bookmark_records, npages=None):
     """
-    # A list of bookmark specs
-    bookmark_spec_s = []
+    Convert bookmark records to specs incrementally. Each spec is an arguments
+    list than can be used this way: "PyPDF2.PdfFileWriter.addBookmark(*spec)",
+    except that the parent bookmark is the index of the parent spec, or None.
 
-    # Write PDF bookmarks.
-    # For each bookmark line.
-    for bookmark_line in bookmarks:
-        # Strip white spaces on both ends
-        bookmark_line = bookmark_line.strip()
+    Only a stack of possible parents is kept, so records are converted at
+    constant memory.
 
-        # If after striping white spaces the bookmark line is empty
-        if not bookmark_line:
-            # Ignore the bookmark line
-            continue
+    @param bookmark_records: An iterable of bookmark records.
 
-        # Get page number, vertical offset, and bookmark title
-        page_num, voffset, title = bookmark_line.split('|', 2)
+    @param npages: Max number of pages to process. 0 or None means all pages.
+    Records after the first record beyond the max page are ignored.
+
+    @return: A generator of bookmark specs.
+    """
+    # A stack of (level, spec index) tuples of possible parent bookmarks
+    parent_s = []
 
-        # Convert page number to integer
-        page_num = int(page_num)
+    # Index of next spec
+    spec_index = 0
 
+    # For each bookmark record
+    for record in bookmark_records:
         # Convert page number to zero-based page index
-        page_index = page_num - 1
+        page_index = record['page_num'] - 1
 
         # If max number of pages to process is given,
         # and the zero-based page index is GE the max number.
         if npages and page_index >= npages:
-            # Stop writing PDF bookmarks
+            # Stop converting
             break
 
-        # Convert vertical offset to integer
-        voffset = int(voffset)
+        # Get nesting level
+        level = record['level']
+
+        # Pop bookmarks that can not be the parent
+        while parent_s and parent_s[-1][0] >= level:
+            parent_s.pop()
+
+        # Get parent spec index. None means top level.
+        parent_index = parent_s[-1][1] if parent_s else None
+
+        # Push the bookmark as a possible parent
+        parent_s.append((level, spec_index))
+
+        # Increment spec index
+        spec_index += 1
 
-        # Get bookmark spec
-        bookmark_spec = (
-            title,  # Bookmark title
+        # Get zoom factor
+        zoom = record['zoom']
+
+        # If zoom factor is not given
+        if zoom is None:
+            # Fit page width, scroll to the vertical offset
+            fit_args = ('/FitH', record['voffset'])
+        # If zoom factor is given
+        else:
+            # Zoom, scroll to the vertical offset
+            fit_args = ('/XYZ', 0, record['voffset'], zoom)
+
+        # Yield bookmark spec
+        yield (
+            record['title'],  # Bookmark title
             page_index,  # Zero-based page index
-            None,  # Parent bookmark
-            None,  # Color
-            False,  # Bold
-            False,  # Italic
-            '/FitH',  # Fit mode
-            voffset,  # Vertical offset
-        )
+            parent_index,  # Parent spec index
+            record['color'],  # Color
+            record['bold'],  # Bold
+            record['italic'],  # Italic
+        ) + fit_args  # Fit mode and its arguments
+
+
+#
+def parse_bookmarks(bookmarks, npages=None):
+    """
+    Parse bookmark lines to specs. See "iter_bookmark_specs" for spec format.
+
+    Bookmark lines can be indented by two spaces or one tab per nesting level.
+
+    @param bookmarks: A list of bookmark lines.
 
-        # Add the bookmark spec to list
-        bookmark_spec_s.append(bookmark_spec)
+    @param npages: Max number of pages to process. 0 or None means all pages.
+    Default is all pages.
+
+    @return: A list of bookmark specs.
+    """
+    # Get bookmark records of non-empty lines
+    record_s = (
+        record for record in map(parse_bookmark_line, bookmarks)
+        if record is not None
+    )
 
     # Return the list of bookmark specs
-    return bookmark_spec_s
+    return list(iter_bookmark_specs(record_s, npages=npages))
+
+
+#
+def get_bookmark_spec_levels(bookmark_specs):
+    """
+    Get nesting levels of bookmark specs.
+
+    @param bookmark_specs: A list of bookmark specs.
+
+    @return: A list of zero-based nesting levels.
+    """
+    # A list of nesting levels
+    level_s = []
+
+    # For each bookmark spec
+    for bookmark_spec in bookmark_specs:
+        # Get parent spec index
+        parent_index = bookmark_spec[2]
+
+        # Get nesting level
+        level = 0 if parent_index is None else level_s[parent_index] + 1
+
+        # Add to the list
+        level_s.append(level)
+
+    # Return the list of nesting levels
+    return level_s
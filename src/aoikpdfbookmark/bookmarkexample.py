@@ -0,0 +1,109 @@
+# coding: utf-8
+#
+import re
+
+
+#
+def generate_bookmark(info):
+    """
+    A textline handler to generate bookmark line.
+
+    PDFPageInterpreter parses each PDF page into a LTPage item.
+    PDFPageInterpreter passes the LTPage item to TextlineConverter.
+    TextlineConverter walks through the LTPage item, finds each LTTextLine
+    item in it, and passes an textline info dict to textline handler.
+    The textline info dict has these entries:
+    info = {
+        'page_num': Page number.
+        'page_item': LTPage item.
+        'line_item': LTTextLine item.
+        'line_text': Line text.
+        'is_running_line': Whether the line is a running header or footer.
+        Running lines are not passed unless "--keep-running" is given.
+        'textbox_item': LTTextBox item containing the line, or None.
+        'page_lines': PageLineIndex object of the page's lines.
+        'prev_line': Line item above, in top to bottom order, or None.
+        'next_line': Line item below, in top to bottom order, or None.
+        'gap_above': A function that returns vertical gap to the nearest
+        horizontally overlapping line above, or None.
+        'lines_above': A function that takes a distance "dy" and returns line
+        items whose bottoms are within "dy" above the line's top.
+        'line_items': Line items merged into the line by "--merge-lines", top
+        line first. Only the line item itself if not merged.
+        'log': Diagnostics log. Call "info['log'].info(msg, **fields)" (or
+        "debug", "warning", "error") instead of writing to stderr. Records are
+        buffered, filtered by "--log-level", and written as JSON objects with
+        the fields if "--log-json" is given.
+    }
+
+    With "--backend" other than pdfminer, page and line items are the
+    backend's records. Line items still iterate character items with
+    "fontname", "size", "x0", "y0", "x1", "y1" and "get_text".
+
+    To stop parsing once current page is finished, raise
+    "aoikpdfbookmark.pdfparser.StopParsing()". To skip pages until page number
+    N, raise "aoikpdfbookmark.pdfparser.SkipToPage(N)".
+
+    @param info: Textline info dict. Format is explained above.
+
+    @return: A bookmark line in the format (no quotes):
+    "page_number|vertical_offset|bookmark_title", or None.
+    """
+    # Get line text
+    line_text = info['line_text']
+
+    # Get line item
+    line_item = info['line_item']
+
+    # Get first character item from the line item
+    char1 = next(iter(line_item))
+
+    # Get page number
+    page_num = info['page_num']
+
+    # If first character's font size is GT 15,
+    # or the line text starts with digit,
+    # it is considered a section title that should be bookmarked.
+    if char1.size >= 15 or re.match(r'^\d([.]| )', line_text):
+        # Allow this line
+        pass
+    # Else it is not considered a section title that should be bookmarked.
+    else:
+        # Reject this line
+        return
+
+    # Get vertical offset
+    voffset = int(char1.y1)
+
+    # Get bookmark title
+    title = line_text.strip().encode('utf-8')
+
+    # Replace consecutive white spaces into one space
+    title = ' '.join(title.split())
+
+    # Get bookmark line
+    bookmark_line = '{page_num}|{voffset}|{title}'.format(
+        page_num=page_num,
+        voffset=voffset,
+        title=title,
+    )
+
+    # Get font info text
+    font_info_text = '{} {:.1f}'.format(
+        char1.fontname,
+        char1.size,
+    )
+
+    # Get info line
+    info_line = '{:<30}{}'.format(font_info_text, bookmark_line)
+
+    # Add info line to diagnostics log
+    info['log'].info(
+        info_line,
+        font=char1.fontname,
+        size=round(char1.size, 1),
+        bookmark=bookmark_line,
+    )
+
+    # Return bookmark line
+    return bookmark_line
@@ -0,0 +1,629 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import csv
+import io
+import json
+import os.path
+import struct
+
+from .bookmark import format_bookmark_line
+from .bookmark import make_bookmark_record
+from .bookmark import parse_bookmark_line
+
+
+#
+class BookmarkFormat(object):
+    """
+    Base class of bookmark file formats.
+
+    A format reads bookmark records from a file incrementally, and creates
+    writers that write bookmark records to a file incrementally, so bookmarks
+    move through at constant memory.
+    """
+
+    # Format name
+    name = None
+
+    # File extensions, lower case with leading dot
+    extensions = ()
+
+    # Whether files are opened in binary mode
+    is_binary = False
+
+    def open(self, file_path, mode='r'):
+        """
+        Open a bookmark file in the format's file mode.
+
+        @param file_path: Bookmark file path.
+
+        @param mode: "r" or "w".
+
+        @return: File object.
+        """
+        # If files are opened in binary mode
+        if self.is_binary:
+            # Open in binary mode
+            return open(file_path, mode + 'b')
+
+        # Open in text mode.
+        # Disable newline translation so that CSV quoting works.
+        return io.open(file_path, mode, encoding='utf-8', newline='')
+
+    def read(self, bookmark_file):
+        """
+        Read bookmark records.
+
+        @param bookmark_file: File object opened by "open".
+
+        @return: A generator of bookmark records.
+        """
+        # Raise error
+        raise NotImplementedError()
+
+    def create_writer(self, bookmark_file):
+        """
+        Create a writer that writes bookmark records.
+
+        @param bookmark_file: File object opened by "open".
+
+        @return: Writer object that has method "write(record)".
+        """
+        # Raise error
+        raise NotImplementedError()
+
+
+#
+class _LineWriter(object):
+    """
+    Writer that writes each record as one line.
+    """
+
+    def __init__(self, bookmark_file, format_func):
+        """
+        Initialize object.
+
+        @param bookmark_file: File object.
+
+        @param format_func: Function that formats a record to a line.
+
+        @return: None.
+        """
+        # File object
+        self.bookmark_file = bookmark_file
+
+        # Record formatting function
+        self.format_func = format_func
+
+    def write(self, record):
+        """
+        Write a bookmark record.
+
+        @param record: Bookmark record.
+
+        @return: None.
+        """
+        # Write the record's line
+        self.bookmark_file.write(self.format_func(record) + '\n')
+
+
+#
+class TextBookmarkFormat(BookmarkFormat):
+    """
+    Text format. Each line is (no quotes):
+    "page_number|vertical_offset|bookmark_title", indented by two spaces per
+    nesting level. Color, style and zoom are not stored.
+    """
+
+    name = 'text'
+
+    extensions = ('.txt',)
+
+    def read(self, bookmark_file):
+        """
+        Read bookmark records.
+
+        @param bookmark_file: File object, or any iterable of bookmark lines.
+
+        @return: A generator of bookmark records.
+        """
+        # For each bookmark line
+        for bookmark_line in bookmark_file:
+            # Parse the line
+            record = parse_bookmark_line(bookmark_line)
+
+            # If the line is not empty
+            if record is not None:
+                # Yield the record
+                yield record
+
+    def create_writer(self, bookmark_file):
+        """
+        Create a writer that writes bookmark records.
+
+        @param bookmark_file: File object opened by "open".
+
+        @return: Writer object that has method "write(record)".
+        """
+        # Return writer
+        return _LineWriter(
+            bookmark_file,
+            lambda record: format_bookmark_line(
+                record['page_num'],
+                record['voffset'],
+                record['title'],
+                level=record['level'],
+            ),
+        )
+
+
+#
+def _record_from_dict(record_dict):
+    """
+    Make a bookmark record from a dict that has record keys, missing style
+    keys use default values.
+
+    @param record_dict: A dict that has record keys.
+
+    @return: Bookmark record.
+    """
+    # Return bookmark record
+    return make_bookmark_record(
+        int(record_dict['page_num']),
+        int(record_dict['voffset']),
+        record_dict['title'],
+        level=int(record_dict.get('level') or 0),
+        color=record_dict.get('color'),
+        bold=record_dict.get('bold', False),
+        italic=record_dict.get('italic', False),
+        zoom=record_dict.get('zoom'),
+    )
+
+
+#
+class JsonlBookmarkFormat(BookmarkFormat):
+    """
+    JSON Lines format. Each line is a JSON object:
+    {"level": 0, "page_num": 1, "voffset": 700, "title": "Title",
+     "color": [1, 0, 0], "bold": false, "italic": false, "zoom": null}
+    Only "page_num", "voffset" and "title" are required when reading.
+    """
+
+    name = 'jsonl'
+
+    extensions = ('.jsonl', '.ndjson')
+
+    def read(self, bookmark_file):
+        """
+        Read bookmark records.
+
+        @param bookmark_file: File object opened by "open".
+
+        @return: A generator of bookmark records.
+        """
+        # For each line
+        for line in bookmark_file:
+            # Strip white spaces on both ends
+            line = line.strip()
+
+            # If the line is empty
+            if not line:
+                # Ignore the line
+                continue
+
+            # Yield the record
+            yield _record_from_dict(json.loads(line))
+
+    def create_writer(self, bookmark_file):
+        """
+        Create a writer that writes bookmark records.
+
+        @param bookmark_file: File object opened by "open".
+
+        @return: Writer object that has method "write(record)".
+        """
+        # Return writer
+        return _LineWriter(
+            bookmark_file,
+            lambda record: json.dumps(
+                record, ensure_ascii=False, sort_keys=True),
+        )
+
+
+#
+class _CsvWriter(object):
+    """
+    Writer that writes each record as one CSV row.
+    """
+
+    def __init__(self, bookmark_file, field_names):
+        """
+        Initialize object.
+
+        @param bookmark_file: File object.
+
+        @param field_names: Column names.
+
+        @return: None.
+        """
+        # CSV writer
+        self.csv_writer = csv.writer(bookmark_file)
+
+        # Column names
+        self.field_names = field_names
+
+        # Write header row
+        self.csv_writer.writerow(field_names)
+
+    def write(self, record):
+        """
+        Write a bookmark record.
+
+        @param record: Bookmark record.
+
+        @return: None.
+        """
+        # Get color
+        color = record['color']
+
+        # Get zoom factor
+        zoom = record['zoom']
+
+        # Write the record's row
+        self.csv_writer.writerow([
+            record['level'],
+            record['page_num'],
+            record['voffset'],
+            record['title'],
+            ' '.join(str(x) for x in color) if color else '',
+            int(record['bold']),
+            int(record['italic']),
+            '' if zoom is None else zoom,
+        ])
+
+
+#
+class CsvBookmarkFormat(BookmarkFormat):
+    """
+    CSV format with a header row. Columns are "level", "page_num", "voffset",
+    "title", "color" (space-separated red, green and blue, or empty), "bold"
+    (0 or 1), "italic" (0 or 1) and "zoom" (empty means fitting page width).
+    Only "page_num", "voffset" and "title" columns are required when reading.
+    """
+
+    name = 'csv'
+
+    extensions = ('.csv',)
+
+    # Column names
+    FIELD_NAMES = (
+        'level',
+        'page_num',
+        'voffset',
+        'title',
+        'color',
+        'bold',
+        'italic',
+        'zoom',
+    )
+
+    def read(self, bookmark_file):
+        """
+        Read bookmark records.
+
+        @param bookmark_file: File object opened by "open".
+
+        @return: A generator of bookmark records.
+        """
+        # For each row
+        for row in csv.DictReader(bookmark_file):
+            # Get color text
+            color = row.get('color')
+
+            # Get zoom text
+            zoom = row.get('zoom')
+
+            # Yield the record
+            yield make_bookmark_record(
+                int(row['page_num']),
+                int(row['voffset']),
+                row['title'],
+                level=int(row.get('level') or 0),
+                color=tuple(float(x) for x in color.split()) if color
+                else None,
+                bold=(row.get('bold') or '0').lower() in ('1', 'true'),
+                italic=(row.get('italic') or '0').lower() in ('1', 'true'),
+                zoom=float(zoom) if zoom else None,
+            )
+
+    def create_writer(self, bookmark_file):
+        """
+        Create a writer that writes bookmark records.
+
+        @param bookmark_file: File object opened by "open".
+
+        @return: Writer object that has method "write(record)".
+        """
+        # Return writer
+        return _CsvWriter(bookmark_file, self.FIELD_NAMES)
+
+
+# Binary format's file header
+_BINARY_MAGIC = b'AOIKPDFBM\x01'
+
+# Binary format's record header: level, flags, page number, vertical offset,
+# title length
+_BINARY_RECORD_HEADER = struct.Struct('<BBIiI')
+
+# Binary format's color
+_BINARY_COLOR = struct.Struct('<3f')
+
+# Binary format's zoom factor
+_BINARY_ZOOM = struct.Struct('<f')
+
+# Binary format's flags
+_BINARY_FLAG_BOLD = 1
+
+_BINARY_FLAG_ITALIC = 2
+
+_BINARY_FLAG_COLOR = 4
+
+_BINARY_FLAG_ZOOM = 8
+
+
+#
+def _read_exactly(bookmark_file, size):
+    """
+    Read exactly given number of bytes.
+
+    @param bookmark_file: File object.
+
+    @param size: Number of bytes.
+
+    @return: Bytes read. Empty if at end of file.
+    """
+    # Read data
+    data = bookmark_file.read(size)
+
+    # If the data is truncated
+    if data and len(data) != size:
+        # Raise error
+        raise ValueError('Error: Bookmark file is truncated.')
+
+    # Return data
+    return data
+
+
+#
+class _BinaryWriter(object):
+    """
+    Writer that writes each record in binary format.
+    """
+
+    def __init__(self, bookmark_file):
+        """
+        Initialize object.
+
+        @param bookmark_file: File object.
+
+        @return: None.
+        """
+        # File object
+        self.bookmark_file = bookmark_file
+
+        # Write file header
+        bookmark_file.write(_BINARY_MAGIC)
+
+    def write(self, record):
+        """
+        Write a bookmark record.
+
+        @param record: Bookmark record.
+
+        @return: None.
+        """
+        # Get title data
+        title_data = record['title'].encode('utf-8')
+
+        # Get color
+        color = record['color']
+
+        # Get zoom factor
+        zoom = record['zoom']
+
+        # Get flags
+        flags = (
+            (_BINARY_FLAG_BOLD if record['bold'] else 0)
+            | (_BINARY_FLAG_ITALIC if record['italic'] else 0)
+            | (_BINARY_FLAG_COLOR if color else 0)
+            | (_BINARY_FLAG_ZOOM if zoom is not None else 0)
+        )
+
+        # A list of data parts
+        data_s = [
+            _BINARY_RECORD_HEADER.pack(
+                record['level'],
+                flags,
+                record['page_num'],
+                record['voffset'],
+                len(title_data),
+            ),
+            title_data,
+        ]
+
+        # If have color
+        if color:
+            # Add color data
+            data_s.append(_BINARY_COLOR.pack(*color))
+
+        # If have zoom factor
+        if zoom is not None:
+            # Add zoom data
+            data_s.append(_BINARY_ZOOM.pack(zoom))
+
+        # Write the data
+        self.bookmark_file.write(b''.join(data_s))
+
+
+#
+class BinaryBookmarkFormat(BookmarkFormat):
+    """
+    Compact binary format for huge outlines. The file begins with a magic
+    header. Each record is a fixed-size header (level, flags, page number,
+    vertical offset, title length), the UTF-8 title, then the color and zoom
+    factor if flagged.
+    """
+
+    name = 'binary'
+
+    extensions = ('.bmk',)
+
+    is_binary = True
+
+    def read(self, bookmark_file):
+        """
+        Read bookmark records.
+
+        @param bookmark_file: File object opened by "open".
+
+        @return: A generator of bookmark records.
+        """
+        # If the file header is wrong
+        if bookmark_file.read(len(_BINARY_MAGIC)) != _BINARY_MAGIC:
+            # Raise error
+            raise ValueError('Error: Not a binary bookmark file.')
+
+        # Get record header size
+        header_size = _BINARY_RECORD_HEADER.size
+
+        # While have more records
+        while True:
+            # Read record header
+            header_data = _read_exactly(bookmark_file, header_size)
+
+            # If at end of file
+            if not header_data:
+                # Stop reading
+                break
+
+            # Unpack record header
+            level, flags, page_num, voffset, title_size = \
+                _BINARY_RECORD_HEADER.unpack(header_data)
+
+            # Read title
+            title = _read_exactly(bookmark_file, title_size).decode('utf-8')
+
+            # Read color if flagged
+            color = _BINARY_COLOR.unpack(
+                _read_exactly(bookmark_file, _BINARY_COLOR.size)) \
+                if flags & _BINARY_FLAG_COLOR else None
+
+            # Read zoom factor if flagged
+            zoom = _BINARY_ZOOM.unpack(
+                _read_exactly(bookmark_file, _BINARY_ZOOM.size))[0] \
+                if flags & _BINARY_FLAG_ZOOM else None
+
+            # Yield the record
+            yield make_bookmark_record(
+                page_num,
+                voffset,
+                title,
+                level=level,
+                color=color,
+                bold=flags & _BINARY_FLAG_BOLD,
+                italic=flags & _BINARY_FLAG_ITALIC,
+                zoom=zoom,
+            )
+
+    def create_writer(self, bookmark_file):
+        """
+        Create a writer that writes bookmark records.
+
+        @param bookmark_file: File object opened by "open".
+
+        @return: Writer object that has method "write(record)".
+        """
+        # Return writer
+        return _BinaryWriter(bookmark_file)
+
+
+# A dict that maps format name to format object
+_FORMAT_S = {}
+
+
+#
+def register_bookmark_format(bookmark_format):
+    """
+    Register a bookmark format so that it can be selected by name or guessed
+    by file extension.
+
+    @param bookmark_format: BookmarkFormat object.
+
+    @return: None.
+    """
+    # Register the format
+    _FORMAT_S[bookmark_format.name] = bookmark_format
+
+
+#
+def get_bookmark_format_names():
+    """
+    Get names of registered bookmark formats.
+
+    @return: A sorted list of format names.
+    """
+    # Return format names
+    return sorted(_FORMAT_S)
+
+
+#
+def get_bookmark_format(name=None, file_path=None):
+    """
+    Get a bookmark format by name, or by file extension if name is not given.
+
+    @param name: Format name.
+
+    @param file_path: Bookmark file path. Used if name is not given. Text
+    format is used if the extension is unknown.
+
+    @return: BookmarkFormat object.
+    """
+    # If format name is given
+    if name:
+        # Get the format
+        bookmark_format = _FORMAT_S.get(name)
+
+        # If the format is not found
+        if bookmark_format is None:
+            # Raise error
+            raise ValueError(
+                'Error: Unknown bookmark format: {}'.format(name))
+
+        # Return the format
+        return bookmark_format
+
+    # If file path is given
+    if file_path:
+        # Get file extension
+        file_ext = os.path.splitext(file_path)[1].lower()
+
+        # For each registered format
+        for bookmark_format in _FORMAT_S.values():
+            # If the format has the extension
+            if file_ext in bookmark_format.extensions:
+                # Return the format
+                return bookmark_format
+
+    # Return text format
+    return _FORMAT_S['text']
+
+
+# Register built-in formats
+register_bookmark_format(TextBookmarkFormat())
+
+register_bookmark_format(JsonlBookmarkFormat())
+
+register_bookmark_format(CsvBookmarkFormat())
+
+register_bookmark_format(BinaryBookmarkFormat())
@@ -0,0 +1,193 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import hashlib
+import json
+import os
+import os.path
+import time
+
+from .aoikimportutil import write_file_atomic
+
+
+# Checkpoint file format version
+CHECKPOINT_VERSION = 1
+
+# Suffix of default checkpoint file path, appended to input file path
+CHECKPOINT_FILE_SUFFIX = '.aoikpdfbookmark-checkpoint.json'
+
+
+#
+def get_file_fingerprint(file_path, chunk_size=1024 * 1024):
+    """
+    Get fingerprint of a file, used to tell whether a checkpoint belongs to
+    the file.
+
+    @param file_path: File path.
+
+    @param chunk_size: Size of chunks read.
+
+    @return: A "size:sha1" text.
+    """
+    # Create hash object
+    hash_obj = hashlib.sha1()
+
+    # Open the file
+    with open(file_path, 'rb') as file_obj:
+        # Read chunks
+        for chunk in iter(lambda: file_obj.read(chunk_size), b''):
+            # Update hash with the chunk
+            hash_obj.update(chunk)
+
+    # Return fingerprint
+    return '{}:{}'.format(os.path.getsize(file_path), hash_obj.hexdigest())
+
+
+#
+class Checkpoint(object):
+    """
+    Sidecar file of accumulated bookmark lines and the page number to resume
+    parsing at, saved periodically so that a long run can be resumed.
+    """
+
+    def __init__(self, file_path, run_key, interval=30.0):
+        """
+        Initialize object.
+
+        @param file_path: Checkpoint file path.
+
+        @param run_key: A dict of values a checkpoint must match to be
+        resumed, e.g. input file fingerprint and bookmarks URI.
+
+        @param interval: Min interval in seconds between saves.
+
+        @return: None.
+        """
+        # Checkpoint file path
+        self.file_path = file_path
+
+        # Values a checkpoint must match to be resumed
+        self.run_key = run_key
+
+        # Min interval in seconds between saves
+        self.interval = interval
+
+        # Time of last save
+        self.save_time = time.time()
+
+        # Page number to resume parsing at. None means parsing is finished.
+        self.resume_page_num = 1
+
+        # Number of pages completed since the run began
+        self.page_count = 0
+
+        # A list of bookmark lines
+        self.bookmark_line_s = []
+
+        # Number of bookmark lines of completed pages. Lines after it belong
+        # to the page in progress.
+        self.line_count = 0
+
+    def load(self):
+        """
+        Load the checkpoint file.
+
+        @return: True if loaded, False if the file not exists.
+        """
+        # If the file not exists
+        if not os.path.isfile(self.file_path):
+            # Return False
+            return False
+
+        # Read the file
+        with open(self.file_path, 'rb') as checkpoint_file:
+            data = json.loads(checkpoint_file.read().decode('utf-8'))
+
+        # If the checkpoint is for another version, input file or arguments
+        if data.get('version') != CHECKPOINT_VERSION \
+                or data.get('run_key') != self.run_key:
+            # Raise error
+            raise ValueError(
+                'Error: Checkpoint file is for another input file or'
+                ' arguments: {}'.format(self.file_path))
+
+        # Load page number to resume parsing at
+        self.resume_page_num = data['resume_page_num']
+
+        # Load bookmark lines
+        self.bookmark_line_s = data['bookmark_lines']
+
+        self.line_count = len(self.bookmark_line_s)
+
+        # Return True
+        return True
+
+    def save(self):
+        """
+        Save the checkpoint file atomically.
+
+        @return: None.
+        """
+        # Get data
+        data = {
+            'version': CHECKPOINT_VERSION,
+            'run_key': self.run_key,
+            'resume_page_num': self.resume_page_num,
+            'bookmark_lines': self.bookmark_line_s[:self.line_count],
+        }
+
+        # Write the file atomically, so an interrupted save keeps the last
+        # checkpoint
+        write_file_atomic(
+            self.file_path,
+            json.dumps(data, ensure_ascii=False).encode('utf-8'),
+        )
+
+        # Store time of last save
+        self.save_time = time.time()
+
+    def update(self, resume_page_num, bookmark_line_s):
+        """
+        Update the checkpoint when a page is completed. Save it if the
+        interval has elapsed.
+
+        @param resume_page_num: Page number to resume parsing at. None means
+        parsing is finished.
+
+        @param bookmark_line_s: The list of bookmark lines generated so far.
+        Lines added later for the page in progress are not saved.
+
+        @return: None.
+        """
+        # Store page number to resume parsing at
+        self.resume_page_num = resume_page_num
+
+        # Store bookmark lines
+        self.bookmark_line_s = bookmark_line_s
+
+        # Store number of bookmark lines of completed pages
+        self.line_count = len(bookmark_line_s)
+
+        # Increment completed pages count
+        self.page_count += 1
+
+        # If the interval has elapsed
+        if time.time() - self.save_time >= self.interval:
+            # Save the checkpoint
+            self.save()
+
+    def remove(self):
+        """
+        Remove the checkpoint file once the run is finished.
+
+        @return: None.
+        """
+        #
+        try:
+            # Remove the file
+            os.remove(self.file_path)
+        # If the file not exists
+        except OSError:
+            # Ignore
+            pass
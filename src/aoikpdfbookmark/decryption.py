@@ -0,0 +1,417 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import binascii
+import re
+import tempfile
+
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfdocument import PDFTextExtractionNotAllowed
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import PDFObjectNotFound
+from pdfminer.pdftypes import PDFObjRef
+from pdfminer.pdftypes import PDFStream
+from pdfminer.pdftypes import decipher_all
+from pdfminer.psparser import PSLiteral
+
+from .lrucache import LRUCache
+
+
+# Max size in bytes of a decrypted copy kept in memory before spilling to a
+# temporary file
+DEFAULT_MAX_MEMORY_SIZE = 64 * 1024 * 1024
+
+# Max number of parsed objects cached while decrypting
+DEFAULT_OBJ_CACHE_SIZE = 1024
+
+# Max number of parsed object streams cached while decrypting
+DEFAULT_OBJSTM_CACHE_SIZE = 16
+
+# Regex that matches characters to escape in PDF names
+_NAME_ESCAPE_RE = re.compile(br'[^\x21-\x7e]|[#()<>\[\]{}/%]')
+
+
+#
+def encode_password(password):
+    """
+    Encode a password for pdfminer, which requires bytes.
+
+    @param password: Password text or bytes. None means empty password.
+
+    @return: Password bytes.
+    """
+    # If the password is not given
+    if password is None:
+        # Return empty password
+        return b''
+
+    # If the password is bytes already
+    if isinstance(password, bytes):
+        # Return the password
+        return password
+
+    #
+    try:
+        # Encode like PyPDF2 does
+        return password.encode('latin-1')
+    # If the password has non-Latin-1 characters
+    except UnicodeEncodeError:
+        # Encode as UTF-8
+        return password.encode('utf-8')
+
+
+#
+def _format_number(value):
+    """
+    Format a number for PDF.
+
+    @param value: Number.
+
+    @return: Number bytes.
+    """
+    # If the number is integer
+    if isinstance(value, int):
+        # Return integer text
+        return str(value).encode('ascii')
+
+    # Format float without exponent, strip trailing zeros
+    text = ('%.6f' % value).rstrip('0').rstrip('.')
+
+    # Return float text
+    return (text if text not in ('', '-0') else '0').encode('ascii')
+
+
+#
+def serialize_pdf_object(obj):
+    """
+    Serialize a pdfminer object to PDF syntax.
+
+    @param obj: pdfminer object. Streams are not supported.
+
+    @return: Bytes.
+    """
+    # If the object is a bool.
+    # Test before number because bool is int.
+    if isinstance(obj, bool):
+        # Return bool keyword
+        return b'true' if obj else b'false'
+
+    # If the object is a number
+    if isinstance(obj, (int, float)):
+        # Return number
+        return _format_number(obj)
+
+    # If the object is a string
+    if isinstance(obj, bytes):
+        # Return hex string
+        return b'<' + binascii.hexlify(obj) + b'>'
+
+    # If the object is a name
+    if isinstance(obj, PSLiteral):
+        # Return name
+        return serialize_pdf_name(obj.name)
+
+    # If the object is a reference
+    if isinstance(obj, PDFObjRef):
+        # Return reference.
+        # Objects are written with generation number 0.
+        return '{} 0 R'.format(obj.objid).encode('ascii')
+
+    # If the object is a dict
+    if isinstance(obj, dict):
+        # Return dict
+        return b'<<' + b''.join(
+            serialize_pdf_name(key) + b' ' + serialize_pdf_object(value)
+            for key, value in obj.items()
+        ) + b'>>'
+
+    # If the object is a list
+    if isinstance(obj, list):
+        # Return array
+        return b'[' + b' '.join(
+            serialize_pdf_object(item) for item in obj) + b']'
+
+    # If the object is None
+    if obj is None:
+        # Return null
+        return b'null'
+
+    # Raise error
+    raise ValueError('Error: Unsupported PDF object: {!r}'.format(obj))
+
+
+#
+def serialize_pdf_name(name):
+    """
+    Serialize a PDF name.
+
+    @param name: Name text or bytes.
+
+    @return: Name bytes.
+    """
+    # If the name is text
+    if not isinstance(name, bytes):
+        # Encode the name
+        name = name.encode('utf-8')
+
+    # Return name with special characters escaped
+    return b'/' + _NAME_ESCAPE_RE.sub(
+        lambda match: '#{:02x}'.format(ord(match.group())).encode('ascii'),
+        name,
+    )
+
+
+#
+def write_decrypted_pdf(
+    pdf_file,
+    output_file,
+    password=None,
+    obj_cache_size=DEFAULT_OBJ_CACHE_SIZE,
+    objstm_cache_size=DEFAULT_OBJSTM_CACHE_SIZE,
+):
+    """
+    Authenticate once and write a decrypted copy of an encrypted PDF file in
+    a single pass over its objects.
+
+    Objects in object streams are written as top-level objects, so the copy
+    has a classic cross-reference table. Stream data is decrypted but keeps
+    its filters. Parsed objects and object streams are cached in bounded LRU
+    caches.
+
+    @param pdf_file: Encrypted PDF file.
+
+    @param output_file: Output file to write the decrypted copy to.
+
+    @param password: PDF file's password.
+
+    @param obj_cache_size: Max number of parsed objects cached.
+
+    @param objstm_cache_size: Max number of parsed object streams cached.
+
+    @return: True if the file is encrypted and the copy is written, False if
+    the file is not encrypted and nothing is written.
+    """
+    # Set input file seek pointer to beginning
+    pdf_file.seek(0)
+
+    # Read header, e.g. "%PDF-1.7"
+    header = pdf_file.read(8)
+
+    # Set input file seek pointer to beginning
+    pdf_file.seek(0)
+
+    # Create PDF document. It authenticates and derives the key once.
+    document = PDFDocument(
+        PDFParser(pdf_file), password=encode_password(password))
+
+    # If the document is not encrypted
+    if document.encryption is None:
+        # Return False
+        return False
+
+    # If text extraction is not allowed.
+    # Keep the restriction the stages would enforce on the encrypted file.
+    if not document.is_extractable:
+        # Raise error
+        raise PDFTextExtractionNotAllowed(
+            'Text extraction is not allowed: {!r}'.format(pdf_file))
+
+    # Replace unbounded object caches with bounded LRU caches
+    document._cached_objs = LRUCache(
+        obj_cache_size, document._cached_objs)
+
+    document._parsed_objs = LRUCache(
+        objstm_cache_size, document._parsed_objs)
+
+    # Trailer of the latest cross-reference section with a root
+    trailer = None
+
+    # A set of object IDs
+    objid_s = set()
+
+    # For each cross-reference section
+    for xref in document.xrefs:
+        # Add object IDs
+        objid_s.update(xref.get_objids())
+
+        # Get the section's trailer
+        xref_trailer = xref.get_trailer()
+
+        # If the trailer has a root and no trailer is found yet
+        if trailer is None and xref_trailer and 'Root' in xref_trailer:
+            # Use the trailer
+            trailer = xref_trailer
+
+    # Get encryption dict's object ID, to skip it
+    encrypt_ref = trailer.get('Encrypt')
+
+    encrypt_objid = encrypt_ref.objid \
+        if isinstance(encrypt_ref, PDFObjRef) else None
+
+    # Get header, keeping the PDF version
+    if not header.startswith(b'%PDF-'):
+        header = b'%PDF-1.7'
+
+    # Get start offset in output file. Offsets are relative to it.
+    start_offset = output_file.tell()
+
+    # Write header, with a binary comment so the file is treated as binary
+    output_file.write(header + b'\n%\xe2\xe3\xcf\xd3\n')
+
+    # A dict that maps object ID to offset of written objects
+    objid_offset_s = {}
+
+    # For each object ID, in order
+    for objid in sorted(objid_s):
+        # If the object is the encryption dict
+        if objid == encrypt_objid:
+            # Skip the object
+            continue
+
+        #
+        try:
+            # Get the object. It is decrypted if it is not a stream.
+            obj = document.getobj(objid)
+        # If the object is not found
+        except PDFObjectNotFound:
+            # Skip the object
+            continue
+
+        # If the object is a stream
+        if isinstance(obj, PDFStream):
+            # Get stream type
+            stream_type = obj.attrs.get('Type')
+
+            # If the stream is an object stream or cross-reference stream.
+            # Their contents are written as top-level objects and a classic
+            # cross-reference table instead.
+            if isinstance(stream_type, PSLiteral) \
+                    and stream_type.name in ('ObjStm', 'XRef'):
+                # Skip the object
+                continue
+
+            # Get raw data
+            data = obj.get_rawdata()
+
+            # If the stream has a decipher function
+            if obj.decipher:
+                # Decrypt stream data. Filters are kept.
+                data = obj.decipher(obj.objid, obj.genno, data, obj.attrs)
+
+                # Decrypt strings in stream dict
+                attrs = decipher_all(
+                    obj.decipher, obj.objid, obj.genno, dict(obj.attrs))
+            # If the stream has no decipher function
+            else:
+                # Use stream dict as is
+                attrs = dict(obj.attrs)
+
+            # Set length of decrypted data
+            attrs['Length'] = len(data)
+
+            # Get object body
+            body = serialize_pdf_object(attrs) \
+                + b'\nstream\n' + data + b'\nendstream'
+        # If the object is not a stream
+        else:
+            # Get object body
+            body = serialize_pdf_object(obj)
+
+        # Store the object's offset
+        objid_offset_s[objid] = output_file.tell() - start_offset
+
+        # Write the object
+        output_file.write(
+            '{} 0 obj\n'.format(objid).encode('ascii') + body
+            + b'\nendobj\n')
+
+    # Get offset of cross-reference table
+    xref_offset = output_file.tell() - start_offset
+
+    # Get cross-reference table size
+    size = max(objid_offset_s) + 1 if objid_offset_s else 1
+
+    # A list of cross-reference table lines
+    xref_line_s = [
+        'xref\n0 {}\n'.format(size).encode('ascii'),
+        b'0000000000 65535 f \n',
+    ]
+
+    # For each object ID
+    for objid in range(1, size):
+        # Get object offset
+        obj_offset = objid_offset_s.get(objid)
+
+        # If the object is written
+        if obj_offset is not None:
+            # Add in-use entry
+            xref_line_s.append('{:010d} 00000 n \n'.format(
+                obj_offset).encode('ascii'))
+        # If the object is not written
+        else:
+            # Add free entry
+            xref_line_s.append(b'0000000000 00000 f \n')
+
+    # Write cross-reference table
+    output_file.write(b''.join(xref_line_s))
+
+    # Create new trailer, without encryption
+    new_trailer = {'Size': size, 'Root': trailer['Root']}
+
+    # For each trailer entry kept
+    for key in ('Info', 'ID'):
+        # If the entry is in the trailer
+        if key in trailer:
+            # Keep the entry
+            new_trailer[key] = trailer[key]
+
+    # Write trailer
+    output_file.write(
+        b'trailer\n' + serialize_pdf_object(new_trailer)
+        + '\nstartxref\n{}\n%%EOF\n'.format(xref_offset).encode('ascii')
+    )
+
+    # Return True
+    return True
+
+
+#
+def open_decrypted_pdf(
+    pdf_file,
+    password=None,
+    max_memory_size=DEFAULT_MAX_MEMORY_SIZE,
+):
+    """
+    Open a decrypted copy of a PDF file if it is encrypted, so that both
+    bookmark extraction and output writing read it without decrypting again.
+
+    @param pdf_file: PDF file.
+
+    @param password: PDF file's password.
+
+    @param max_memory_size: Max size in bytes of the copy kept in memory.
+    Larger copies spill to a temporary file.
+
+    @return: A file object of the decrypted copy, or the PDF file itself if
+    it is not encrypted. The file's seek pointer is at beginning.
+    """
+    # Create spooled temporary file
+    decrypted_file = tempfile.SpooledTemporaryFile(max_size=max_memory_size)
+
+    # If the file is encrypted and the decrypted copy is written
+    if write_decrypted_pdf(pdf_file, decrypted_file, password=password):
+        # Set decrypted file seek pointer to beginning
+        decrypted_file.seek(0)
+
+        # Return the decrypted file
+        return decrypted_file
+
+    # Close the temporary file
+    decrypted_file.close()
+
+    # Set input file seek pointer to beginning
+    pdf_file.seek(0)
+
+    # Return the input file
+    return pdf_file
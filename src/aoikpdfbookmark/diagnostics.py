@@ -0,0 +1,231 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import json
+
+
+# Level name to level number
+LEVEL_NAME_TO_NUM = {
+    'debug': 10,
+    'info': 20,
+    'warning': 30,
+    'error': 40,
+}
+
+
+#
+class BufferedWriter(object):
+    """
+    Writer that buffers text and writes it to the underlying file in large
+    chunks, instead of one write per line.
+    """
+
+    def __init__(self, output_file, buffer_size=65536):
+        """
+        Initialize object.
+
+        @param output_file: Underlying file object.
+
+        @param buffer_size: Number of characters buffered before writing.
+
+        @return: None.
+        """
+        # Underlying file object
+        self.output_file = output_file
+
+        # Number of characters buffered before writing
+        self.buffer_size = buffer_size
+
+        # A list of buffered texts
+        self.text_s = []
+
+        # Number of buffered characters
+        self.text_size = 0
+
+    def write(self, text):
+        """
+        Write text.
+
+        @param text: Text to write.
+
+        @return: None.
+        """
+        # Buffer the text
+        self.text_s.append(text)
+
+        self.text_size += len(text)
+
+        # If the buffer is full
+        if self.text_size >= self.buffer_size:
+            # Write buffered texts
+            self.flush()
+
+    def flush(self):
+        """
+        Write buffered texts to the underlying file.
+
+        @return: None.
+        """
+        # If have buffered texts
+        if self.text_s:
+            # Write buffered texts at once
+            self.output_file.write(''.join(self.text_s))
+
+            # Clear the buffer
+            self.text_s = []
+
+            self.text_size = 0
+
+        # Flush the underlying file
+        self.output_file.flush()
+
+
+#
+class DiagnosticLog(object):
+    """
+    Buffered, structured diagnostics channel passed to textline handlers as
+    "info['log']".
+
+    Records below the log level are dropped at the cost of one comparison.
+    Other records are buffered and written in batches. In text mode a record
+    is written as its message. In JSON mode a record is written as a JSON
+    object with keys "level", "msg", and the record's fields.
+    """
+
+    def __init__(
+        self,
+        output_file=None,
+        level='info',
+        json_format=False,
+        batch_size=100,
+    ):
+        """
+        Initialize object.
+
+        @param output_file: File object to write records to. None means the
+        log is off.
+
+        @param level: Min level name of records to write. One of "debug",
+        "info", "warning" and "error". Default is "info".
+
+        @param json_format: Whether write records as JSON objects. Default is
+        False.
+
+        @param batch_size: Number of records buffered before writing.
+
+        @return: None.
+        """
+        # File object
+        self.output_file = output_file
+
+        # Min level number. Records are dropped if the log is off.
+        self.level_num = LEVEL_NAME_TO_NUM[level] \
+            if output_file is not None else float('inf')
+
+        # Whether write records as JSON objects
+        self.json_format = json_format
+
+        # Number of records buffered before writing
+        self.batch_size = batch_size
+
+        # A list of buffered record texts
+        self.record_text_s = []
+
+    def is_enabled(self, level):
+        """
+        Test whether records of a level are written. Handlers can use it to
+        skip building expensive messages.
+
+        @param level: Level name.
+
+        @return: Boolean.
+        """
+        # Return whether records of the level are written
+        return LEVEL_NAME_TO_NUM[level] >= self.level_num
+
+    def log(self, level, msg, **fields):
+        """
+        Add a record.
+
+        @param level: Level name.
+
+        @param msg: Message.
+
+        @param fields: Record fields, used in JSON mode.
+
+        @return: None.
+        """
+        # If the level is below min level
+        if LEVEL_NAME_TO_NUM[level] < self.level_num:
+            # Drop the record
+            return
+
+        # If write records as JSON objects
+        if self.json_format:
+            # Get record dict
+            record = dict(fields)
+
+            record['level'] = level
+
+            record['msg'] = msg.rstrip('\n')
+
+            # Get record text
+            record_text = json.dumps(record, sort_keys=True, default=str)
+        # If write records as text
+        else:
+            # Get record text
+            record_text = msg.rstrip('\n')
+
+        # Buffer the record text
+        self.record_text_s.append(record_text)
+
+        # If the buffer is full
+        if len(self.record_text_s) >= self.batch_size:
+            # Write buffered records
+            self.flush()
+
+    def debug(self, msg, **fields):
+        """
+        Add a debug record. See method "log".
+        """
+        self.log('debug', msg, **fields)
+
+    def info(self, msg, **fields):
+        """
+        Add an info record. See method "log".
+        """
+        self.log('info', msg, **fields)
+
+    def warning(self, msg, **fields):
+        """
+        Add a warning record. See method "log".
+        """
+        self.log('warning', msg, **fields)
+
+    def error(self, msg, **fields):
+        """
+        Add an error record. See method "log".
+        """
+        self.log('error', msg, **fields)
+
+    def flush(self):
+        """
+        Write buffered records.
+
+        @return: None.
+        """
+        # If have buffered records
+        if self.record_text_s:
+            # Write buffered records at once
+            self.output_file.write('\n'.join(self.record_text_s) + '\n')
+
+            # Clear the buffer
+            self.record_text_s = []
+
+            # Flush the file
+            self.output_file.flush()
+
+
+# Log that is off, used when no log is given
+NULL_LOG = DiagnosticLog(output_file=None)
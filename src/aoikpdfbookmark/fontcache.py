@@ -0,0 +1,540 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import hashlib
+import marshal
+import os
+import os.path
+import tempfile
+import threading
+
+import pdfminer
+from pdfminer import pdffont
+from pdfminer.cmapdb import CMapDB
+from pdfminer.cmapdb import FileUnicodeMap
+from pdfminer.pdfinterp import PDFResourceManager
+from pdfminer.pdftypes import PDFObjRef
+from pdfminer.pdftypes import PDFStream
+from pdfminer.psparser import PSLiteral
+
+from .lrucache import LRUCache
+
+
+# Environment variable that gives default cache directory path
+CACHE_DIR_ENV_NAME = 'AOIKPDFBOOKMARK_CACHE_DIR'
+
+# Max depth when walking a font spec to compute its key
+_FONT_KEY_MAX_DEPTH = 8
+
+# Default max number of font objects cached in-process
+FONT_CACHE_SIZE = 256
+
+# Installed font cache. None means not installed.
+_INSTALLED_FONT_CACHE = None
+
+
+#
+def _read_marshal_file(file_path):
+    """
+    Read a marshal file.
+
+    @param file_path: Marshal file path.
+
+    @return: Loaded data, or None if the file not exists or is corrupted.
+    """
+    #
+    try:
+        # Open the file
+        with open(file_path, 'rb') as marshal_file:
+            # Load data. Loading copies all data into objects, so the file is
+            # read plainly instead of being memory-mapped.
+            return marshal.load(marshal_file)
+    # If the file not exists, is empty, or is corrupted
+    except (IOError, OSError, ValueError, EOFError, TypeError):
+        # Return None
+        return None
+
+
+#
+def _write_marshal_file(file_path, data):
+    """
+    Write a marshal file atomically, so that concurrent processes never read
+    a partially written file.
+
+    @param file_path: Marshal file path.
+
+    @param data: Data to write.
+
+    @return: None.
+    """
+    # Get directory path
+    dir_path = os.path.dirname(file_path)
+
+    # If the directory not exists
+    if not os.path.isdir(dir_path):
+        #
+        try:
+            # Create the directory
+            os.makedirs(dir_path)
+        # If the directory is created by another process
+        except OSError:
+            # Ignore
+            pass
+
+    # Create a temporary file in the same directory
+    fd, temp_path = tempfile.mkstemp(dir=dir_path, suffix='.tmp')
+
+    #
+    try:
+        # Write data to the temporary file
+        with os.fdopen(fd, 'wb') as temp_file:
+            marshal.dump(data, temp_file)
+
+        # Rename the temporary file to the target path.
+        # "os.replace" overwrites existing file on Windows too.
+        getattr(os, 'replace', os.rename)(temp_path, file_path)
+    except Exception:
+        #
+        try:
+            # Remove the temporary file
+            os.remove(temp_path)
+        except OSError:
+            # Ignore
+            pass
+
+        # Raise error
+        raise
+
+
+#
+class FontCache(object):
+    """
+    Cache of decoded CMaps, ToUnicode maps and font objects.
+
+    Predefined CMaps and parsed ToUnicode maps are stored on disk as
+    marshal files, so they are shared by processes using the same cache
+    directory.
+
+    Font objects are cached in-process, keyed by a hash of the font program
+    and font spec, so that documents sharing fonts reuse font objects. Only
+    the most recently used font objects are kept, so long-lived processes
+    take bounded memory.
+    """
+
+    def __init__(self, cache_dir, max_fonts=FONT_CACHE_SIZE):
+        """
+        Initialize object.
+
+        @param cache_dir: Cache directory path.
+
+        @param max_fonts: Max number of font objects cached in-process.
+
+        @return: None.
+        """
+        # Cache directory path
+        self.cache_dir = cache_dir
+
+        # Version tag of cached files, to invalidate on pdfminer upgrade
+        self.version_tag = getattr(pdfminer, '__version__', 'unknown')
+
+        # A dict that maps font key to font object, keeping most recently
+        # used entries
+        self.font_s = LRUCache(max_fonts)
+
+        # Lock for font objects dict. Reading also reorders entries.
+        self.font_lock = threading.Lock()
+
+    def get_file_path(self, kind, name):
+        """
+        Get cache file path.
+
+        @param kind: Cache kind, used as sub directory name.
+
+        @param name: Cache entry name.
+
+        @return: Cache file path.
+        """
+        # Return cache file path
+        return os.path.join(
+            self.cache_dir,
+            kind,
+            '{}.{}.marshal'.format(name, self.version_tag),
+        )
+
+    def load_cmap_data(self, name, load_func):
+        """
+        Load predefined CMap data, from disk cache if cached.
+
+        @param name: CMap name.
+
+        @param load_func: Original loading function that returns a class
+        whose attributes are the CMap data.
+
+        @return: A class whose attributes are the CMap data.
+        """
+        # Get cache file path
+        file_path = self.get_file_path('cmap', name)
+
+        # Read cached data
+        data = _read_marshal_file(file_path)
+
+        # If not cached
+        if data is None:
+            # Load via original function
+            data_cls = load_func(name)
+
+            # Get data dict, without class internals
+            data = dict(
+                (key, value) for key, value in vars(data_cls).items()
+                if not key.startswith('__')
+            )
+
+            # Write cache file
+            _write_marshal_file(file_path, data)
+
+            # Return the loaded class
+            return data_cls
+
+        # Return a class whose attributes are the cached data
+        return type(str(name), (), data)
+
+    def load_unicode_map(self, unicode_map, data, parse_func):
+        """
+        Load a ToUnicode map, from disk cache if cached.
+
+        @param unicode_map: FileUnicodeMap object to fill.
+
+        @param data: ToUnicode stream data.
+
+        @param parse_func: Original parsing function that fills the map.
+
+        @return: None.
+        """
+        # Get cache entry name
+        name = hashlib.sha1(data).hexdigest()
+
+        # Get cache file path
+        file_path = self.get_file_path('tounicode', name)
+
+        # Read cached data
+        cid2unichr = _read_marshal_file(file_path)
+
+        # If cached
+        if cid2unichr is not None:
+            # Fill the map
+            unicode_map.cid2unichr = cid2unichr
+
+            # Return
+            return
+
+        # Parse the stream data
+        parse_func()
+
+        # Write cache file
+        _write_marshal_file(file_path, unicode_map.cid2unichr)
+
+    def get_font(self, spec, create_func):
+        """
+        Get a font object, from in-process cache if cached.
+
+        @param spec: Font spec dict.
+
+        @param create_func: Function that creates the font object.
+
+        @return: Font object.
+        """
+        # Get font key
+        font_key = get_font_key(spec)
+
+        # Get cached font
+        with self.font_lock:
+            font = self.font_s[font_key] if font_key in self.font_s else None
+
+        # If not cached
+        if font is None:
+            # Create font
+            font = create_func()
+
+            #
+            with self.font_lock:
+                # If the font is cached by another thread meanwhile
+                if font_key in self.font_s:
+                    # Use the cached font
+                    font = self.font_s[font_key]
+                # If the font is not cached
+                else:
+                    # Cache the font
+                    self.font_s[font_key] = font
+
+        # Return the font
+        return font
+
+
+#
+def _update_font_key_hash(hash_obj, obj, depth):
+    """
+    Update font key hash with a font spec object.
+
+    Streams contribute a hash of their decoded data, so the key does not
+    depend on whether pdfminer has decoded the stream already, which drops
+    its raw data, or on the document's encryption.
+
+    @param hash_obj: Hash object.
+
+    @param obj: Font spec object.
+
+    @param depth: Current depth.
+
+    @return: None.
+    """
+    # If max depth is reached
+    if depth > _FONT_KEY_MAX_DEPTH:
+        # Stop walking
+        hash_obj.update(b'^')
+
+        # Return
+        return
+
+    # If the object is a reference
+    if isinstance(obj, PDFObjRef):
+        # Resolve the reference
+        obj = obj.resolve()
+
+    # If the object is a stream
+    if isinstance(obj, PDFStream):
+        # Update with stream's decoded data hash
+        hash_obj.update(b'S')
+
+        hash_obj.update(hashlib.sha1(obj.get_data() or b'').digest())
+
+        # Update with stream's attributes
+        _update_font_key_hash(hash_obj, obj.attrs, depth + 1)
+
+    # If the object is a dict
+    elif isinstance(obj, dict):
+        # Update with sorted items
+        hash_obj.update(b'{')
+
+        # For each key
+        for key in sorted(obj, key=str):
+            # Skip parent links that would walk the whole document
+            if key in ('Parent', 'P'):
+                continue
+
+            # Update with key and value
+            hash_obj.update(str(key).encode('utf-8'))
+
+            _update_font_key_hash(hash_obj, obj[key], depth + 1)
+
+        hash_obj.update(b'}')
+
+    # If the object is a list
+    elif isinstance(obj, (list, tuple)):
+        # Update with items
+        hash_obj.update(b'[')
+
+        # For each item
+        for item in obj:
+            # Update with the item
+            _update_font_key_hash(hash_obj, item, depth + 1)
+
+        hash_obj.update(b']')
+
+    # If the object is a name
+    elif isinstance(obj, PSLiteral):
+        # Update with name
+        hash_obj.update(b'/')
+
+        hash_obj.update(repr(obj.name).encode('utf-8'))
+
+    # If the object is a string
+    elif isinstance(obj, bytes):
+        # Update with string
+        hash_obj.update(b'(')
+
+        hash_obj.update(obj)
+
+        hash_obj.update(b')')
+
+    # If the object is a number or other value
+    else:
+        # Update with its representation
+        hash_obj.update(repr(obj).encode('utf-8'))
+
+
+#
+def get_font_key(spec):
+    """
+    Get key of a font spec, based on hashes of the font program and other
+    streams and the spec's values, so that embedded subsets with the same
+    name in different documents do not collide.
+
+    @param spec: Font spec dict.
+
+    @return: Font key.
+    """
+    # Create hash object
+    hash_obj = hashlib.sha1()
+
+    # Update with the spec
+    _update_font_key_hash(hash_obj, spec, 0)
+
+    # Return font key
+    return hash_obj.hexdigest()
+
+
+#
+class CachingResourceManager(PDFResourceManager):
+    """
+    Resource manager that gets font objects from a font cache shared by
+    documents.
+    """
+
+    def __init__(self, font_cache, caching=True):
+        """
+        Initialize object.
+
+        @param font_cache: FontCache object.
+
+        @param caching: Whether cache resources within the document.
+
+        @return: None.
+        """
+        # Call super method
+        PDFResourceManager.__init__(self, caching=caching)
+
+        # Font cache
+        self.font_cache = font_cache
+
+    def get_font(self, objid, spec):
+        """
+        Get a font object.
+
+        @param objid: Font object ID in current document. Can be None.
+
+        @param spec: Font spec dict.
+
+        @return: Font object.
+        """
+        # If the font is cached for current document
+        if objid and objid in self._cached_fonts:
+            # Return the font
+            return self._cached_fonts[objid]
+
+        # Get the font from font cache
+        font = self.font_cache.get_font(
+            spec,
+            lambda: PDFResourceManager.get_font(self, None, spec),
+        )
+
+        # If object ID is given and caching is on
+        if objid and self.caching:
+            # Cache the font for current document
+            self._cached_fonts[objid] = font
+
+        # Return the font
+        return font
+
+
+#
+def install_font_cache(cache_dir):
+    """
+    Install a font cache so that predefined CMaps and ToUnicode maps are
+    loaded from disk cache, and resource managers from
+    "create_resource_manager" share font objects.
+
+    @param cache_dir: Cache directory path.
+
+    @return: FontCache object.
+    """
+    global _INSTALLED_FONT_CACHE
+
+    # Create font cache
+    font_cache = FontCache(cache_dir)
+
+    # Get original CMap data loading function, unwrapped if installed before
+    original_load_data = getattr(
+        CMapDB, '_aoikpdfbookmark_original_load_data', CMapDB._load_data)
+
+    # Create CMap data loading function that uses the cache
+    def load_data(klass, name):
+        # Load via the cache
+        return font_cache.load_cmap_data(name, original_load_data)
+
+    # Store the original function
+    CMapDB._aoikpdfbookmark_original_load_data = original_load_data
+
+    # Replace CMap data loading function
+    CMapDB._load_data = classmethod(load_data)
+
+    # Get original CMap parser class, unwrapped if installed before
+    original_parser_cls = getattr(
+        pdffont, '_aoikpdfbookmark_original_cmap_parser', pdffont.CMapParser)
+
+    # Create CMap parser factory that uses the cache for ToUnicode maps
+    def cmap_parser_factory(cmap, fp, *args, **kwargs):
+        # Create original parser
+        parser = original_parser_cls(cmap, fp, *args, **kwargs)
+
+        # If the map is not a ToUnicode map, or the stream data is not known
+        if not isinstance(cmap, FileUnicodeMap) or \
+                not hasattr(fp, 'getvalue'):
+            # Return original parser
+            return parser
+
+        # Store original parsing function
+        original_run = parser.run
+
+        # Create parsing function that uses the cache
+        def run():
+            # Load via the cache
+            font_cache.load_unicode_map(cmap, fp.getvalue(), original_run)
+
+        # Replace parsing function
+        parser.run = run
+
+        # Return the parser
+        return parser
+
+    # Store the original class
+    pdffont._aoikpdfbookmark_original_cmap_parser = original_parser_cls
+
+    # Replace CMap parser used by fonts
+    pdffont.CMapParser = cmap_parser_factory
+
+    # Clear in-process CMap caches so that later loads go through the cache
+    CMapDB._cmap_cache.clear()
+
+    CMapDB._umap_cache.clear()
+
+    # Store installed font cache
+    _INSTALLED_FONT_CACHE = font_cache
+
+    # Return the font cache
+    return font_cache
+
+
+#
+def create_resource_manager(font_cache=None):
+    """
+    Create a resource manager that uses the given font cache, or the
+    installed font cache, if any.
+
+    @param font_cache: FontCache object whose font objects are shared with
+    other resource managers using it. None means the installed font cache.
+
+    @return: Resource manager object.
+    """
+    # If font cache is not given
+    if font_cache is None:
+        # Use the installed font cache. Can be None.
+        font_cache = _INSTALLED_FONT_CACHE
+
+    # If have font cache
+    if font_cache is not None:
+        # Return caching resource manager
+        return CachingResourceManager(font_cache)
+
+    # Return normal resource manager
+    return PDFResourceManager(caching=True)
@@ -0,0 +1,212 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from .bookmark import format_bookmark_line
+from .pdfparser import parse_pdf
+from .textscan import scan_text
+
+
+#
+def cluster_font_sizes(
+    size_char_count_s,
+    max_levels=3,
+    min_ratio=1.1,
+    tolerance=0.04,
+):
+    """
+    Cluster font sizes into body text size and heading levels.
+
+    The body text size is the size with the most characters. Sizes at least
+    "min_ratio" times the body text size are heading sizes. Heading sizes
+    within "tolerance" of each other are in the same level. The largest sizes
+    are level 0.
+
+    @param size_char_count_s: A dict that maps font size to character count.
+
+    @param max_levels: Max number of heading levels.
+
+    @param min_ratio: Min ratio of heading size to body text size.
+
+    @param tolerance: Max relative difference of sizes in the same level.
+
+    @return: A (body text size, level ranges) tuple. Level ranges is a list of
+    (min size, max size) tuples, index is zero-based level.
+    """
+    # If no size
+    if not size_char_count_s:
+        # Return no body text size and no level
+        return None, []
+
+    # Get body text size, i.e. the size with the most characters
+    body_size = max(
+        size_char_count_s, key=lambda size: size_char_count_s[size])
+
+    # Get heading sizes in descending order
+    heading_size_s = sorted(
+        (size for size in size_char_count_s if size >= body_size * min_ratio),
+        reverse=True,
+    )
+
+    # A list of (min size, max size) tuples
+    level_range_s = []
+
+    # For each heading size
+    for size in heading_size_s:
+        # If the size is close to current level's max size
+        if level_range_s and size >= level_range_s[-1][1] * (1 - tolerance):
+            # Extend current level
+            level_range_s[-1] = (size, level_range_s[-1][1])
+        # If the size begins a new level
+        else:
+            # If max number of levels is reached
+            if len(level_range_s) >= max_levels:
+                # Stop clustering
+                break
+
+            # Add a new level
+            level_range_s.append((size, size))
+
+    # Return body text size and level ranges
+    return body_size, level_range_s
+
+
+#
+def get_size_level(size, level_range_s):
+    """
+    Get heading level of a font size.
+
+    @param size: Font size.
+
+    @param level_range_s: Level ranges from "cluster_font_sizes".
+
+    @return: Zero-based heading level, or None if not a heading size.
+    """
+    # Round the size the same way as the statistics
+    size = round(size, 1)
+
+    # For each level
+    for level, (min_size, max_size) in enumerate(level_range_s):
+        # If the size is in the level's range
+        if min_size <= size <= max_size:
+            # Return the level
+            return level
+
+    # Return None
+    return None
+
+
+#
+def extract_font_level_bookmarks(
+    pdf_file,
+    npages=None,
+    password=None,
+    max_levels=3,
+    stats_func=None,
+):
+    """
+    Generate nested bookmark lines by clustering document-wide font sizes into
+    heading levels.
+
+    The first pass collects font size statistics without layout analysis.
+    The second pass runs layout analysis only on pages that have heading
+    sizes, and bookmarks lines whose first character has a heading size.
+
+    @param pdf_file: PDF file to parse.
+
+    @param npages: Max number of pages to process. 0 or None means all pages.
+
+    @param password: PDF file's password.
+
+    @param max_levels: Max number of heading levels.
+
+    @param stats_func: A function called with the font statistics dict after
+    the first pass. The dict has these entries:
+    {
+        'body_size': Body text size.
+        'level_ranges': Level ranges from "cluster_font_sizes".
+        'font_char_counts': A dict that maps (font name, font size) to
+        character count.
+    }
+
+    @return: A list of bookmark lines, indented by nesting level.
+    """
+    # Collect font size statistics without layout analysis
+    device = scan_text(
+        pdf_file=pdf_file,
+        npages=npages,
+        password=password,
+    )
+
+    # Cluster font sizes into heading levels
+    body_size, level_range_s = cluster_font_sizes(
+        device.size_char_count_s,
+        max_levels=max_levels,
+    )
+
+    # If statistics function is given
+    if stats_func is not None:
+        # Call the statistics function
+        stats_func({
+            'body_size': body_size,
+            'level_ranges': level_range_s,
+            'font_char_counts': device.font_char_count_s,
+        })
+
+    # Get heading sizes
+    heading_size_s = set(
+        size for size in device.size_char_count_s
+        if get_size_level(size, level_range_s) is not None
+    )
+
+    # Get candidate pages that have heading sizes
+    page_num_s = [
+        page_num for page_num, size_s in device.page_size_s.items()
+        if size_s & heading_size_s
+    ]
+
+    # A list of bookmark lines
+    bookmark_line_s = []
+
+    # Create textline handler
+    def handler(info):
+        # Get first character item from the line item
+        char1 = next(iter(info['line_item']))
+
+        # Get heading level of the character's size
+        level = get_size_level(char1.size, level_range_s)
+
+        # If the size is not a heading size
+        if level is None:
+            # Ignore the line
+            return None
+
+        # Get bookmark title.
+        # Replace consecutive white spaces into one space.
+        title = ' '.join(info['line_text'].split())
+
+        # If the title is empty
+        if not title:
+            # Ignore the line
+            return None
+
+        # Add bookmark line
+        bookmark_line_s.append(format_bookmark_line(
+            info['page_num'], int(char1.y1), title, level=level))
+
+    # If have candidate pages
+    if page_num_s:
+        # Set input file seek pointer to beginning
+        pdf_file.seek(0)
+
+        # Run layout analysis on candidate pages only
+        parse_pdf(
+            pdf_file=pdf_file,
+            handler=handler,
+            npages=npages,
+            password=password,
+            page_nums=page_num_s,
+        )
+
+    # Return bookmark lines
+    return bookmark_line_s
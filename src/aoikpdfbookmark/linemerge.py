@@ -0,0 +1,120 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+
+#
+def get_line_font(line_item):
+    """
+    Get font name and size of a line's first character.
+
+    @param line_item: LTTextLine item.
+
+    @return: A (font name, font size) tuple, or None if the line has no
+    character.
+    """
+    # For each child item in the line item
+    for char_item in line_item:
+        # Get font name
+        fontname = getattr(char_item, 'fontname', None)
+
+        # If the child item is a character item
+        if fontname is not None:
+            # Return font name and rounded font size
+            return fontname, round(char_item.size, 1)
+
+    # Return None
+    return None
+
+
+#
+class LineMerger(object):
+    """
+    Pipeline stage that merges wrapped lines of a heading into one logical
+    line before they are passed to the textline handler.
+
+    Lines are merged in a single linear pass over a page's lines sorted top
+    to bottom. A line joins the group above it if both have the same font name
+    and size, the vertical gap between them is small, and they overlap
+    horizontally.
+    """
+
+    def __init__(self, min_size=0, max_gap_ratio=0.6):
+        """
+        Initialize object.
+
+        @param min_size: Min font size of lines to merge. Smaller lines, e.g.
+        body text, are never merged.
+
+        @param max_gap_ratio: Max vertical gap between merged lines, as a ratio
+        of font size.
+
+        @return: None.
+        """
+        # Min font size of lines to merge
+        self.min_size = min_size
+
+        # Max vertical gap ratio
+        self.max_gap_ratio = max_gap_ratio
+
+    def merge(self, line_items):
+        """
+        Merge lines into groups.
+
+        @param line_items: LTTextLine items sorted top to bottom.
+
+        @return: A list of merged groups. Each group is a list of LTTextLine
+        items, top line first. Only groups of more than one line are returned.
+        """
+        # A list of merged groups
+        group_s = []
+
+        # Current group
+        group = None
+
+        # Font of current group
+        group_font = None
+
+        # For each line item, top to bottom
+        for line_item in line_items:
+            # Get the line's font
+            font = get_line_font(line_item)
+
+            # If the line has no font or is smaller than min size
+            if font is None or font[1] < self.min_size:
+                # End current group
+                group = None
+
+                # Handle next line
+                continue
+
+            # If current group exists and has the same font
+            if group is not None and font == group_font:
+                # Get last line of the group
+                last_item = group[-1]
+
+                # Get the vertical gap
+                gap = last_item.y0 - line_item.y1
+
+                # If the gap is small and the lines overlap horizontally
+                if -0.5 * font[1] <= gap <= self.max_gap_ratio * font[1] \
+                        and line_item.x0 < last_item.x1 \
+                        and last_item.x0 < line_item.x1:
+                    # If the group is not added yet
+                    if len(group) == 1:
+                        # Add the group
+                        group_s.append(group)
+
+                    # Add the line to the group
+                    group.append(line_item)
+
+                    # Handle next line
+                    continue
+
+            # Begin a new group
+            group = [line_item]
+
+            group_font = font
+
+        # Return merged groups
+        return group_s
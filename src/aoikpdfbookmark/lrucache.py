@@ -0,0 +1,59 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from collections import OrderedDict
+
+
+#
+class LRUCache(OrderedDict):
+    """
+    Dict that keeps at most a number of most recently set or read entries.
+
+    Used in place of unbounded caches, e.g. pdfminer document's object caches
+    while decrypting, and font objects of a font cache.
+    """
+
+    def __init__(self, max_size, *args, **kwargs):
+        """
+        Initialize object.
+
+        @param max_size: Max number of entries.
+
+        @return: None.
+        """
+        # Max number of entries
+        self.max_size = max_size
+
+        # Call super method
+        OrderedDict.__init__(self, *args, **kwargs)
+
+    def __getitem__(self, key):
+        """
+        Get an entry, marking it as most recently used.
+        """
+        # Remove the entry
+        value = OrderedDict.pop(self, key)
+
+        # Add the entry back at the end
+        OrderedDict.__setitem__(self, key, value)
+
+        # Return the value
+        return value
+
+    def __setitem__(self, key, value):
+        """
+        Set an entry, evicting least recently used entries if full.
+        """
+        # If the entry exists
+        if key in self:
+            # Remove the entry, so it is added back at the end
+            OrderedDict.__delitem__(self, key)
+
+        # Call super method
+        OrderedDict.__setitem__(self, key, value)
+
+        # While the cache is full
+        while len(self) > self.max_size:
+            # Evict least recently used entry
+            self.popitem(last=False)
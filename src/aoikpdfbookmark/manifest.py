@@ -0,0 +1,279 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import os.path
+
+from .aoikimportutil import write_file_atomic
+from .checkpoint import get_file_fingerprint
+
+
+# Manifest file format version
+MANIFEST_VERSION = 2
+
+# Number of PBKDF2 iterations of output password hashes
+PASSWD_HASH_ITERATIONS = 100000
+
+# Size in bytes of output password hash salts
+PASSWD_SALT_SIZE = 16
+
+
+#
+def get_bookmark_specs_hash(bookmark_specs):
+    """
+    Get hash of bookmark specs.
+
+    @param bookmark_specs: A list of bookmark specs.
+
+    @return: Hash text.
+    """
+    # Get specs as JSON text
+    specs_text = json.dumps(
+        [list(bookmark_spec) for bookmark_spec in bookmark_specs],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+
+    # Return hash text
+    return hashlib.sha1(specs_text.encode('utf-8')).hexdigest()
+
+
+#
+def get_output_file_id(input_hash, bookmarks_hash, options):
+    """
+    Get output PDF file's identifier, derived from everything the output
+    depends on, so that writing the same output twice gives the same bytes.
+
+    @param input_hash: Input file fingerprint.
+
+    @param bookmarks_hash: Bookmark specs hash.
+
+    @param options: A dict of writer options.
+
+    @return: File identifier bytes.
+    """
+    # Get key text
+    key_text = json.dumps(
+        [input_hash, bookmarks_hash, options],
+        sort_keys=True,
+    )
+
+    # Return file identifier bytes
+    return hashlib.md5(key_text.encode('utf-8')).digest()
+
+
+#
+def get_password_hash(password, salt):
+    """
+    Get salted hash of an output password, slow to brute-force.
+
+    @param password: Password text.
+
+    @param salt: Salt bytes.
+
+    @return: Hash text.
+    """
+    # Return hash text
+    return binascii.hexlify(hashlib.pbkdf2_hmac(
+        'sha256',
+        password.encode('utf-8'),
+        salt,
+        PASSWD_HASH_ITERATIONS,
+    )).decode('ascii')
+
+
+#
+class Manifest(object):
+    """
+    File that records, for each output file produced, the input file hash,
+    bookmark specs hash, writer options, and output file hash, so that
+    unchanged outputs are not rewritten.
+
+    Output password is not a writer option. It is recorded as a salted hash
+    with a random salt kept in the entry.
+    """
+
+    def __init__(self, file_path):
+        """
+        Initialize object.
+
+        @param file_path: Manifest file path.
+
+        @return: None.
+        """
+        # Manifest file path
+        self.file_path = file_path
+
+        # A dict that maps output file's absolute path to entry dict
+        self.entry_s = {}
+
+    def load(self):
+        """
+        Load the manifest file. Missing file or other version means no
+        entries.
+
+        @return: None.
+        """
+        # If the file not exists
+        if not os.path.isfile(self.file_path):
+            # Keep no entries
+            return
+
+        # Read the file
+        with open(self.file_path, 'rb') as manifest_file:
+            data = json.loads(manifest_file.read().decode('utf-8'))
+
+        # If the manifest is for this version
+        if data.get('version') == MANIFEST_VERSION:
+            # Load entries
+            self.entry_s = data.get('outputs', {})
+
+    def save(self):
+        """
+        Save the manifest file atomically.
+
+        @return: None.
+        """
+        # Get data
+        data = {
+            'version': MANIFEST_VERSION,
+            'outputs': self.entry_s,
+        }
+
+        # Write the file atomically
+        write_file_atomic(
+            self.file_path,
+            json.dumps(
+                data, ensure_ascii=False, indent=2, sort_keys=True
+            ).encode('utf-8'),
+        )
+
+    def is_up_to_date(
+        self,
+        output_file_path,
+        input_hash,
+        bookmarks_hash,
+        options,
+        password=None,
+    ):
+        """
+        Test whether an output file is produced from the same input file,
+        bookmarks, options, and output password, and is unchanged since.
+
+        @param output_file_path: Output file path.
+
+        @param input_hash: Input file fingerprint.
+
+        @param bookmarks_hash: Bookmark specs hash.
+
+        @param options: A dict of writer options.
+
+        @param password: Output password. None means not encrypted.
+
+        @return: Boolean.
+        """
+        # Get entry
+        entry = self.entry_s.get(os.path.abspath(output_file_path))
+
+        # If no entry, or the entry is for other input, bookmarks, or options
+        if entry is None \
+                or entry.get('input_hash') != input_hash \
+                or entry.get('bookmarks_hash') != bookmarks_hash \
+                or entry.get('options') != options:
+            # Return False
+            return False
+
+        # If the entry is for other output password
+        if not self._match_password(entry, password):
+            # Return False
+            return False
+
+        # If the output file not exists
+        if not os.path.isfile(output_file_path):
+            # Return False
+            return False
+
+        # Return whether the output file is unchanged
+        return get_file_fingerprint(output_file_path) \
+            == entry.get('output_hash')
+
+    @staticmethod
+    def _match_password(entry, password):
+        """
+        Test whether an entry is for an output password.
+
+        @param entry: Entry dict.
+
+        @param password: Output password. None means not encrypted.
+
+        @return: Boolean.
+        """
+        # Get recorded password hash
+        passwd_hash = entry.get('passwd_hash')
+
+        # If no password is recorded, or no password is given
+        if passwd_hash is None or password is None:
+            # Return whether neither is given
+            return passwd_hash is None and password is None
+
+        #
+        try:
+            # Get recorded salt
+            salt = binascii.unhexlify(entry.get('passwd_salt') or '')
+        # If the salt is corrupted
+        except (TypeError, ValueError):
+            # Return False
+            return False
+
+        # Compare hashes in constant time
+        return hmac.compare_digest(
+            get_password_hash(password, salt), passwd_hash)
+
+    def update(
+        self,
+        output_file_path,
+        input_hash,
+        bookmarks_hash,
+        options,
+        password=None,
+    ):
+        """
+        Record an output file just produced.
+
+        @param output_file_path: Output file path.
+
+        @param input_hash: Input file fingerprint.
+
+        @param bookmarks_hash: Bookmark specs hash.
+
+        @param options: A dict of writer options.
+
+        @param password: Output password. None means not encrypted.
+
+        @return: None.
+        """
+        # Get entry
+        entry = {
+            'input_hash': input_hash,
+            'bookmarks_hash': bookmarks_hash,
+            'options': options,
+            'output_hash': get_file_fingerprint(output_file_path),
+        }
+
+        # If output password is given
+        if password is not None:
+            # Get random salt
+            salt = os.urandom(PASSWD_SALT_SIZE)
+
+            # Record the salt and the password's salted hash
+            entry['passwd_salt'] = binascii.hexlify(salt).decode('ascii')
+
+            entry['passwd_hash'] = get_password_hash(password, salt)
+
+        # Store entry
+        self.entry_s[os.path.abspath(output_file_path)] = entry
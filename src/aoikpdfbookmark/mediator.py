@@ -4,15 +4,45 @@ from __future__ import absolute_import
 
 from argparse import ArgumentParser
 from argparse import ArgumentTypeError
+import json
 import os.path
+import signal
 import sys
 import traceback
 
-from .aoikimportutil import load_obj
+from .aoikimportutil import load_obj_local_or_remote
+from .backends import get_extraction_backend_names
 from .bookmark import GENERATE_BOOKMARK_FUNC_CODE
-from .bookmark import parse_bookmarks
+from .bookmark import iter_bookmark_specs
+from .bookmarkio import get_bookmark_format
+from .bookmarkio import get_bookmark_format_names
+from .checkpoint import CHECKPOINT_FILE_SUFFIX
+from .checkpoint import Checkpoint
+from .checkpoint import get_file_fingerprint
+from .decryption import open_decrypted_pdf
+from .diagnostics import BufferedWriter
+from .diagnostics import DiagnosticLog
+from .diagnostics import LEVEL_NAME_TO_NUM
+from .fontcache import CACHE_DIR_ENV_NAME
+from .fontcache import install_font_cache
+from .fontlevels import extract_font_level_bookmarks
+from .linemerge import LineMerger
+from .manifest import get_bookmark_specs_hash
+from .manifest import get_output_file_id
+from .manifest import Manifest
+from .merger import merge_pdfs_with_bookmarks
+from .merger import RULES_URI
 from .pdfmaker import copy_pdf_add_bookmarks
+from .pdfmaker import split_pdf_by_bookmarks
 from .pdfparser import parse_pdf
+from .pipeline import PdfWriterProcess
+from .prescan import inspect_pdf
+from .rules import load_rules
+from .rules import RuleSet
+from .runninglines import find_running_lines
+from .structparser import extract_tagged_bookmarks
+from .tocparser import extract_toc_bookmarks
+from .watcher import watch_handler
 
 
 #
@@ -70,6 +100,88 @@ def get_cmdargs_parser():
         help='Output PDF file path.',
     )
 
+    #
+    parser.add_argument(
+        '--split-by-level',
+        dest='split_level',
+        type=int_ge0,
+        default=0,
+        metavar='N',
+        help="""Write one output PDF file per range of pages starting at a\
+ bookmark of nesting level N or higher, e.g. 1 for top-level chapters. Each\
+ file has its own sub-outline. Output file path is a pattern formatted with\
+ one-based range index, e.g. "chapter_{index:02d}.pdf". 0 means no splitting.\
+ Default is 0.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--pipeline',
+        dest='pipeline_is_on',
+        action='store_true',
+        help="""Pipelined mode that writes output file in a worker process\
+ while bookmarks are being extracted. Pages are copied first, and the outline\
+ and cross-reference table are written once extraction completes. Output file\
+ is written to a temporary file and renamed when finished. Requires\
+ "--output", and can not be used with "--split-by-level".\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--inspect',
+        dest='inspect_is_on',
+        action='store_true',
+        help="""Inspect mode that pre-scans input file without layout\
+ analysis, and prints a JSON object with page count, decoded content stream\
+ bytes per page as estimated parsing cost, a histogram of fonts and declared\
+ font sizes, and text-less pages.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--manifest',
+        dest='manifest_path',
+        default=None,
+        metavar='FILE',
+        help="""Manifest file that records input file hash, bookmarks hash,\
+ writer options, and output file hash of each output file produced. If they\
+ all match and the output file is unchanged, writing is skipped. Output file\
+ bytes then depend only on these, so hashes are stable across runs.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--merge',
+        dest='merge_inputs',
+        nargs=2,
+        action='append',
+        default=None,
+        metavar=('INPUT_FILE', 'FILE_OR_FUNC'),
+        help="""Merge mode that merges input PDF files into output file with\
+ a combined outline. Can be given multiple times, once per input, with the\
+ input's bookmarks file path or bookmark generating function URI. Each input\
+ gets a top-level bookmark titled by its file name, with its bookmarks nested\
+ under it. Use "-" instead of bookmarks to generate the input's bookmarks by\
+ "--rules". Can not be used with "--input".\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--merge-jobs',
+        dest='merge_jobs',
+        type=int_ge0,
+        default=0,
+        metavar='N',
+        help="""Number of worker processes extracting bookmarks of merge\
+ inputs in parallel. 0 means number of CPUs. Default is 0.\
+""",
+    )
+
     #
     parser.add_argument(
         '-b', '--bookmark',
@@ -82,6 +194,37 @@ Bookmarks file path or bookmark generating function URI. Each bookmark line is\
 """
     )
 
+    #
+    parser.add_argument(
+        '--bookmark-format',
+        dest='bookmark_format',
+        default=None,
+        choices=get_bookmark_format_names(),
+        help="""Bookmarks file format. Default is guessed by file extension:\
+ ".jsonl" is jsonl, ".csv" is csv, ".bmk" is binary, others are text.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--save-bookmarks',
+        dest='save_file_path',
+        default=None,
+        metavar='FILE',
+        help='Save bookmarks to file, in addition to printing them.',
+    )
+
+    #
+    parser.add_argument(
+        '--save-format',
+        dest='save_format',
+        default=None,
+        choices=get_bookmark_format_names(),
+        help="""Format of file given by "--save-bookmarks". Default is guessed\
+ by file extension like "--bookmark-format".\
+""",
+    )
+
     #
     parser.add_argument(
         '-e', '--example',
@@ -106,7 +249,22 @@ Bookmarks file path or bookmark generating function URI. Each bookmark line is\
         dest='passwd',
         default=None,
         metavar='PASSWD',
-        help="""Input PDF file's password.""",
+        help="""Input PDF file's password.\
+ An encrypted input file is decrypted once, and both bookmark extraction and\
+ output writing read the decrypted copy.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--output-passwd',
+        dest='output_passwd',
+        default=None,
+        metavar='PASSWD',
+        help="""Encrypt output PDF file with this user password while writing\
+ it. Give the input password to re-encrypt. Only RC4 128-bit encryption is\
+ supported. Default is writing output unencrypted.\
+""",
     )
 
     #
@@ -134,6 +292,246 @@ Bookmarks file path or bookmark generating function URI. Each bookmark line is\
 """,
     )
 
+    #
+    parser.add_argument(
+        '-w', '--watch',
+        dest='watch_is_on',
+        action='store_true',
+        help="""Watch mode that re-runs the bookmark generating function over\
+ cached textlines each time its module file changes, and prints added and\
+ removed bookmark lines.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '-t', '--toc',
+        dest='toc_is_on',
+        action='store_true',
+        help="""TOC mode that generates bookmarks from the printed table of\
+ contents found in the first pages, instead of using argument "--bookmark".\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--toc-npages',
+        dest='toc_npages',
+        type=int_ge0,
+        default=30,
+        metavar='N',
+        help='Number of first pages to look for table of contents in TOC mode.'
+        ' Default is 30.',
+    )
+
+    #
+    parser.add_argument(
+        '--toc-offset',
+        dest='toc_offset',
+        type=int,
+        default=None,
+        metavar='N',
+        help="""Offset from printed page number to physical page number in TOC\
+ mode. Default is finding it by looking for the first entry's heading.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '-S', '--source',
+        dest='source',
+        choices=['layout', 'auto', 'struct', 'outline', 'fontsize'],
+        default='layout',
+        metavar='SOURCE',
+        help="""Where bookmarks are extracted from.\
+ layout: Layout analysis using the bookmark generating function.\
+ struct: Headings in tagged PDF's structure tree.\
+ outline: Existing outlines.\
+ auto: Structure tree, then outlines.\
+ fontsize: Headings whose font sizes are clustered into levels, without\
+ bookmark generating function.\
+ Structure tree and outlines sources fall back to the bookmark generating\
+ function, if given, for documents or pages without that information.\
+ Default is layout.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--backend',
+        dest='backend_name',
+        default=None,
+        choices=get_extraction_backend_names(available_only=False),
+        help="""Extraction backend that finds textlines for the bookmark\
+ generating function. Backends other than pdfminer are used only if their\
+ packages are installed, e.g. "pymupdf" needs "PyMuPDF".\
+ Default is pdfminer.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--skip-textless',
+        dest='skip_textless_is_on',
+        action='store_true',
+        help="""Skip layout analysis of pages without text-showing operators,\
+ e.g. pages of scanned images, found by scanning their content streams\
+ first. The number of pages skipped is printed. pdfminer backend only.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--max-levels',
+        dest='max_levels',
+        type=int_ge0,
+        default=3,
+        metavar='N',
+        help='Max number of heading levels in fontsize source. Default is 3.',
+    )
+
+    #
+    parser.add_argument(
+        '--merge-lines',
+        dest='merge_min_size',
+        type=float,
+        default=None,
+        metavar='MIN_SIZE',
+        help="""Merge wrapped lines whose font sizes are GE MIN_SIZE into one\
+ line before passing them to bookmark generating function or rules. Lines are\
+ merged if they have the same font and size and small vertical gaps. The\
+ merged line has the combined text and the top line's vertical offset.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--running-pages',
+        dest='running_pages',
+        type=int_ge0,
+        default=0,
+        metavar='K',
+        help="""Lines in top and bottom page margins recurring on more than K\
+ pages at the same position are running headers or footers. Lines differing\
+ only in numbers recur if a number follows the page number, e.g. "Page 17",\
+ so numbered headings are kept. Running lines are not passed to bookmark\
+ generating function or rules. Finding them takes a pass over the document\
+ before layout analysis. 0 means not finding running lines. Default is 0.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--keep-running',
+        dest='keep_running_is_on',
+        action='store_true',
+        help="""Pass running headers and footers to bookmark generating\
+ function, flagged by "is_running_line" in the info dict.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '-r', '--rules',
+        dest='rules_path',
+        default=None,
+        metavar='RULES_FILE',
+        help="""Bookmark rules file path, used instead of bookmark generating\
+ function. The file is JSON, or YAML if the file extension is ".yml" or\
+ ".yaml". In merge mode, used for inputs given "-" as bookmarks.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--cache-dir',
+        dest='cache_dir',
+        default=os.environ.get(CACHE_DIR_ENV_NAME) or None,
+        metavar='DIR',
+        help="""Cache directory path. Decoded CMaps, ToUnicode maps, and\
+ bookmark generating modules loaded via HTTP are cached there and shared by\
+ processes using the same directory.\
+ Default is environment variable {}, or no cache.\
+""".format(CACHE_DIR_ENV_NAME),
+    )
+
+    #
+    parser.add_argument(
+        '--offline',
+        dest='offline_is_on',
+        action='store_true',
+        help="""Use cached bookmark generating module instead of downloading\
+ it, if the generating function URI starts with "http://" or "https://".\
+ Requires "--cache-dir".\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--checkpoint',
+        dest='checkpoint_is_on',
+        action='store_true',
+        help="""Periodically save bookmark lines generated so far and the page\
+ to resume at to a checkpoint file, and on interrupt. The file is removed\
+ when the run finishes. Requires layout analysis with a bookmark generating\
+ function or rules file.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--checkpoint-file',
+        dest='checkpoint_file_path',
+        default=None,
+        metavar='FILE',
+        help="""Checkpoint file path. Implies "--checkpoint".\
+ Default is input file path plus "{}".\
+""".format(CHECKPOINT_FILE_SUFFIX),
+    )
+
+    #
+    parser.add_argument(
+        '--checkpoint-interval',
+        dest='checkpoint_interval',
+        type=float,
+        default=30.0,
+        metavar='SECONDS',
+        help="""Min interval in seconds between checkpoint saves.\
+ Default is 30.\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--resume',
+        dest='resume_is_on',
+        action='store_true',
+        help="""Resume from the checkpoint file if it exists, continuing at\
+ the page after the last completed one. Implies "--checkpoint".\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--log-level',
+        dest='log_level',
+        default='info',
+        choices=sorted(LEVEL_NAME_TO_NUM, key=LEVEL_NAME_TO_NUM.get) + ['off'],
+        help="""Min level of diagnostics records the bookmark generating\
+ function adds to "info['log']". Records are written to stderr.\
+ "off" drops all records. Default is "info".\
+""",
+    )
+
+    #
+    parser.add_argument(
+        '--log-json',
+        dest='log_json_is_on',
+        action='store_true',
+        help="""Write diagnostics records as JSON objects, one per line.\
+""",
+    )
+
     # Return an "ArgumentParser" instance
     return parser
 
@@ -187,6 +585,11 @@ def main_core(args=None, step_func=None):
         # Return without error
         return 0
 
+    # If merge mode is on
+    if args.merge_inputs:
+        # Return exit code of merge mode
+        return main_merge(args, step_func)
+
     # Get input file path
     input_file_path = args.input_file_path
 
@@ -215,15 +618,152 @@ def main_core(args=None, step_func=None):
         # Return non-zero exit code
         return 1
 
+    # Get font cache directory path
+    cache_dir = args.cache_dir
+
+    # Get whether offline mode is on
+    offline_is_on = args.offline_is_on
+
+    # If offline mode is on but cache directory path is not given
+    if offline_is_on and not cache_dir:
+        # Get message
+        msg = 'Error: Argument "--offline" requires "--cache-dir".\n'
+
+        # Print message
+        sys.stderr.write(msg)
+
+        # Return non-zero exit code
+        return 1
+
+    # If cache directory path is given
+    if cache_dir:
+        # Install font cache
+        install_font_cache(cache_dir)
+
+    # Get diagnostics log level
+    log_level = args.log_level
+
+    # Create diagnostics log passed to the bookmark generating function.
+    # Records are buffered and written to stderr in batches.
+    log = DiagnosticLog(
+        output_file=sys.stderr if log_level != 'off' else None,
+        level=log_level if log_level != 'off' else 'info',
+        json_format=args.log_json_is_on,
+    )
+
     # Open input file
     input_file = open(input_file_path, mode='rb')
 
+    # Set step info
+    step_func(title='Decrypt input file')
+
+    # If the input file is encrypted, authenticate once and use a decrypted
+    # copy in all stages
+    decrypted_input_file = open_decrypted_pdf(
+        input_file, password=args.passwd)
+
+    # Whether the input file is encrypted and a decrypted copy is used
+    input_is_decrypted = decrypted_input_file is not input_file
+
+    # Use the decrypted copy, or the input file itself if not encrypted
+    input_file = decrypted_input_file
+
+    # The decrypted copy needs no password
+    passwd = None
+
+    # If inspect mode is on
+    if args.inspect_is_on:
+        # Set step info
+        step_func(title='Inspect input file')
+
+        # Pre-scan the input file
+        inspect_result = inspect_pdf(input_file, npages=args.npages)
+
+        # Print the result as JSON
+        sys.stdout.write(
+            json.dumps(inspect_result, indent=2, sort_keys=True) + '\n')
+
+        # Return without error
+        return 0
+
     # Get output file path
     output_file_path = args.output_file_path
 
+    # Get whether watch mode is on
+    watch_is_on = args.watch_is_on
+
+    # If watch mode is on and output path is given
+    if watch_is_on and output_file_path:
+        # Get message
+        msg = 'Error: Argument "--watch" can not be used with "--output".\n'
+
+        # Print message
+        sys.stderr.write(msg)
+
+        # Return non-zero exit code
+        return 1
+
+    # Get nesting level to split output by. 0 means no splitting.
+    split_level = args.split_level
+
+    # If splitting but output path is not a pattern with range index
+    if split_level and '{index' not in (output_file_path or ''):
+        # Get message
+        msg = (
+            'Error: Argument "--split-by-level" requires "--output" to be a'
+            ' path pattern with "{index}", e.g. "chapter_{index:02d}.pdf".\n'
+        )
+
+        # Print message
+        sys.stderr.write(msg)
+
+        # Return non-zero exit code
+        return 1
+
+    # Get manifest file path
+    manifest_path = args.manifest_path
+
+    # If manifest is given but output path is not a single file
+    if manifest_path and (not output_file_path or split_level):
+        # Get message
+        msg = (
+            'Error: Argument "--manifest" requires "--output", and can not be'
+            ' used with "--split-by-level".\n'
+        )
+
+        # Print message
+        sys.stderr.write(msg)
+
+        # Return non-zero exit code
+        return 1
+
+    # Get whether pipelined mode is on
+    pipeline_is_on = args.pipeline_is_on
+
+    # If pipelined mode is on but output path is not a single file
+    if pipeline_is_on and (not output_file_path or split_level):
+        # Get message
+        msg = (
+            'Error: Argument "--pipeline" requires "--output", and can not be'
+            ' used with "--split-by-level".\n'
+        )
+
+        # Print message
+        sys.stderr.write(msg)
+
+        # Return non-zero exit code
+        return 1
+
+    # Get whether generate a PDF file with bookmarks
+    output_is_on = bool(output_file_path) and not split_level
+
+    # If splitting, manifest is given, or pipelined mode is on
+    if split_level or manifest_path or pipeline_is_on:
+        # Output files are opened when written
+        output_file = None
     # If output path is given,
     # it means generate PDF file with bookmarks.
-    if output_file_path:
+    elif output_file_path:
         # Set step info
         step_func(title='Open output file')
 
@@ -241,9 +781,38 @@ def main_core(args=None, step_func=None):
     # Get bookmarks URI
     bookmarks_uri = args.bookmarks_uri
 
-    # If bookmarks URI is not given,
+    # Get rules file path
+    rules_path = args.rules_path
+
+    # If both rules file path and bookmarks URI are given
+    if rules_path and bookmarks_uri:
+        # Get message
+        msg = 'Error: Argument "--rules" can not be used with "--bookmark".\n'
+
+        # Print message
+        sys.stderr.write(msg)
+
+        # Return non-zero exit code
+        return 1
+
+    # If the rules file path not exists
+    if rules_path and not os.path.isfile(rules_path):
+        # Get message
+        msg = 'Error: Rules file path not exists: {}\n'.format(rules_path)
+
+        # Print message
+        sys.stderr.write(msg)
+
+        # Return non-zero exit code
+        return 1
+
+    # Get whether TOC mode is on
+    toc_is_on = args.toc_is_on
+
+    # If bookmarks URI is not given and TOC mode is off,
     # it means use default generating function URI.
-    if not bookmarks_uri:
+    if not bookmarks_uri and not rules_path and not toc_is_on \
+            and args.source == 'layout':
         # Use default generating function URI
         bookmarks_uri = 'aoikpdfbookmark.bookmark::generate_bookmark'
 
@@ -270,129 +839,720 @@ aoikpdfbookmark --input a.pdf --bookmark my_gen.py::generate_bookmark\
         # Return non-zero exit code
         return 1
 
-    # If "::" is in bookmarks URI,
-    # it means it is a bookmarks generating function URI.
-    if '::' in bookmarks_uri:
-        # Set step info
-        step_func(title='Load bookmarks generating function')
+    # If font size source is used with bookmarks URI
+    if args.source == 'fontsize' and (bookmarks_uri or rules_path):
+        # Get message
+        msg = (
+            'Error: Argument "--source fontsize" can not be used with'
+            ' "--bookmark" or "--rules".\n'
+        )
 
-        # Load bookmarks generating function
-        genfunc_mod, genfunc = load_obj(
-            bookmarks_uri, mod_name='aoikpdfbookmark._bookmark', retn_mod=True)
+        # Print message
+        sys.stderr.write(msg)
 
-        # A list of bookmark lines
-        bookmark_line_s = []
+        # Return non-zero exit code
+        return 1
+
+    # If watch mode is on but bookmarks URI is not a local generating function
+    # URI
+    if watch_is_on and (
+        toc_is_on or '::' not in (bookmarks_uri or '')
+        or bookmarks_uri.startswith(('http://', 'https://'))
+    ):
+        # Get message
+        msg = (
+            'Error: Argument "--watch" requires a local bookmarks generating'
+            ' function URI.\n'
+        )
 
-        # Store the original function
-        original_genfunc = genfunc
+        # Print message
+        sys.stderr.write(msg)
 
-        # Create a wrapping function to collect bookmark lines generated by
-        # the original function.
-        def genfunc(info):
-            # Call the original function.
-            # Get result returned.
-            bookmark_line = original_genfunc(info)
+        # Return non-zero exit code
+        return 1
 
-            # If the result is not None,
-            # it means it is a bookmark line
-            if bookmark_line is not None:
-                # Add the bookmark line to list
-                bookmark_line_s.append(bookmark_line)
+    # Get whether checkpoint is on
+    checkpoint_is_on = args.checkpoint_is_on or args.resume_is_on \
+        or bool(args.checkpoint_file_path)
 
-        # Set step info
-        step_func(title='Parse PDF')
+    # If checkpoint is on but bookmarks are not generated by layout analysis
+    # with a generating function, or watch mode is on
+    if checkpoint_is_on and (
+        toc_is_on or args.source != 'layout' or watch_is_on
+        or not (rules_path or '::' in (bookmarks_uri or ''))
+    ):
+        # Get message
+        msg = (
+            'Error: Argument "--checkpoint" or "--resume" requires layout'
+            ' analysis with a bookmark generating function or rules file,'
+            ' and can not be used with "--watch".\n'
+        )
 
-        # Get PDF file password
-        passwd = args.passwd
+        # Print message
+        sys.stderr.write(msg)
+
+        # Return non-zero exit code
+        return 1
+
+    # If pipelined mode is on
+    if pipeline_is_on:
+        # Set step info
+        step_func(title='Start output file writer')
 
-        # Parse the PDF file to generate bookmark lines
-        parse_pdf(
-            pdf_file=input_file,
-            handler=genfunc,
+        # Create output file writer process
+        pdf_writer_process = PdfWriterProcess(
+            input_file_path=input_file_path,
+            output_file_path=output_file_path,
             npages=npages,
-            password=passwd,
+            strict=args.strict,
+            page_mode=args.page_mode,
+            # Give the writer the decrypted copy, so it needs not decrypt
+            # input file again
+            input_file=input_file if input_is_decrypted else None,
+            encrypt_password=args.output_passwd,
+            # Encryption keys are derived from the output file identifier,
+            # which the manifest derives from bookmarks
+            defer_encryption=bool(manifest_path),
         )
 
-    # If "::" is not in bookmarks URI,
-    # it means it is a bookmarks file path
+        # Start copying pages while bookmarks are being extracted
+        pdf_writer_process.start()
+    # If pipelined mode is off
     else:
-        # If the bookmarks file path not exists
-        if not os.path.isfile(bookmarks_uri):
-            # Get message
-            msg = 'Error: Bookmarks file path not exists: {}\n'.format(
-                bookmarks_uri)
+        # No output file writer process
+        pdf_writer_process = None
 
-            # Print message
-            sys.stderr.write(msg)
+    #
+    try:
+        # Bookmark lines generated. None means not generated.
+        bookmark_line_s = None
 
-            # Return non-zero exit code
-            return 1
+        # Bookmark records read from bookmarks file. None means not read.
+        bookmark_record_s = None
 
-        # If the file path exists
-        else:
+        # If TOC mode is on
+        if toc_is_on:
+            # Set step info
+            step_func(title='Extract bookmarks from table of contents')
+
+            # Generate bookmark lines from printed table of contents
+            bookmark_line_s = extract_toc_bookmarks(
+                pdf_file=input_file,
+                scan_npages=args.toc_npages,
+                page_offset=args.toc_offset,
+                npages=npages,
+                password=passwd,
+            )
+
+        # If source is font size clustering
+        elif args.source == 'fontsize':
             # Set step info
-            step_func(title='Open bookmarks file')
+            step_func(title='Extract bookmarks by font size levels')
+
+            # Create a function that logs font statistics
+            def stats_func(stats):
+                # Log body size
+                log.info(
+                    '# Body size: {}'.format(stats['body_size']),
+                    body_size=stats['body_size'],
+                )
+
+                # For each heading level
+                for level, (min_size, max_size) in enumerate(
+                        stats['level_ranges']):
+                    # Log the level's size range
+                    log.info(
+                        '# Level {}: {}-{}'.format(level, min_size, max_size),
+                        heading_level=level,
+                        min_size=min_size,
+                        max_size=max_size,
+                    )
+
+            # Generate bookmark lines from font size levels
+            bookmark_line_s = extract_font_level_bookmarks(
+                pdf_file=input_file,
+                npages=npages,
+                password=passwd,
+                max_levels=args.max_levels,
+                stats_func=stats_func,
+            )
+
+        # If bookmarks URI and rules file path are not given, and source is not
+        # layout analysis.
+        elif not bookmarks_uri and not rules_path:
+            # Set step info
+            step_func(
+                title='Extract bookmarks from structure tree or outlines')
+
+            # Generate bookmark lines from structure tree or outlines
+            bookmark_line_s = extract_tagged_bookmarks(
+                pdf_file=input_file,
+                source=args.source,
+                npages=npages,
+                password=passwd,
+            )
+
+        # If rules file path is given, or "::" is in bookmarks URI,
+        # it means bookmark lines are generated by a function.
+        elif rules_path or '::' in bookmarks_uri:
+            # If rules file path is given
+            if rules_path:
+                # Set step info
+                step_func(title='Load bookmark rules')
+
+                # Load and compile bookmark rules.
+                # The compiled rules object is used as generating function.
+                genfunc = load_rules(rules_path)
+            # If "::" is in bookmarks URI
+            else:
+                # Set step info
+                step_func(title='Load bookmarks generating function')
+
+                # Load bookmarks generating function.
+                # Modules loaded via HTTP are cached in cache directory, if
+                # given.
+                # Module files are compiled via bytecode cache, and the module
+                # loaded before in this process is reused if its code is
+                # unchanged.
+                genfunc_mod, genfunc = load_obj_local_or_remote(
+                    bookmarks_uri,
+                    mod_name='aoikpdfbookmark._bookmark',
+                    retn_mod=True,
+                    cache_dir=os.path.join(cache_dir, 'modules')
+                    if cache_dir else None,
+                    offline=offline_is_on,
+                    reuse=True,
+                )
+
+            # A list of bookmark lines
+            bookmark_line_s = []
+
+            # A list of textline info dicts cached for watch mode
+            cached_info_s = []
+
+            # Store the original function
+            original_genfunc = genfunc
+
+            # Create a wrapping function to collect bookmark lines generated by
+            # the original function.
+            def genfunc(info):
+                # If watch mode is on
+                if watch_is_on:
+                    # Cache the textline info dict
+                    cached_info_s.append(info)
+
+                #
+                try:
+                    # Call the original function.
+                    # Get result returned.
+                    bookmark_line = original_genfunc(info)
+                # If the function raises error or parse control
+                except Exception:
+                    # Write buffered diagnostics records before the error
+                    # propagates
+                    log.flush()
+
+                    # Raise the error
+                    raise
+
+                # If the result is not None,
+                # it means it is a bookmark line
+                if bookmark_line is not None:
+                    # Add the bookmark line to list
+                    bookmark_line_s.append(bookmark_line)
+
+                # Return the result
+                return bookmark_line
+
+            # If the generating function is compiled rules
+            if isinstance(original_genfunc, RuleSet):
+                # Create a page handler that decides all textlines of a page
+                # at once, to collect bookmark lines
+                def page_genfunc(info_s):
+                    #
+                    try:
+                        # Decide the page's textlines
+                        page_bookmark_line_s = original_genfunc.match_page(
+                            info_s)
+                    # If the rules raise error
+                    except Exception:
+                        # Write buffered diagnostics records before the error
+                        # propagates
+                        log.flush()
+
+                        # Raise the error
+                        raise
+
+                    # Add the page's bookmark lines to list
+                    bookmark_line_s.extend(page_bookmark_line_s)
+
+                    # Return the page's bookmark lines
+                    return page_bookmark_line_s
+            # If the generating function is not compiled rules
+            else:
+                # Pass textlines to the generating function one by one
+                page_genfunc = None
 
-            # Open bookmarks file
-            bookmarks_file = open(bookmarks_uri, mode='rb')
+            # Set step info
+            step_func(title='Parse PDF')
+
+            # If source is layout analysis
+            if args.source == 'layout':
+                # Get max number of pages a non-running line can recur on
+                running_pages = args.running_pages
+
+                # If finding running lines
+                if running_pages:
+                    # Set step info
+                    step_func(title='Find running headers and footers')
+
+                    # Find running lines without layout analysis
+                    running_line_index = find_running_lines(
+                        pdf_file=input_file,
+                        npages=npages,
+                        password=passwd,
+                        max_pages=running_pages,
+                    )
+
+                    # Set input file seek pointer to beginning
+                    input_file.seek(0)
+
+                    # Set step info
+                    step_func(title='Parse PDF')
+                # If not finding running lines
+                else:
+                    # Use no running line index
+                    running_line_index = None
+
+                # If checkpoint is on
+                if checkpoint_is_on:
+                    # Set step info
+                    step_func(title='Load checkpoint')
+
+                    # Create checkpoint. It is resumed only if the input file
+                    # and arguments affecting bookmark lines are the same.
+                    checkpoint = Checkpoint(
+                        file_path=args.checkpoint_file_path
+                        or input_file_path + CHECKPOINT_FILE_SUFFIX,
+                        run_key={
+                            'input': get_file_fingerprint(input_file_path),
+                            'bookmarks_uri': bookmarks_uri,
+                            'rules_path': rules_path,
+                            'npages': npages,
+                            'backend': args.backend_name,
+                            'running_pages': running_pages,
+                            'keep_running': args.keep_running_is_on,
+                            'merge_min_size': args.merge_min_size,
+                        },
+                        interval=args.checkpoint_interval,
+                    )
+
+                    # If resuming and the checkpoint file is loaded
+                    if args.resume_is_on and checkpoint.load():
+                        # Restore bookmark lines of completed pages
+                        bookmark_line_s[:] = checkpoint.bookmark_line_s
+
+                        # Get message
+                        msg = '# Resume at page {} with {} bookmarks\n'.format(
+                            checkpoint.resume_page_num, len(bookmark_line_s))
+
+                        # Print message
+                        sys.stderr.write(msg)
+
+                    # Create a function that updates the checkpoint after each
+                    # page
+                    def page_done_func(page_num, resume_page_num):
+                        # Update the checkpoint
+                        checkpoint.update(resume_page_num, bookmark_line_s)
+
+                    # Create a function that turns termination signal into
+                    # keyboard interrupt, so preempted runs save the checkpoint
+                    def sigterm_handler(signum, frame):
+                        # Raise keyboard interrupt
+                        raise KeyboardInterrupt()
+
+                    # Install the signal handler
+                    old_sigterm_handler = signal.signal(
+                        signal.SIGTERM, sigterm_handler)
+
+                    # Set step info
+                    step_func(title='Parse PDF')
+                # If checkpoint is off
+                else:
+                    # No checkpoint
+                    checkpoint = None
+
+                    page_done_func = None
+
+                #
+                try:
+                    # If the checkpoint says parsing is finished
+                    if checkpoint is not None \
+                            and checkpoint.resume_page_num is None:
+                        # No pages to parse
+                        pass
+                    # If have pages to parse
+                    else:
+                        # Parse the PDF file to generate bookmark lines.
+                        # Get number of pages skipped because they have no
+                        # text.
+                        textless_page_count = parse_pdf(
+                            pdf_file=input_file,
+                            handler=genfunc,
+                            npages=npages,
+                            password=passwd,
+                            running_line_index=running_line_index,
+                            drop_running_lines=not args.keep_running_is_on,
+                            line_merger=LineMerger(
+                                min_size=args.merge_min_size)
+                            if args.merge_min_size is not None else None,
+                            log=log,
+                            backend=args.backend_name,
+                            start_page_num=checkpoint.resume_page_num
+                            if checkpoint is not None else None,
+                            page_done_func=page_done_func,
+                            skip_textless=args.skip_textless_is_on,
+                            page_handler=page_genfunc,
+                        )
+
+                        # If skipping pages without text
+                        if args.skip_textless_is_on:
+                            # Get message
+                            msg = '# Skipped {} text-less pages\n'.format(
+                                textless_page_count)
+
+                            # Print message
+                            sys.stderr.write(msg)
+                # If interrupted
+                except KeyboardInterrupt:
+                    # If checkpoint is off
+                    if checkpoint is None:
+                        # Raise the interrupt
+                        raise
+
+                    # Save the checkpoint of completed pages
+                    checkpoint.save()
+
+                    # Write buffered diagnostics records
+                    log.flush()
+
+                    # If output file writer process is started
+                    if pdf_writer_process is not None:
+                        # Stop it without writing output file
+                        pdf_writer_process.cancel()
+
+                    # Get message
+                    msg = (
+                        '# Interrupted. Checkpoint saved, resume at page {}'
+                        ' with "--resume": {}\n'
+                    ).format(checkpoint.resume_page_num, checkpoint.file_path)
+
+                    # Print message
+                    sys.stderr.write(msg)
+
+                    # Return non-zero exit code, so batch systems rerun the job
+                    return 130
+                # If other error occurs
+                except Exception:
+                    # If checkpoint is on
+                    if checkpoint is not None:
+                        # Save the checkpoint of completed pages
+                        checkpoint.save()
+
+                    # Raise the error
+                    raise
+                finally:
+                    # If checkpoint is on
+                    if checkpoint is not None:
+                        # Restore the signal handler
+                        signal.signal(signal.SIGTERM, old_sigterm_handler)
+            # If source is structure tree or outlines
+            else:
+                # Generate bookmark lines from structure tree or outlines,
+                # fall back to the generating function for documents or pages
+                # without that information.
+                # Replace collected bookmark lines with merged ones.
+                bookmark_line_s[:] = extract_tagged_bookmarks(
+                    pdf_file=input_file,
+                    handler=genfunc,
+                    source=args.source,
+                    npages=npages,
+                    password=passwd,
+                    log=log,
+                    backend=args.backend_name,
+                )
+
+        # If "::" is not in bookmarks URI,
+        # it means it is a bookmarks file path
+        else:
+            # If the bookmarks file path not exists
+            if not os.path.isfile(bookmarks_uri):
+                # Get message
+                msg = 'Error: Bookmarks file path not exists: {}\n'.format(
+                    bookmarks_uri)
+
+                # Print message
+                sys.stderr.write(msg)
+
+                # If output file writer process is started
+                if pdf_writer_process is not None:
+                    # Stop it without writing output file
+                    pdf_writer_process.cancel()
+
+                # Return non-zero exit code
+                return 1
+
+            # If the file path exists
+            else:
+                # Set step info
+                step_func(title='Open bookmarks file')
+
+                # Get bookmarks file format
+                bookmark_format = get_bookmark_format(
+                    name=args.bookmark_format,
+                    file_path=bookmarks_uri,
+                )
+
+                # Open bookmarks file
+                bookmarks_file = bookmark_format.open(bookmarks_uri)
+
+                # Bookmark records iterator, read incrementally
+                bookmark_record_s = bookmark_format.read(bookmarks_file)
+
+        # If bookmark records are not read from bookmarks file
+        if bookmark_record_s is None:
+            # Make sure variable "bookmark_line_s" is defined in every branch.
+            # If the variable is None.
+            if bookmark_line_s is None:
+                # Raise error
+                raise ValueError('Bug: Variable "bookmark_line_s" is None')
+
+            # Parse generated bookmark lines to records
+            bookmark_record_s = get_bookmark_format('text').read(
+                bookmark_line_s)
+
+        # Write buffered diagnostics records
+        log.flush()
 
-            # Bookmark lines iterator
-            bookmark_line_s = bookmarks_file
+        # Set step info
+        step_func(title='Parse bookmark lines')
 
-    # Make sure variable "bookmark_line_s" is defined in every branch.
-    # If the variable is None.
-    if bookmark_line_s is None:
-        # Raise error
-        raise ValueError('Bug: Variable "bookmark_line_s" is None')
+        # Create buffered stdout so that bookmark lines are printed in large
+        # chunks instead of one write per line
+        print_file = BufferedWriter(sys.stdout)
 
-    # Set step info
-    step_func(title='Parse bookmark lines')
+        # Create writer that prints bookmark lines
+        print_writer = get_bookmark_format('text').create_writer(print_file)
 
-    # Parse bookmark lines to specs
-    bookmark_spec_s = parse_bookmarks(
-        bookmarks=bookmark_line_s,
-        npages=npages,
-    )
+        # Get save file path
+        save_file_path = args.save_file_path
 
-    # Set step info
-    step_func(title='Print bookmark lines')
+        # If save file path is given
+        if save_file_path:
+            # Get save file format
+            save_format = get_bookmark_format(
+                name=args.save_format,
+                file_path=save_file_path,
+            )
 
-    # Print processed bookmark lines.
-    # For each bookmark specs.
-    for bookmark_spec in bookmark_spec_s:
-        # Get zero-base page index
-        page_index = bookmark_spec[1]
+            # Open save file
+            save_file = save_format.open(save_file_path, 'w')
 
-        # Get page number
-        page_num = page_index + 1
+            # Create writer that saves bookmark records
+            save_writer = save_format.create_writer(save_file)
+        # If save file path is not given
+        else:
+            # No save file
+            save_file = None
+
+            save_writer = None
+
+        # Create a generator that prints and saves each bookmark record as it
+        # passes through, so bookmarks move through at constant memory
+        def pass_bookmark_records(record_s):
+            # For each bookmark record
+            for record in record_s:
+                # If max number of pages to process is given,
+                # and the record is beyond the max page.
+                if npages and record['page_num'] > npages:
+                    # Stop passing records
+                    break
+
+                # Print the bookmark line
+                print_writer.write(record)
+
+                # If save writer is given
+                if save_writer is not None:
+                    # Save the bookmark record
+                    save_writer.write(record)
+
+                # Yield the record
+                yield record
+
+        # Bookmark specs generator
+        bookmark_spec_s = iter_bookmark_specs(
+            pass_bookmark_records(bookmark_record_s))
+
+        # If output file path is not given
+        if not output_is_on and not split_level:
+            # Set step info
+            step_func(title='Print bookmark lines')
 
-        # Get vertical offset
-        voffset = bookmark_spec[7]
+            # Consume the generator to print and save bookmark records
+            for _ in bookmark_spec_s:
+                pass
 
-        # Get bookmark title
-        title = bookmark_spec[0]
+            # Write buffered bookmark lines
+            print_file.flush()
 
-        # Get bookmark line
-        bookmark_line = '{}|{}|{}'.format(page_num, voffset, title)
+        # If watch mode is on
+        if watch_is_on:
+            # Set step info
+            step_func(title='Watch bookmarks generating function')
+
+            # Get module file path.
+            # Use the source file if the module is loaded from a compiled file.
+            mod_path = os.path.splitext(genfunc_mod.__file__)[0] + '.py'
+
+            # Watch the module, re-run the function over cached textlines on
+            # each change. Return when keyboard interrupted.
+            watch_handler(
+                handler_uri=bookmarks_uri,
+                mod_path=mod_path,
+                mod_name='aoikpdfbookmark._bookmark',
+                info_s=cached_info_s,
+                bookmark_line_s=bookmark_line_s,
+                log=log,
+            )
+
+        # If output file path is given,
+        # it means generate PDF file with bookmarks.
+        if output_is_on:
+            # Get whether strict mode is on
+            strict = args.strict
+
+            # Get page mode
+            page_mode = args.page_mode
+
+            # If manifest is given
+            if manifest_path:
+                # Set step info
+                step_func(title='Check manifest')
+
+                # Read all bookmark specs, to get their hash
+                bookmark_spec_s = list(bookmark_spec_s)
+
+                # Get input file hash
+                input_hash = get_file_fingerprint(input_file_path)
+
+                # Get bookmark specs hash
+                bookmarks_hash = get_bookmark_specs_hash(bookmark_spec_s)
+
+                # Get writer options. The output password is checked by the
+                # manifest separately, as salted hash.
+                options = {
+                    'npages': npages or None,
+                    'page_mode': page_mode,
+                }
+
+                # If pipelined mode is on
+                if pipeline_is_on:
+                    # Pipelined output numbers objects in another order
+                    options['pipeline'] = True
+
+                # Load manifest
+                manifest = Manifest(manifest_path)
+
+                manifest.load()
+
+                # If the output file is up to date
+                if manifest.is_up_to_date(
+                    output_file_path,
+                    input_hash,
+                    bookmarks_hash,
+                    options,
+                    password=args.output_passwd,
+                ):
+                    # Get message
+                    msg = '# Output file is up to date: {}\n'.format(
+                        output_file_path)
+
+                    # Print message
+                    sys.stderr.write(msg)
+
+                    # Write buffered bookmark lines
+                    print_file.flush()
+
+                    # Output file needs no rewriting
+                    output_is_on = False
+
+                    # If output file writer process is started
+                    if pdf_writer_process is not None:
+                        # Stop it without writing output file
+                        pdf_writer_process.cancel()
+                # If the output file is not up to date, and is not written by
+                # output file writer process
+                elif pdf_writer_process is None:
+                    # Set step info
+                    step_func(title='Open output file')
+
+                    # Open output path
+                    output_file = open(output_file_path, mode='wb')
+
+                # Get output file identifier, so output file bytes depend only
+                # on what the manifest records
+                file_id = get_output_file_id(
+                    input_hash, bookmarks_hash, options)
+            # If manifest is not given
+            else:
+                # No output file identifier
+                file_id = None
+    # If have error, or interrupted
+    except BaseException:
+        # If output file writer process is started
+        if pdf_writer_process is not None:
+            # Stop it without writing output file
+            pdf_writer_process.cancel()
+
+        # Raise the error
+        raise
+
+    # If output file writer process is writing output file
+    if output_is_on and pdf_writer_process is not None:
+        # Set step info
+        step_func(title='Finish output file with bookmarks')
 
-        # Print the bookmark line
-        print(bookmark_line)
+        # Give bookmarks to the writer process, wait for it to finish
+        pdf_writer_process.finish(
+            bookmarks=bookmark_spec_s,
+            file_id=file_id,
+        )
 
+        # Write buffered bookmark lines
+        print_file.flush()
+
+        # If manifest is given
+        if manifest_path:
+            # Record the output file
+            manifest.update(
+                output_file_path,
+                input_hash,
+                bookmarks_hash,
+                options,
+                password=args.output_passwd,
+            )
+
+            # Save manifest
+            manifest.save()
     # If output file path is given,
     # it means generate PDF file with bookmarks.
-    if output_file is not None:
+    elif output_is_on:
         # Set step info
         step_func(title='Set input file seek pointer')
 
         # Set input file seek pointer to beginning
         input_file.seek(0)
 
-        # Get whether strict mode is on
-        strict = args.strict
-
-        # Get page mode
-        page_mode = args.page_mode
-
         # Set step info
         step_func(title='Create output file with bookmarks')
 
@@ -404,6 +1564,171 @@ aoikpdfbookmark --input a.pdf --bookmark my_gen.py::generate_bookmark\
             npages=npages,
             page_mode=page_mode,
             strict=strict,
+            encrypt_password=args.output_passwd,
+            file_id=file_id,
+        )
+
+        # Write buffered bookmark lines
+        print_file.flush()
+
+        # If manifest is given
+        if manifest_path:
+            # Close output file, so its hash can be got
+            output_file.close()
+
+            # Record the output file
+            manifest.update(
+                output_file_path,
+                input_hash,
+                bookmarks_hash,
+                options,
+                password=args.output_passwd,
+            )
+
+            # Save manifest
+            manifest.save()
+
+    # If splitting output
+    if split_level:
+        # Set step info
+        step_func(title='Set input file seek pointer')
+
+        # Set input file seek pointer to beginning
+        input_file.seek(0)
+
+        # Set step info
+        step_func(title='Create output files split by bookmarks')
+
+        # Write one PDF file per bookmark range
+        split_pdf_by_bookmarks(
+            input_file=input_file,
+            output_path_pattern=output_file_path,
+            bookmarks=bookmark_spec_s,
+            level=split_level,
+            npages=npages,
+            page_mode=args.page_mode,
+            strict=args.strict,
+            encrypt_password=args.output_passwd,
+        )
+
+        # Write buffered bookmark lines
+        print_file.flush()
+
+    # If save file is opened
+    if save_file is not None:
+        # Close save file
+        save_file.close()
+
+    # If checkpoint is on
+    if checkpoint_is_on:
+        # Remove the checkpoint file since the run is finished
+        checkpoint.remove()
+
+    # Return without error
+    return 0
+
+
+#
+def main_merge(args, step_func):
+    """
+    Merge mode's main function, called by "main_core".
+
+    @param args: Parsed command arguments.
+
+    @param step_func: A function that updates step info.
+
+    @return: Exit code.
+    """
+    # If input file path is given
+    if args.input_file_path:
+        # Get message
+        msg = 'Error: Argument "--merge" can not be used with "--input".\n'
+
+        # Print message
+        sys.stderr.write(msg)
+
+        # Return non-zero exit code
+        return 1
+
+    # If output file path is not given
+    if not args.output_file_path:
+        # Get message
+        msg = 'Error: Argument "--merge" requires "--output".\n'
+
+        # Print message
+        sys.stderr.write(msg)
+
+        # Return non-zero exit code
+        return 1
+
+    # If an input uses rules but rules file path is not given
+    if not args.rules_path and any(
+        bookmarks_uri == RULES_URI
+        for _, bookmarks_uri in args.merge_inputs
+    ):
+        # Get message
+        msg = 'Error: Merge input "{}" requires "--rules".\n'.format(
+            RULES_URI)
+
+        # Print message
+        sys.stderr.write(msg)
+
+        # Return non-zero exit code
+        return 1
+
+    # If the rules file path not exists
+    if args.rules_path and not os.path.isfile(args.rules_path):
+        # Get message
+        msg = 'Error: Rules file path not exists: {}\n'.format(
+            args.rules_path)
+
+        # Print message
+        sys.stderr.write(msg)
+
+        # Return non-zero exit code
+        return 1
+
+    # For each input file path
+    for input_file_path, _ in args.merge_inputs:
+        # If the input file path not exists
+        if not os.path.isfile(input_file_path):
+            # Get message
+            msg = 'Error: Input file path not exists: {}\n'.format(
+                input_file_path)
+
+            # Print message
+            sys.stderr.write(msg)
+
+            # Return non-zero exit code
+            return 1
+
+    # Set step info
+    step_func(title='Open output file')
+
+    # Open output file
+    with open(args.output_file_path, 'wb') as output_file:
+        # Set step info
+        step_func(title='Merge input files with bookmarks')
+
+        # Extract bookmarks of inputs in parallel, merge input files
+        merge_pdfs_with_bookmarks(
+            inputs=args.merge_inputs,
+            output_file=output_file,
+            npages=args.npages,
+            password=args.passwd,
+            backend=args.backend_name,
+            bookmark_format=args.bookmark_format,
+            processes=args.merge_jobs,
+            strict=args.strict,
+            page_mode=args.page_mode,
+            encrypt_password=args.output_passwd,
+            running_pages=args.running_pages,
+            keep_running=args.keep_running_is_on,
+            merge_min_size=args.merge_min_size,
+            rules_path=args.rules_path,
+            skip_textless=args.skip_textless_is_on,
+            # Font cache is installed in each worker process
+            cache_dir=args.cache_dir,
         )
 
     # Return without error
@@ -0,0 +1,307 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import multiprocessing
+import os.path
+
+from .api import ExtractConfig
+from .api import Extractor
+from .bookmark import iter_bookmark_specs
+from .bookmarkio import get_bookmark_format
+from .decryption import open_decrypted_pdf
+from .fontcache import install_font_cache
+from .pdfmaker import merge_pdfs_add_bookmarks
+
+
+# Merge input's bookmarks URI meaning bookmarks are generated by the rules
+# file given by "rules_path"
+RULES_URI = '-'
+
+# Extractor shared by merge inputs extracted in this process. Created by
+# "init_merge_worker".
+_EXTRACTOR = None
+
+
+#
+def init_merge_worker(cache_dir=None):
+    """
+    Initialize this process for extracting merge inputs: create the extractor
+    shared by the inputs, so font objects are reused across inputs.
+
+    @param cache_dir: Cache directory path. If given, font cache is installed
+    so CMaps and ToUnicode maps are loaded from disk cache.
+
+    @return: None.
+    """
+    global _EXTRACTOR
+
+    # Create extractor, using the installed font cache if cache directory is
+    # given
+    _EXTRACTOR = Extractor(
+        font_cache=install_font_cache(cache_dir) if cache_dir else None)
+
+
+#
+def extract_merge_input_records(
+    input_file_path,
+    bookmarks_uri,
+    npages=None,
+    password=None,
+    backend=None,
+    bookmark_format=None,
+    running_pages=0,
+    keep_running=False,
+    merge_min_size=None,
+    rules_path=None,
+    skip_textless=False,
+):
+    """
+    Get bookmark records of one merge input, from a bookmarks file or by
+    parsing the input file with a bookmark generating function or rules.
+
+    Parsing is done by "api.Extractor.extract", the same way as for a single
+    input file.
+
+    The function is run in worker processes so its arguments and result are
+    picklable.
+
+    @param input_file_path: Input PDF file path.
+
+    @param bookmarks_uri: Bookmarks file path, bookmark generating function
+    URI, or "RULES_URI" to use the rules file.
+
+    @param npages: Max number of pages to process. 0 or None means all pages.
+
+    @param password: Input PDF file's password, used if the file is
+    encrypted.
+
+    @param backend: Extraction backend name. None means the default backend.
+
+    @param bookmark_format: Bookmarks file format name. None means guessing
+    from file extension.
+
+    @param running_pages: See "api.ExtractConfig".
+
+    @param keep_running: See "api.ExtractConfig".
+
+    @param merge_min_size: See "api.ExtractConfig".
+
+    @param rules_path: Bookmark rules file path, used if bookmarks URI is
+    "RULES_URI".
+
+    @param skip_textless: See "api.ExtractConfig".
+
+    @return: A list of bookmark records.
+    """
+    # If the bookmarks URI is rules or a generating function URI
+    if bookmarks_uri == RULES_URI or (
+        '::' in bookmarks_uri and not os.path.isfile(bookmarks_uri)
+    ):
+        # If this process is not initialized
+        if _EXTRACTOR is None:
+            # Initialize without disk cache
+            init_merge_worker()
+
+        # Create extract config
+        config = ExtractConfig(
+            bookmarks_uri=bookmarks_uri
+            if bookmarks_uri != RULES_URI else None,
+            rules_path=rules_path if bookmarks_uri == RULES_URI else None,
+            npages=npages,
+            backend=backend,
+            running_pages=running_pages,
+            keep_running=keep_running,
+            merge_min_size=merge_min_size,
+            skip_textless=skip_textless,
+        )
+
+        # Open input file
+        with open(input_file_path, 'rb') as input_file:
+            # Get decrypted copy if the input file is encrypted
+            input_file = open_decrypted_pdf(input_file, password=password)
+
+            # Parse the PDF file to generate bookmark lines
+            bookmark_line_s = _EXTRACTOR.extract(input_file, config)
+
+        # Return bookmark records
+        return list(get_bookmark_format('text').read(bookmark_line_s))
+
+    # Get bookmarks file format
+    bookmark_format = get_bookmark_format(
+        name=bookmark_format,
+        file_path=bookmarks_uri,
+    )
+
+    # Open bookmarks file
+    with bookmark_format.open(bookmarks_uri) as bookmarks_file:
+        # Return bookmark records
+        return list(bookmark_format.read(bookmarks_file))
+
+
+#
+def _extract_merge_input_records_kwargs(kwargs):
+    """
+    Call "extract_merge_input_records" with a dict of keyword arguments, for
+    "multiprocessing.Pool.map".
+
+    @param kwargs: A dict of keyword arguments.
+
+    @return: See "extract_merge_input_records".
+    """
+    # Return bookmark records
+    return extract_merge_input_records(**kwargs)
+
+
+#
+def merge_pdfs_with_bookmarks(
+    inputs,
+    output_file,
+    npages=None,
+    password=None,
+    backend=None,
+    bookmark_format=None,
+    processes=None,
+    strict=None,
+    page_mode=None,
+    encrypt_password=None,
+    running_pages=0,
+    keep_running=False,
+    merge_min_size=None,
+    rules_path=None,
+    skip_textless=False,
+    cache_dir=None,
+):
+    """
+    Merge PDF files into one output file with a combined outline. Each input
+    gets a top-level bookmark, titled by its file name, with the input's own
+    bookmarks nested under it.
+
+    Bookmarks of inputs are extracted in parallel worker processes. Pages of
+    inputs are copied into output file without parsing the merged result.
+
+    @param inputs: A list of (input PDF file path, bookmarks file path or
+    bookmark generating function URI) tuples.
+
+    @param output_file: Output PDF file object.
+
+    @param npages: Max number of pages to process per input file.
+
+    @param password: Input PDF files' password, used if encrypted.
+
+    @param backend: Extraction backend name.
+
+    @param bookmark_format: Bookmarks file format name.
+
+    @param processes: Number of worker processes. None or 0 means number of
+    CPUs. 1 means extracting in this process.
+
+    @param strict: See "copy_pdf_add_bookmarks".
+
+    @param page_mode: See "copy_pdf_add_bookmarks".
+
+    @param encrypt_password: See "copy_pdf_add_bookmarks".
+
+    @param running_pages: See "api.ExtractConfig".
+
+    @param keep_running: See "api.ExtractConfig".
+
+    @param merge_min_size: See "api.ExtractConfig".
+
+    @param rules_path: See "extract_merge_input_records".
+
+    @param skip_textless: See "api.ExtractConfig".
+
+    @param cache_dir: See "init_merge_worker".
+
+    @return: A list of bookmark record lists, one per input.
+    """
+    # A list of keyword arguments dicts, one per input
+    kwargs_s = [
+        {
+            'input_file_path': input_file_path,
+            'bookmarks_uri': bookmarks_uri,
+            'npages': npages,
+            'password': password,
+            'backend': backend,
+            'bookmark_format': bookmark_format,
+            'running_pages': running_pages,
+            'keep_running': keep_running,
+            'merge_min_size': merge_min_size,
+            'rules_path': rules_path,
+            'skip_textless': skip_textless,
+        }
+        for input_file_path, bookmarks_uri in inputs
+    ]
+
+    # Get number of worker processes
+    processes = min(processes or multiprocessing.cpu_count(), len(inputs))
+
+    # If using one process
+    if processes <= 1:
+        # Initialize this process
+        init_merge_worker(cache_dir)
+
+        # Extract in this process
+        record_s_s = list(map(_extract_merge_input_records_kwargs, kwargs_s))
+    # If using worker processes
+    else:
+        # Create worker processes pool
+        pool = multiprocessing.Pool(
+            processes,
+            initializer=init_merge_worker,
+            initargs=(cache_dir,),
+        )
+
+        #
+        try:
+            # Extract in worker processes, keep inputs' order
+            record_s_s = pool.map(
+                _extract_merge_input_records_kwargs, kwargs_s)
+        finally:
+            # Stop worker processes
+            pool.terminate()
+
+            pool.join()
+
+    # A list of input file objects
+    input_file_s = []
+
+    #
+    try:
+        # For each input
+        for input_file_path, _ in inputs:
+            # Open input file
+            input_file = open(input_file_path, 'rb')
+
+            # Get decrypted copy if the input file is encrypted
+            input_file = open_decrypted_pdf(input_file, password=password)
+
+            # Add to the list
+            input_file_s.append(input_file)
+
+        # Copy pages of inputs, add the combined outline
+        merge_pdfs_add_bookmarks(
+            input_files=input_file_s,
+            output_file=output_file,
+            titles=[
+                os.path.splitext(os.path.basename(input_file_path))[0]
+                for input_file_path, _ in inputs
+            ],
+            bookmarks_s=[
+                list(iter_bookmark_specs(record_s, npages=npages))
+                for record_s in record_s_s
+            ],
+            npages=npages,
+            strict=strict,
+            page_mode=page_mode,
+            encrypt_password=encrypt_password,
+        )
+    finally:
+        # For each input file object
+        for input_file in input_file_s:
+            # Close the file
+            input_file.close()
+
+    # Return bookmark record lists
+    return record_s_s
@@ -2,7 +2,26 @@
 #
 from __future__ import absolute_import
 
+import hashlib
+import struct
+
 import PyPDF2
+from PyPDF2.generic import ArrayObject
+from PyPDF2.generic import ByteStringObject
+from PyPDF2.generic import FloatObject
+from PyPDF2.generic import IndirectObject
+from PyPDF2.generic import NameObject
+from PyPDF2.pdf import PageObject
+
+#
+try:
+    # PyPDF2 1.28+
+    from PyPDF2._security import _alg35
+except ImportError:
+    # PyPDF2 before 1.28
+    from PyPDF2.pdf import _alg35
+
+from .bookmark import get_bookmark_spec_levels
 
 
 #
@@ -23,6 +42,9 @@ def copy_pdf_add_bookmarks(
     npages=None,
     strict=None,
     page_mode=None,
+    password=None,
+    encrypt_password=None,
+    file_id=None,
 ):
     """
     Copy input PDF file into output file, add bookmarks to output file.
@@ -31,7 +53,8 @@ def copy_pdf_add_bookmarks(
 
     @param output_file: Output PDF file object.
 
-    @param bookmarks: Bookmark specs.
+    @param bookmarks: Bookmark specs. Each spec's parent bookmark is the index
+    of the parent spec, or None.
 
     @param npages: Max number of pages to process. 0 or None means all pages.
     Default is all pages.
@@ -48,11 +71,714 @@ def copy_pdf_add_bookmarks(
     @param strict: Strict mode that aborts if input PDF file has errors.
     Default is False.
 
+    @param password: Input PDF file's password, used if the file is
+    encrypted. Encrypted files are better decrypted once via
+    "decryption.open_decrypted_pdf", which supports more encryption methods.
+
+    @param encrypt_password: User password to encrypt output file with while
+    writing it. None means not encrypting.
+
+    @param file_id: File identifier bytes written as the trailer's "/ID".
+    Encryption keys are derived from it, so that output file bytes depend
+    only on the input. None means no identifier if not encrypting, otherwise
+    a random one.
+
     @return: None.
     """
     # Create PDF reader
+    pdf_reader = _create_pdf_reader(
+        input_file, strict=strict, password=password)
+
+    # Create PDF writer
+    pdf_writer = _create_pdf_writer(pdf_reader, page_mode=page_mode)
+
+    # Write PDF pages.
+    # For each PDF page.
+    for page_index, page in enumerate(pdf_reader.pages):
+        # If max number of pages to process is given,
+        # and the zero-based page index is GE the max number.
+        if npages and page_index >= npages:
+            # Stop writing PDF pages
+            break
+
+        # Add the page to PDF writer
+        pdf_writer.addPage(page)
+
+    # Add bookmarks
+    _add_bookmarks(pdf_writer, bookmarks)
+
+    # If encrypt password is given
+    if encrypt_password is not None:
+        # Encrypt output file with the password.
+        # Data is encrypted while it is written.
+        pdf_writer.encrypt(encrypt_password)
+
+    # If file identifier is given
+    if file_id is not None:
+        # Set file identifier
+        _set_file_id(pdf_writer, file_id, encrypt_password=encrypt_password)
+
+    # Write data in the writer to output file
+    pdf_writer.write(output_file)
+
+
+#
+class IncrementalPdfWriter(object):
+    """
+    Writer that copies input PDF file into output file in two stages, so that
+    pages can be copied while bookmarks are still being extracted:
+    - "copy_pages" adds pages, resolves the objects they use from input
+      file, and writes those objects to output file.
+    - "finish" adds bookmarks, then writes the catalog, the outline, the
+      cross-reference table, and the trailer.
+
+    Output file is equivalent to what "copy_pdf_add_bookmarks" writes, with
+    objects numbered in another order.
+    """
+
+    def __init__(
+        self,
+        input_file,
+        output_file,
+        npages=None,
+        strict=None,
+        page_mode=None,
+        password=None,
+        encrypt_password=None,
+        defer_encryption=False,
+    ):
+        """
+        Initialize object.
+
+        @param input_file: Input PDF file object. Must stay open until
+        "finish" returns.
+
+        @param output_file: Output PDF file object.
+
+        @param npages: See "copy_pdf_add_bookmarks".
+
+        @param strict: See "copy_pdf_add_bookmarks".
+
+        @param page_mode: See "copy_pdf_add_bookmarks".
+
+        @param password: See "copy_pdf_add_bookmarks".
+
+        @param encrypt_password: See "copy_pdf_add_bookmarks".
+
+        @param defer_encryption: Whether encrypt in "finish" instead of
+        "copy_pages". Required if encrypting and "file_id" is given to
+        "finish", since encryption keys are derived from the identifier. Then
+        no objects can be written before "finish".
+
+        @return: None.
+        """
+        # Input PDF file object
+        self.input_file = input_file
+
+        # Output PDF file object
+        self.output_file = output_file
+
+        # Max number of pages to process
+        self.npages = npages
+
+        # Strict mode
+        self.strict = strict
+
+        # Page mode character
+        self.page_mode = page_mode
+
+        # Input PDF file's password
+        self.password = password
+
+        # User password to encrypt output file with
+        self.encrypt_password = encrypt_password
+
+        # Whether encrypt in "finish"
+        self.defer_encryption = defer_encryption
+
+        # PDF writer. Created in "copy_pages".
+        self._pdf_writer = None
+
+        # A dict that maps input file objects to output file objects, kept
+        # across stages so that no input object is copied twice
+        self._extern_map = {}
+
+        # A dict that maps written object numbers to their file offsets
+        self._object_position_s = {}
+
+    def copy_pages(self):
+        """
+        Add input file's pages, resolve the objects they use, and write the
+        objects to output file.
+
+        @return: None.
+        """
+        # Create PDF reader
+        pdf_reader = _create_pdf_reader(
+            self.input_file, strict=self.strict, password=self.password)
+
+        # Create PDF writer
+        pdf_writer = self._pdf_writer = _create_pdf_writer(
+            pdf_reader, page_mode=self.page_mode)
+
+        # For each PDF page
+        for page_index, page in enumerate(pdf_reader.pages):
+            # If max number of pages to process is given,
+            # and the zero-based page index is GE the max number.
+            if self.npages and page_index >= self.npages:
+                # Stop adding PDF pages
+                break
+
+            # Add the page to PDF writer
+            pdf_writer.addPage(page)
+
+        # For each object added so far
+        for obj_index, obj in enumerate(pdf_writer._objects):
+            # If the object is a copied page
+            if isinstance(obj, PageObject) and obj.indirectRef is not None:
+                # Get the page's reference in input file
+                page_ref = obj.indirectRef
+
+                # Map the page's input reference to its output reference, so
+                # that objects referring to the page, e.g. annotations, refer
+                # to the copied page instead of copying it again. This is
+                # what "PdfFileWriter.write" does.
+                self._extern_map.setdefault(page_ref.pdf, {}).setdefault(
+                    page_ref.generation, {})[page_ref.idnum] = \
+                    IndirectObject(obj_index + 1, 0, pdf_writer)
+
+        # If encrypting now
+        if self.encrypt_password is not None and not self.defer_encryption:
+            # Encrypt output file with the password
+            pdf_writer.encrypt(self.encrypt_password)
+
+        # Copy objects used by pages from input file
+        self._sweep(pdf_writer._pages)
+
+        # Write file header
+        self.output_file.write(pdf_writer._header + b'\n')
+
+        self.output_file.write(b'%\xE2\xE3\xCF\xD3\n')
+
+        # If encryption is deferred
+        if self.encrypt_password is not None and self.defer_encryption:
+            # Objects can not be written before their keys are known
+            return
+
+        # Write objects copied so far. The encryption dict is written in
+        # "finish" since setting file identifier changes it.
+        self._write_objects(skip_idnums=(
+            pdf_writer._encrypt.idnum,
+        ) if self.encrypt_password is not None else ())
+
+    def finish(self, bookmarks, file_id=None):
+        """
+        Add bookmarks, write remaining objects, cross-reference table, and
+        trailer to output file.
+
+        @param bookmarks: Bookmark specs. See "copy_pdf_add_bookmarks".
+
+        @param file_id: See "copy_pdf_add_bookmarks".
+
+        @return: None.
+        """
+        # Get PDF writer
+        pdf_writer = self._pdf_writer
+
+        # If pages are not copied
+        if pdf_writer is None:
+            # Raise error
+            raise ValueError('Bug: "copy_pages" is not called.')
+
+        # Add bookmarks
+        _add_bookmarks(pdf_writer, bookmarks)
+
+        # If encryption is deferred
+        if self.encrypt_password is not None and self.defer_encryption:
+            # Encrypt output file with the password
+            pdf_writer.encrypt(self.encrypt_password)
+
+        # If file identifier is given
+        if file_id is not None:
+            # If objects are encrypted with keys derived from another
+            # identifier
+            if self.encrypt_password is not None \
+                    and not self.defer_encryption:
+                # Raise error
+                raise ValueError(
+                    'Error: Argument "defer_encryption" is required to set'
+                    ' file identifier of encrypted output.')
+
+            # Set file identifier
+            _set_file_id(
+                pdf_writer, file_id, encrypt_password=self.encrypt_password)
+
+        # Add catalog object.
+        # PyPDF2 before 1.28 uses the camel case name.
+        pdf_writer._root = (
+            getattr(pdf_writer, '_add_object', None) or pdf_writer._addObject
+        )(pdf_writer._root_object)
+
+        # Copy objects used by the catalog and the outline. Objects written
+        # already are not visited again.
+        self._sweep(pdf_writer._root)
+
+        # Write remaining objects
+        self._write_objects()
+
+        # Get output file object
+        output_file = self.output_file
+
+        # Get cross-reference table's file offset
+        xref_location = output_file.tell()
+
+        # Get number of objects
+        object_count = len(pdf_writer._objects)
+
+        # Write cross-reference table
+        output_file.write(b'xref\n')
+
+        output_file.write('0 {}\n'.format(object_count + 1).encode('ascii'))
+
+        output_file.write(b'0000000000 65535 f \n')
+
+        # For each object number
+        for idnum in range(1, object_count + 1):
+            # Write the object's file offset
+            output_file.write('{:010d} 00000 n \n'.format(
+                self._object_position_s[idnum]).encode('ascii'))
+
+        # Write trailer
+        pdf_writer._write_trailer(output_file)
+
+        output_file.write('\nstartxref\n{}\n%%EOF\n'.format(
+            xref_location).encode('ascii'))
+
+    def _sweep(self, ref):
+        """
+        Copy objects used by an object from input file, replacing references
+        to input file objects with references to output file objects.
+
+        @param ref: Reference to an output file object.
+
+        @return: None.
+        """
+        # Get PDF writer
+        pdf_writer = self._pdf_writer
+
+        # Get the sweeping function.
+        # PyPDF2 before 1.28 uses the camel case name.
+        sweep_func = getattr(
+            pdf_writer, '_sweep_indirect_references', None
+        ) or pdf_writer._sweepIndirectReferences
+
+        # Mark written objects as visited, so they are not visited again
+        pdf_writer.stack = list(self._object_position_s)
+
+        # Copy objects used by the object
+        sweep_func(self._extern_map, ref)
+
+        # Remove the visited marks
+        del pdf_writer.stack
+
+    def _write_objects(self, skip_idnums=()):
+        """
+        Write objects not written yet to output file.
+
+        @param skip_idnums: Numbers of objects not to write yet.
+
+        @return: None.
+        """
+        # Get PDF writer
+        pdf_writer = self._pdf_writer
+
+        # Get output file object
+        output_file = self.output_file
+
+        # Get encryption key. None means not encrypted.
+        encrypt_key = getattr(pdf_writer, '_encrypt_key', None)
+
+        # Get encryption dict's object number
+        encrypt_idnum = pdf_writer._encrypt.idnum \
+            if encrypt_key is not None else None
+
+        # For each object
+        for obj_index, obj in enumerate(pdf_writer._objects):
+            # Get object number
+            idnum = obj_index + 1
+
+            # If the object is written, or not to write yet
+            if idnum in self._object_position_s or idnum in skip_idnums:
+                # Skip the object
+                continue
+
+            # Store the object's file offset
+            self._object_position_s[idnum] = output_file.tell()
+
+            # Write object header
+            output_file.write('{} 0 obj\n'.format(idnum).encode('ascii'))
+
+            # If encrypted and the object is not the encryption dict
+            if encrypt_key is not None and idnum != encrypt_idnum:
+                # Get the object's key, the same way "PdfFileWriter.write"
+                # does
+                obj_key = hashlib.md5(
+                    encrypt_key
+                    + struct.pack('<i', idnum)[:3]
+                    + struct.pack('<i', 0)[:2]
+                ).digest()[:min(16, len(encrypt_key) + 5)]
+            # If not encrypted, or the object is the encryption dict
+            else:
+                # No key
+                obj_key = None
+
+            # Write the object.
+            # PyPDF2 before 1.28 uses the camel case name.
+            (getattr(obj, 'write_to_stream', None) or obj.writeToStream)(
+                output_file, obj_key)
+
+            # Write object footer
+            output_file.write(b'\nendobj\n')
+
+
+#
+def get_bookmark_split_ranges(bookmarks, level, page_count):
+    """
+    Partition pages into ranges by bookmarks of a nesting level.
+
+    Each bookmark of the level or a higher level starts a range that ends
+    where the next such bookmark starts. A range has at least one page. Pages
+    before the first bookmark form a range without bookmarks.
+
+    @param bookmarks: A list of bookmark specs.
+
+    @param level: One-based nesting level to split by. 1 means top level.
+
+    @param page_count: Number of pages.
+
+    @return: A list of (start page index, end page index, bookmark specs)
+    tuples. The end page index is exclusive. Bookmark specs' page indexes and
+    parent indexes are re-based to the range.
+    """
+    # Get nesting levels of bookmark specs
+    level_s = get_bookmark_spec_levels(bookmarks)
+
+    # Get indexes of bookmark specs that start ranges
+    split_index_s = [
+        spec_index for spec_index, spec_level in enumerate(level_s)
+        if spec_level < level and bookmarks[spec_index][1] < page_count
+    ]
+
+    # A list of ranges
+    range_s = []
+
+    # Get first range's start page index
+    first_page_index = bookmarks[split_index_s[0]][1] \
+        if split_index_s else page_count
+
+    # If have pages before the first range
+    if first_page_index > 0:
+        # Add a range without bookmarks
+        range_s.append((0, first_page_index, []))
+
+    # For each bookmark spec that starts a range
+    for split_count, spec_index in enumerate(split_index_s):
+        # Get next range's start spec index
+        next_spec_index = split_index_s[split_count + 1] \
+            if split_count + 1 < len(split_index_s) else len(bookmarks)
+
+        # Get start page index
+        start_page_index = bookmarks[spec_index][1]
+
+        # Get end page index
+        end_page_index = bookmarks[next_spec_index][1] \
+            if next_spec_index < len(bookmarks) else page_count
+
+        end_page_index = min(
+            max(end_page_index, start_page_index + 1), page_count)
+
+        # A list of re-based bookmark specs
+        range_spec_s = []
+
+        # For each bookmark spec in the range
+        for bookmark_spec in bookmarks[spec_index:next_spec_index]:
+            # Get re-based page index, limited to the range
+            page_index = min(
+                max(bookmark_spec[1] - start_page_index, 0),
+                end_page_index - start_page_index - 1,
+            )
+
+            # Get parent spec index
+            parent_index = bookmark_spec[2]
+
+            # Get re-based parent spec index. Parents outside the range mean
+            # top level.
+            parent_index = None if parent_index is None \
+                or parent_index < spec_index else parent_index - spec_index
+
+            # Add re-based bookmark spec
+            range_spec_s.append(
+                (bookmark_spec[0], page_index, parent_index)
+                + tuple(bookmark_spec[3:])
+            )
+
+        # Add the range
+        range_s.append((start_page_index, end_page_index, range_spec_s))
+
+    # Return the list of ranges
+    return range_s
+
+
+#
+def split_pdf_by_bookmarks(
+    input_file,
+    output_path_pattern,
+    bookmarks,
+    level=1,
+    npages=None,
+    strict=None,
+    page_mode=None,
+    password=None,
+    encrypt_password=None,
+):
+    """
+    Write one PDF file per bookmark range of input PDF file, each with its
+    own re-based sub-outline. See "get_bookmark_split_ranges" for ranges.
+
+    Input file is parsed once, and the parsed reader is shared by all output
+    files. Each output file is written as soon as its range is copied, and
+    resources shared by its pages are written once in it.
+
+    @param input_file: Input PDF file object.
+
+    @param output_path_pattern: Output file path pattern, formatted with
+    "index", the one-based range index, e.g. "chapter_{index:02d}.pdf".
+
+    @param bookmarks: Bookmark specs. See "copy_pdf_add_bookmarks".
+
+    @param level: One-based nesting level to split by. Default is 1.
+
+    @param npages: See "copy_pdf_add_bookmarks".
+
+    @param strict: See "copy_pdf_add_bookmarks".
+
+    @param page_mode: See "copy_pdf_add_bookmarks".
+
+    @param password: See "copy_pdf_add_bookmarks".
+
+    @param encrypt_password: See "copy_pdf_add_bookmarks".
+
+    @return: A list of output file paths.
+    """
+    # If the pattern has no range index
+    if '{index' not in output_path_pattern:
+        # Raise error
+        raise ValueError(
+            'Error: Output file path pattern has no "{{index}}": {}'.format(
+                output_path_pattern))
+
+    # Create PDF reader
+    pdf_reader = _create_pdf_reader(
+        input_file, strict=strict, password=password)
+
+    # Get number of pages to process
+    page_count = pdf_reader.getNumPages()
+
+    # If max number of pages to process is given
+    if npages:
+        # Limit the number of pages
+        page_count = min(page_count, npages)
+
+    # A list of output file paths
+    output_path_s = []
+
+    # For each range
+    for range_index, (start_page_index, end_page_index, range_spec_s) in \
+            enumerate(get_bookmark_split_ranges(
+                list(bookmarks), level, page_count), 1):
+        # Create PDF writer
+        pdf_writer = _create_pdf_writer(pdf_reader, page_mode=page_mode)
+
+        # For each page index in the range
+        for page_index in range(start_page_index, end_page_index):
+            # Add the page to PDF writer
+            pdf_writer.addPage(pdf_reader.getPage(page_index))
+
+        # Add re-based bookmarks
+        _add_bookmarks(pdf_writer, range_spec_s)
+
+        # If encrypt password is given
+        if encrypt_password is not None:
+            # Encrypt output file with the password
+            pdf_writer.encrypt(encrypt_password)
+
+        # Get output file path
+        output_path = output_path_pattern.format(index=range_index)
+
+        # Open output file
+        with open(output_path, 'wb') as output_file:
+            # Write data in the writer to output file
+            pdf_writer.write(output_file)
+
+        # Add the output file path
+        output_path_s.append(output_path)
+
+    # Return the list of output file paths
+    return output_path_s
+
+
+#
+def merge_pdfs_add_bookmarks(
+    input_files,
+    output_file,
+    titles,
+    bookmarks_s,
+    npages=None,
+    strict=None,
+    page_mode=None,
+    password=None,
+    encrypt_password=None,
+):
+    """
+    Copy input PDF files into one output file, add a two-level outline: a
+    top-level bookmark per input file, with the input's bookmarks nested
+    under it. Page indexes of each input's bookmarks are offset by pages of
+    inputs before it.
+
+    @param input_files: A list of input PDF file objects.
+
+    @param output_file: Output PDF file object.
+
+    @param titles: A list of top-level bookmark titles, one per input.
+
+    @param bookmarks_s: A list of bookmark spec lists, one per input. See
+    "copy_pdf_add_bookmarks".
+
+    @param npages: Max number of pages to process per input file.
+
+    @param strict: See "copy_pdf_add_bookmarks".
+
+    @param page_mode: See "copy_pdf_add_bookmarks". Default is first input
+    file's page mode.
+
+    @param password: See "copy_pdf_add_bookmarks".
+
+    @param encrypt_password: See "copy_pdf_add_bookmarks".
+
+    @return: None.
+    """
+    # PDF writer, created with the first input's doc info and page mode
+    pdf_writer = None
+
+    # A list of combined bookmark specs
+    combined_spec_s = []
+
+    # Page index offset of current input
+    page_index_offset = 0
+
+    # For each input
+    for input_file, title, bookmark_spec_s in zip(
+            input_files, titles, bookmarks_s):
+        # Create PDF reader
+        pdf_reader = _create_pdf_reader(
+            input_file, strict=strict, password=password)
+
+        # If PDF writer is not created
+        if pdf_writer is None:
+            # Create PDF writer
+            pdf_writer = _create_pdf_writer(pdf_reader, page_mode=page_mode)
+
+        # Get number of pages to copy
+        page_count = pdf_reader.getNumPages()
+
+        # If max number of pages to process is given
+        if npages:
+            # Limit the number of pages
+            page_count = min(page_count, npages)
+
+        # For each page index
+        for page_index in range(page_count):
+            # Add the page to PDF writer
+            pdf_writer.addPage(pdf_reader.getPage(page_index))
+
+        # Get the input's top-level bookmark spec index
+        title_index = len(combined_spec_s)
+
+        # Add the input's top-level bookmark, fitting its first page
+        combined_spec_s.append(
+            (title, page_index_offset, None, None, False, False, '/Fit'))
+
+        # For each bookmark spec of the input
+        for bookmark_spec in bookmark_spec_s:
+            # Get parent spec index
+            parent_index = bookmark_spec[2]
+
+            # Add bookmark spec with offset page index and parent index
+            combined_spec_s.append((
+                bookmark_spec[0],
+                page_index_offset + min(bookmark_spec[1], page_count - 1),
+                title_index + 1 + parent_index
+                if parent_index is not None else title_index,
+            ) + tuple(bookmark_spec[3:]))
+
+        # Increment page index offset
+        page_index_offset += page_count
+
+    # If no inputs
+    if pdf_writer is None:
+        # Raise error
+        raise ValueError('Error: No input PDF files to merge.')
+
+    # Add bookmarks
+    _add_bookmarks(pdf_writer, combined_spec_s)
+
+    # If encrypt password is given
+    if encrypt_password is not None:
+        # Encrypt output file with the password
+        pdf_writer.encrypt(encrypt_password)
+
+    # Write data in the writer to output file
+    pdf_writer.write(output_file)
+
+
+#
+def _create_pdf_reader(input_file, strict=None, password=None):
+    """
+    Create PDF reader, decrypt it if input file is encrypted.
+
+    @param input_file: Input PDF file object.
+
+    @param strict: See "copy_pdf_add_bookmarks".
+
+    @param password: See "copy_pdf_add_bookmarks".
+
+    @return: PdfFileReader object.
+    """
+    # Create PDF reader
     pdf_reader = PyPDF2.PdfFileReader(input_file, strict=strict or False)
 
+    # If the input file is encrypted
+    if pdf_reader.isEncrypted:
+        # If the password is not correct
+        if not pdf_reader.decrypt(password if password is not None else ''):
+            # Raise error
+            raise ValueError('Error: Input PDF file password is not correct.')
+
+    # Return the PDF reader
+    return pdf_reader
+
+
+#
+def _create_pdf_writer(pdf_reader, page_mode=None):
+    """
+    Create PDF writer with input file's doc info and page mode.
+
+    @param pdf_reader: PdfFileReader object.
+
+    @param page_mode: See "copy_pdf_add_bookmarks".
+
+    @return: PdfFileWriter object.
+    """
     # Create PDF writer
     pdf_writer = PyPDF2.PdfFileWriter()
 
@@ -84,22 +810,94 @@ def copy_pdf_add_bookmarks(
         # Set page mode
         pdf_writer.setPageMode(page_mode_value)
 
-    # Write PDF pages.
-    # For each PDF page.
-    for page_index, page in enumerate(pdf_reader.pages):
-        # If max number of pages to process is given,
-        # and the zero-based page index is GE the max number.
-        if npages and page_index >= npages:
-            # Stop writing PDF pages
-            break
+    # Return the PDF writer
+    return pdf_writer
 
-        # Add the page to PDF writer
-        pdf_writer.addPage(page)
+
+#
+def _set_file_id(pdf_writer, file_id, encrypt_password=None):
+    """
+    Set PDF writer's file identifier. "PdfFileWriter.encrypt" uses a random
+    identifier, so the user password entry and encryption key derived from
+    it are re-derived.
+
+    @param pdf_writer: PdfFileWriter object.
+
+    @param file_id: File identifier bytes.
+
+    @param encrypt_password: User password the writer is encrypted with.
+    None means not encrypted.
+
+    @return: None.
+    """
+    # Get file identifier object
+    file_id_obj = ByteStringObject(file_id)
+
+    # Set file identifier. Use the same value for the permanent and changing
+    # parts.
+    pdf_writer._ID = ArrayObject((file_id_obj, file_id_obj))
+
+    # If the writer is encrypted
+    if encrypt_password is not None:
+        # Get encryption dict
+        encrypt_dict = pdf_writer._encrypt.getObject()
+
+        # Re-derive user password entry and encryption key.
+        # Revision 3 and 128-bit key are what "PdfFileWriter.encrypt" uses by
+        # default.
+        user_entry, encrypt_key = _alg35(
+            encrypt_password,
+            3,
+            16,
+            encrypt_dict['/O'],
+            int(encrypt_dict['/P']),
+            file_id_obj,
+            False,
+        )
+
+        # Set user password entry
+        encrypt_dict[NameObject('/U')] = ByteStringObject(user_entry)
+
+        # Set encryption key
+        pdf_writer._encrypt_key = encrypt_key
+
+
+#
+def _add_bookmarks(pdf_writer, bookmarks):
+    """
+    Add bookmarks to PDF writer.
+
+    @param pdf_writer: PdfFileWriter object.
+
+    @param bookmarks: Bookmark specs. See "copy_pdf_add_bookmarks".
+
+    @return: None.
+    """
+    # A list of added bookmark objects, used to resolve parent spec index
+    bookmark_obj_s = []
 
     # For each bookmark spec
     for bookmark_spec in bookmarks:
+        # Get parent spec index
+        parent_index = bookmark_spec[2]
+
+        # Get parent bookmark object. None means top level.
+        parent = None if parent_index is None \
+            else bookmark_obj_s[parent_index]
+
         # Add bookmark
-        pdf_writer.addBookmark(*bookmark_spec)
+        bookmark_obj = pdf_writer.addBookmark(
+            bookmark_spec[0], bookmark_spec[1], parent, *bookmark_spec[3:])
 
-    # Write data in the writer to output file
-    pdf_writer.write(output_file)
+        # If the fit mode has a zoom factor
+        if bookmark_spec[6] == '/XYZ':
+            # Get the bookmark's destination array
+            dest_array = \
+                bookmark_obj.getObject()['/A'].getObject()['/D']
+
+            # Set the zoom factor as float.
+            # "addBookmark" converts fit arguments to integers.
+            dest_array[-1] = FloatObject(bookmark_spec[-1])
+
+        # Add the bookmark object to list
+        bookmark_obj_s.append(bookmark_obj)
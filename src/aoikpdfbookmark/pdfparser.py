@@ -2,26 +2,622 @@
 #
 from __future__ import absolute_import
 
+from bisect import bisect_left
+from bisect import bisect_right
+
 from pdfminer.converter import PDFConverter
 from pdfminer.layout import LAParams
 from pdfminer.pdfinterp import PDFPageInterpreter
-from pdfminer.pdfinterp import PDFResourceManager
 from pdfminer.pdfpage import PDFPage
 
+from .backends import ExtractionBackend
+from .backends import PageRecord
+from .backends import PymupdfBackend
+from .backends import get_extraction_backend
+from .backends import register_extraction_backend
+from .diagnostics import NULL_LOG
+from .fontcache import create_resource_manager
+from .prescan import page_has_text
+
 
 #
-class TextlineConverter(PDFConverter):
+class ParseControl(Exception):
     """
-    PDFPageInterpreter parses each PDF page into a LTPage item.
-    PDFPageInterpreter passes the LTPage item to TextlineConverter.
-    TextlineConverter walks through the LTPage item, finds each LTTextLine
-    item in it, and passes an info dict to textline handler.
-    The info dict has these entries:
+    Base class of exceptions a textline handler raises to control parsing.
+    """
+
+    def __init__(self, finish_page=True):
+        """
+        Initialize object.
+
+        @param finish_page: Whether pass remaining textlines of current page to
+        the handler before the control takes effect. Default is True.
+
+        @return: None.
+        """
+        # Call super method
+        Exception.__init__(self)
+
+        # Whether pass remaining textlines of current page to the handler
+        self.finish_page = finish_page
+
+
+#
+class StopParsing(ParseControl):
+    """
+    Raised by a textline handler to stop parsing after current page.
+    Bookmark lines generated so far are kept.
+    """
+
+
+#
+class SkipToPage(ParseControl):
+    """
+    Raised by a textline handler to skip pages until the given page number.
+    """
+
+    def __init__(self, page_num, finish_page=True):
+        """
+        Initialize object.
+
+        @param page_num: Page number to resume parsing at.
+
+        @param finish_page: See class "ParseControl".
+
+        @return: None.
+        """
+        # Call super method
+        ParseControl.__init__(self, finish_page=finish_page)
+
+        # Page number to resume parsing at
+        self.page_num = page_num
+
+
+#
+class PageLineIndex(object):
+    """
+    Spatial index of a page's textlines, for cheap neighbour queries.
+
+    Lines are sorted top to bottom, then left to right, for previous and next
+    line queries. Lines are also sorted by bottom, so lines above a line are
+    found by binary search.
+
+    For the nearest horizontally overlapping line above, the page is split
+    into vertical strips, each with the lines crossing it sorted by bottom.
+    A query binary searches only the strips the line crosses, so lines in
+    other columns are never scanned.
+    """
+
+    # Number of vertical strips the lines' horizontal extent is split into
+    STRIP_COUNT = 64
+
+    def __init__(self, line_items):
+        """
+        Initialize object.
+
+        @param line_items: LTTextLine items of a page.
+
+        @return: None.
+        """
+        # Lines sorted top to bottom, then left to right
+        self.line_s = sorted(line_items, key=lambda line: (-line.y1, line.x0))
+
+        # A dict that maps line item's ID to its index in the sorted lines
+        self.line_index_s = dict(
+            (id(line), index) for index, line in enumerate(self.line_s)
+        )
+
+        # Lines sorted by bottom, bottom to top
+        self.bottom_line_s = sorted(line_items, key=lambda line: line.y0)
+
+        # Bottoms of lines sorted by bottom, for binary search
+        self.bottom_s = [line.y0 for line in self.bottom_line_s]
+
+        # A list of (lines sorted by bottom, their bottoms) tuples, one per
+        # vertical strip. Created on first use.
+        self._strip_s = None
+
+        # Left of the first strip
+        self._strip_x0 = 0
+
+        # Width of each strip
+        self._strip_width = 1
+
+    def get_prev_line(self, line):
+        """
+        Get the line before a line, in top to bottom order.
+
+        @param line: LTTextLine item in the page.
+
+        @return: LTTextLine item, or None.
+        """
+        # Get the line's index
+        index = self.line_index_s[id(line)]
+
+        # Return the previous line
+        return self.line_s[index - 1] if index > 0 else None
+
+    def get_next_line(self, line):
+        """
+        Get the line after a line, in top to bottom order.
+
+        @param line: LTTextLine item in the page.
+
+        @return: LTTextLine item, or None.
+        """
+        # Get the line's index
+        index = self.line_index_s[id(line)] + 1
+
+        # Return the next line
+        return self.line_s[index] if index < len(self.line_s) else None
+
+    def get_lines_above(self, line, dy):
+        """
+        Get lines whose bottoms are above a line's top within a distance.
+
+        @param line: LTTextLine item.
+
+        @param dy: Max distance from the line's top to other lines' bottoms.
+
+        @return: A list of LTTextLine items, nearest first.
+        """
+        # Get the range of lines whose bottoms are in [top, top + dy]
+        start = bisect_left(self.bottom_s, line.y1)
+
+        end = bisect_right(self.bottom_s, line.y1 + dy)
+
+        # Return the lines
+        return self.bottom_line_s[start:end]
+
+    def get_gap_above(self, line, overlap=True):
+        """
+        Get the vertical gap between a line's top and the nearest line above.
+
+        @param line: LTTextLine item.
+
+        @param overlap: Whether only lines horizontally overlapping the line
+        count, so lines in other columns are ignored. Default is True.
+
+        @return: Gap, or None if no line is above.
+        """
+        # If overlapping is not required
+        if not overlap:
+            # Get index of the nearest line whose bottom is above the line's
+            # top
+            index = bisect_left(self.bottom_s, line.y1)
+
+            # Return the gap
+            return self.bottom_s[index] - line.y1 \
+                if index < len(self.bottom_s) else None
+
+        # If strips are not created
+        if self._strip_s is None:
+            # Create strips
+            self._create_strips()
+
+        # Get the range of strips the line crosses
+        first_strip, last_strip = self._get_strip_range(line)
+
+        # Bottom of the nearest overlapping line above. None means not found.
+        nearest_y0 = None
+
+        # For each strip the line crosses
+        for strip_index in range(first_strip, last_strip + 1):
+            # Get the strip's lines and their bottoms
+            strip_line_s, strip_bottom_s = self._strip_s[strip_index]
+
+            # Get strip's left and right
+            strip_x0 = self._strip_x0 + strip_index * self._strip_width
+
+            strip_x1 = strip_x0 + self._strip_width
+
+            # Whether the line covers the whole strip, so every line in the
+            # strip overlaps it
+            covers_strip = line.x0 <= strip_x0 and strip_x1 <= line.x1
+
+            # For each line in the strip whose bottom is above the line's top,
+            # nearest first
+            for index in range(
+                bisect_left(strip_bottom_s, line.y1), len(strip_line_s)
+            ):
+                # Get the line's bottom
+                y0 = strip_bottom_s[index]
+
+                # If a nearer line is found in another strip
+                if nearest_y0 is not None and y0 >= nearest_y0:
+                    # Stop searching the strip
+                    break
+
+                # Get the line above
+                line_above = strip_line_s[index]
+
+                # If the line above horizontally overlaps the line.
+                # Only lines in strips the line partly covers can fail.
+                if covers_strip or (
+                    line_above.x0 < line.x1 and line.x0 < line_above.x1
+                ):
+                    # Store the nearest bottom
+                    nearest_y0 = y0
+
+                    # Stop searching the strip
+                    break
+
+        # Return the gap, or None if no line is above
+        return nearest_y0 - line.y1 if nearest_y0 is not None else None
+
+    def _get_strip_range(self, line):
+        """
+        Get the range of strips a line crosses.
+
+        @param line: LTTextLine item.
+
+        @return: A (first strip index, last strip index) tuple.
+        """
+        # Get max strip index
+        max_index = len(self._strip_s) - 1
+
+        # Return the range, limited to existing strips
+        return (
+            min(max(
+                int((line.x0 - self._strip_x0) // self._strip_width), 0
+            ), max_index),
+            min(max(
+                int((line.x1 - self._strip_x0) // self._strip_width), 0
+            ), max_index),
+        )
+
+    def _create_strips(self):
+        """
+        Create vertical strips of lines sorted by bottom.
+
+        @return: None.
+        """
+        # If have lines
+        if self.bottom_line_s:
+            # Get left of the first strip
+            self._strip_x0 = min(line.x0 for line in self.bottom_line_s)
+
+            # Get width of each strip
+            self._strip_width = max(
+                (max(line.x1 for line in self.bottom_line_s)
+                 - self._strip_x0) / float(self.STRIP_COUNT),
+                1,
+            )
+
+        # Create strips
+        self._strip_s = [([], []) for _ in range(self.STRIP_COUNT)]
+
+        # For each line, bottom to top, so strips are sorted by bottom
+        for line in self.bottom_line_s:
+            # Get the range of strips the line crosses
+            first_strip, last_strip = self._get_strip_range(line)
+
+            # For each strip the line crosses
+            for strip_index in range(first_strip, last_strip + 1):
+                # Get the strip's lines and their bottoms
+                strip_line_s, strip_bottom_s = self._strip_s[strip_index]
+
+                # Add the line to the strip
+                strip_line_s.append(line)
+
+                strip_bottom_s.append(line.y0)
+
+
+#
+class TextlineDispatcher(object):
+    """
+    Passes textlines of page records from an extraction backend to a textline
+    handler. The handler gets an info dict for each textline, with these
+    entries:
     info = {
         'page_num': Page number.
-        'line_item': LTTextLine item.
+        'page_item': Backend's page item, e.g. LTPage item.
+        'line_item': Line item, e.g. LTTextLine item.
         'line_text': Line text.
+        'is_running_line': Whether the line is a running header or footer
+        found by the running line index. False if no index is given.
+        'textbox_item': Textbox item containing the line, e.g. LTTextBox item,
+        or None.
+        'page_lines': PageLineIndex object of the page's lines.
+        'prev_line': Line item before the line, in top to bottom order, or
+        None.
+        'next_line': Line item after the line, in top to bottom order, or
+        None.
+        'gap_above': A function that returns vertical gap to the nearest
+        horizontally overlapping line above, or None.
+        'lines_above': A function that takes a distance and returns lines
+        whose bottoms are above the line's top within the distance.
+        'line_items': Line items merged into the line by line merger, top line
+        first. Only the line item itself if not merged.
+        'log': DiagnosticLog object for the handler's diagnostics. Records
+        are dropped if no log is given.
     }
+    If a line merger is given, wrapped lines merged by it are passed once,
+    as the top line's item with the combined text.
+    Lines are passed in layout order after all lines of the page are indexed,
+    so the neighbour entries cover the whole page.
+    The handler can raise "StopParsing" or "SkipToPage" to stop parsing or
+    skip pages once current page is finished.
+    If a page handler is given, it is used instead of the handler: info dicts
+    of a page's textlines are collected in layout order, and passed to it at
+    once after the page's last textline. It returns the page's bookmark
+    lines, e.g. "RuleSet.match_page", and can raise parse controls too.
+    """
+
+    def __init__(
+        self,
+        handler,
+        running_line_index=None,
+        drop_running_lines=False,
+        line_merger=None,
+        log=None,
+        page_handler=None,
+    ):
+        """
+        Initialize object.
+
+        @param handler: Textline handler. Unused if page handler is given.
+
+        @param running_line_index: RunningLineIndex object used to flag
+        running headers and footers. None means not flagging.
+
+        @param drop_running_lines: Whether not pass running headers and
+        footers to the handler. Default is False.
+
+        @param line_merger: LineMerger object that merges wrapped lines before
+        they are passed to the handler. None means not merging.
+
+        @param log: DiagnosticLog object passed to the handler. None means
+        dropping the handler's diagnostics.
+
+        @param page_handler: Page handler that takes a page's textline info
+        dicts and returns a list of the page's bookmark lines. None means
+        passing textlines to the handler one by one.
+
+        @return: None.
+        """
+        # Textline handler
+        self.handler = handler
+
+        # Page handler
+        self.page_handler = page_handler
+
+        # A list of textline info dicts of current page, collected for the
+        # page handler
+        self.page_info_s = []
+
+        # Parse control raised by the handler. None means no control.
+        self.parse_control = None
+
+        # Current page number
+        self.page_num = None
+
+        # Current page item
+        self.page_item = None
+
+        # PageLineIndex object of current page
+        self.page_line_index = None
+
+        # Running line index
+        self.running_line_index = running_line_index
+
+        # Whether not pass running lines to the handler
+        self.drop_running_lines = drop_running_lines
+
+        # Line merger
+        self.line_merger = line_merger
+
+        # Diagnostics log
+        self.log = log if log is not None else NULL_LOG
+
+    def process_page(self, page_record):
+        """
+        Pass textlines of a page to the handler.
+
+        @param page_record: PageRecord object.
+
+        @return: None.
+        """
+        # Store current page number
+        self.page_num = page_record.page_num
+
+        # Store current page item
+        self.page_item = page_record.page_item
+
+        # Get the page's (line item, textbox item) tuples
+        page_line_s = page_record.line_s
+
+        # Create the page's line index
+        self.page_line_index = PageLineIndex(
+            [line_item for line_item, _ in page_line_s])
+
+        # Clear the page's textline info dicts
+        self.page_info_s = []
+
+        # A dict that maps ID of merged group's top line item to the group
+        group_s = {}
+
+        # A set of IDs of merged line items other than top line items
+        merged_id_s = set()
+
+        # If line merger is given
+        if self.line_merger is not None:
+            # For each merged group
+            for group in self.line_merger.merge(self.page_line_index.line_s):
+                # Map the top line item to the group
+                group_s[id(group[0])] = group
+
+                # Store IDs of other line items
+                merged_id_s.update(id(line_item) for line_item in group[1:])
+
+        # For each textline item in layout order
+        for line_item, textbox_item in page_line_s:
+            # If the line item is merged into a line above
+            if id(line_item) in merged_id_s:
+                # Ignore the line item
+                continue
+
+            # Pass the textline to the handler
+            self.process_textline(
+                line_item,
+                textbox_item,
+                merged_items=group_s.get(id(line_item)),
+            )
+
+        # If page handler is given
+        if self.page_handler is not None:
+            # Pass the page's textlines to the page handler
+            self.call_handler(self.page_handler, self.page_info_s)
+
+            # Clear the page's textline info dicts
+            self.page_info_s = []
+
+    @staticmethod
+    def get_line_text(item):
+        """
+        Get text of a textline item.
+
+        @param item: LTTextLine item.
+
+        @return: Line text.
+        """
+        # A list of characters of the textline item
+        char_s = []
+
+        # For each character item in the textline item
+        for char_item in item:
+            # Get the character
+            char = char_item.get_text()
+
+            # Add to the list
+            char_s.append(char)
+
+        # Return line text
+        return ''.join(char_s)
+
+    def process_textline(self, item, textbox_item, merged_items=None):
+        """
+        Pass a textline item to the handler.
+
+        @param item: LTTextLine item.
+
+        @param textbox_item: LTTextBox item containing the textline, or None.
+
+        @param merged_items: LTTextLine items merged by line merger, top line
+        (i.e. "item") first. None means not merged.
+
+        @return: Handler's return value.
+        """
+        # Get parse control raised by user's handler
+        parse_control = self.parse_control
+
+        # If the parse control says not to finish current page
+        if parse_control is not None and not parse_control.finish_page:
+            # Ignore the textline item
+            return None
+
+        # Get line text
+        line_text = self.get_line_text(item)
+
+        # Whether the line is a running header or footer
+        is_running_line = False
+
+        # If running line index is given
+        if self.running_line_index is not None:
+            # Get first character item from the line item
+            char1 = next(iter(item), None)
+
+            # Get the character's matrix
+            matrix = getattr(char1, 'matrix', None)
+
+            # If the character has matrix
+            if matrix is not None:
+                # Test whether the line is a running line.
+                # The matrix's vertical translation is the baseline.
+                is_running_line = self.running_line_index.is_running_line(
+                    matrix[5], line_text, page_num=self.page_num)
+
+            # If the line is a running line and running lines are dropped
+            if is_running_line and self.drop_running_lines:
+                # Ignore the textline item
+                return None
+
+        # If the line is merged with lines below
+        if merged_items is not None:
+            # Get combined text of merged lines
+            line_text = ' '.join(
+                self.get_line_text(merged_item).strip()
+                for merged_item in merged_items
+            ) + '\n'
+
+        # Get page number
+        page_num = self.page_num
+
+        # Get info dict
+        info = {
+            'page_num': page_num,
+            'page_item': self.page_item,
+            'line_item': item,
+            'line_text': line_text,
+            'is_running_line': is_running_line,
+            'textbox_item': textbox_item,
+            'page_lines': self.page_line_index,
+            'prev_line': self.page_line_index.get_prev_line(item),
+            'next_line': self.page_line_index.get_next_line(item),
+            'gap_above': lambda: self.page_line_index.get_gap_above(item),
+            'lines_above': lambda dy: self.page_line_index.get_lines_above(
+                item, dy),
+            'line_items': merged_items if merged_items is not None else [item],
+            'log': self.log,
+        }
+
+        # If page handler is given
+        if self.page_handler is not None:
+            # Collect the info dict for the page handler
+            self.page_info_s.append(info)
+
+            # Return None
+            return None
+
+        # Call user's handler
+        return self.call_handler(self.handler, info)
+
+    def call_handler(self, handler, arg):
+        """
+        Call user's textline handler or page handler, storing parse control
+        raised by it.
+
+        @param handler: Textline handler or page handler.
+
+        @param arg: Info dict, or a list of info dicts.
+
+        @return: Handler's return value, or None if it raises parse control.
+        """
+        #
+        try:
+            # Call user's handler
+            return handler(arg)
+        # Catch parse control raised by user's handler
+        except ParseControl as exc:
+            # If the parse control is not stopping parsing already set
+            if not isinstance(self.parse_control, StopParsing):
+                # Store the parse control
+                self.parse_control = exc
+
+            # Return None
+            return None
+
+
+#
+class TextlineConverter(PDFConverter, TextlineDispatcher):
+    """
+    PDFPageInterpreter parses each PDF page into a LTPage item.
+    PDFPageInterpreter passes the LTPage item to TextlineConverter.
+    TextlineConverter walks through the LTPage item, finds each LTTextLine
+    item in it, and stores them as a page record.
+    If a textline handler is given, the page record is passed to it as in
+    class "TextlineDispatcher". Pdfminer extraction backend uses it without a
+    handler.
     """
 
     # Item type name to handler method name
@@ -39,11 +635,16 @@ class TextlineConverter(PDFConverter):
         rsrcmgr,
         pageno=None,
         laparams=None,
+        running_line_index=None,
+        drop_running_lines=False,
+        line_merger=None,
+        log=None,
     ):
         """
         Initialize object.
 
-        @param handler: Textline handler.
+        @param handler: Textline handler. None means only storing page
+        records.
 
         @param rsrcmgr: Resource manager object.
 
@@ -51,6 +652,14 @@ class TextlineConverter(PDFConverter):
 
         @param laparams: Converter parameters.
 
+        @param running_line_index: See class "TextlineDispatcher".
+
+        @param drop_running_lines: See class "TextlineDispatcher".
+
+        @param line_merger: See class "TextlineDispatcher".
+
+        @param log: See class "TextlineDispatcher".
+
         @return: None.
         """
         # Call supper method
@@ -63,8 +672,24 @@ class TextlineConverter(PDFConverter):
             laparams=laparams if laparams is not None else LAParams(),
         )
 
-        # Textline handler
-        self.handler = handler
+        # Call supper method
+        TextlineDispatcher.__init__(
+            self,
+            handler=handler,
+            running_line_index=running_line_index,
+            drop_running_lines=drop_running_lines,
+            line_merger=line_merger,
+            log=log,
+        )
+
+        # Current LTTextBox item
+        self.textbox_item = None
+
+        # A list of (LTTextLine item, LTTextBox item) tuples of current page
+        self.page_line_s = []
+
+        # PageRecord object of the last page
+        self.page_record = None
 
     def receive_layout(self, item):
         """
@@ -112,11 +737,30 @@ class TextlineConverter(PDFConverter):
 
         @return: None.
         """
+        # Create the page's textline list
+        self.page_line_s = []
+
         # For child item in the page item
         for child_item in item:
-            # Handle the child item
+            # Handle the child item.
+            # Textline items are collected into the textline list.
             self.handle_item(child_item)
 
+        # Create page record.
+        # The converter's page number is already incremented to current page
+        # number.
+        self.page_record = PageRecord(
+            page_num=self.pageno,
+            page_item=item,
+            bbox=item.bbox,
+            line_s=self.page_line_s,
+        )
+
+        # If textline handler is given
+        if self.handler is not None:
+            # Pass the page's textlines to the handler
+            self.process_page(self.page_record)
+
     def handle_textbox(self, item):
         """
         Handle a parsed textbox item.
@@ -125,11 +769,17 @@ class TextlineConverter(PDFConverter):
 
         @return: None.
         """
+        # Store current textbox item
+        self.textbox_item = item
+
         # For child item (i.e. textline item) in the textbox item
         for child in item:
             # Handle the child item
             self.handle_item(child)
 
+        # Clear current textbox item
+        self.textbox_item = None
+
     def handle_textline(self, item):
         """
         Handle a parsed textline item.
@@ -138,32 +788,132 @@ class TextlineConverter(PDFConverter):
 
         @return: None.
         """
-        # A list of characters of the textline item
-        char_s = []
+        # Collect the textline item and its textbox item
+        self.page_line_s.append((item, self.textbox_item))
 
-        # For each character item in the textline item
-        for char_item in item:
-            # Get the character
-            char = char_item.get_text()
 
-            # Add to the list
-            char_s.append(char)
+#
+class PdfminerBackend(ExtractionBackend):
+    """
+    Extraction backend using pdfminer's layout analysis via
+    "TextlineConverter". It is the default backend.
+    """
 
-        # Get line text
-        line_text = ''.join(char_s)
+    name = 'pdfminer'
 
-        # Get page number
-        page_num = self.pageno
+    def __init__(self, laparams=None, skip_textless=False, font_cache=None):
+        """
+        Initialize object.
 
-        # Get info dict
-        info = {
-            'page_num': page_num,
-            'line_item': item,
-            'line_text': line_text,
-        }
+        @param laparams: Layout analysis parameters. Default is pdfminer's.
 
-        # Call user's handler
-        return self.handler(info)
+        @param skip_textless: Whether skip interpreting pages without
+        text-showing operators, e.g. pages of scanned images. Their content
+        streams and form XObjects are scanned for text-showing operators
+        first. A skipped page's record has no lines and no page item.
+        Default is False.
+
+        @param font_cache: See function "fontcache.create_resource_manager".
+
+        @return: None.
+        """
+        # Layout analysis parameters
+        self.laparams = laparams
+
+        # Font cache shared with other documents
+        self.font_cache = font_cache
+
+        # Whether skip interpreting pages without text
+        self.skip_textless = skip_textless
+
+        # Number of pages skipped because they have no text
+        self.textless_page_count = 0
+
+    def iter_pages(
+        self, pdf_file, npages=None, password=None, page_filter=None
+    ):
+        """
+        Iterate page records of a PDF file. See class "ExtractionBackend".
+        """
+        # Create resource manager that caches shared resources.
+        # It shares font objects across documents if font cache is given or
+        # installed.
+        resource_manager = create_resource_manager(font_cache=self.font_cache)
+
+        # Create converter that stores parsed pages as page records
+        converter = TextlineConverter(
+            handler=None,
+            rsrcmgr=resource_manager,
+            laparams=self.laparams,
+        )
+
+        # Create PDFPageInterpreter.
+        # Interpreter parses input PDF file into parsed page items.
+        # Converter converts these parsed page items to page records.
+        interpreter = PDFPageInterpreter(resource_manager, converter)
+
+        #
+        try:
+            # For each page in the PDF file
+            for page_index, page in enumerate(PDFPage.get_pages(
+                pdf_file,
+                pagenos=None,  # Specific pages to process. Unused.
+                maxpages=npages or 0,  # Max number of pages to process
+                password=password if password is not None else '',
+                caching=True,
+                check_extractable=True,
+            )):
+                # If the page is not to process
+                if page_filter is not None and not page_filter(page_index + 1):
+                    # Skip the page
+                    continue
+
+                # If skipping pages without text, and the page has no text
+                if self.skip_textless and not page_has_text(page):
+                    # Increment skipped pages count
+                    self.textless_page_count += 1
+
+                    # Get page width and height
+                    x0, y0, x1, y1 = page.mediabox
+
+                    width, height = abs(x1 - x0), abs(y1 - y0)
+
+                    # If the page is rotated sideways
+                    if page.rotate in (90, 270):
+                        # Swap width and height, as "LTPage" does
+                        width, height = height, width
+
+                    # Yield the page record without interpreting the page
+                    yield PageRecord(
+                        page_num=page_index + 1,
+                        page_item=None,
+                        bbox=(0, 0, width, height),
+                        line_s=[],
+                    )
+
+                    # Get next page
+                    continue
+
+                # Set converter's page number.
+                # The converter increments it to current page number at page
+                # end.
+                converter.pageno = page_index
+
+                # Process the page
+                interpreter.process_page(page)
+
+                # Yield the page record
+                yield converter.page_record
+        finally:
+            # Close the converter
+            converter.close()
+
+
+# Register pdfminer backend as the default backend
+register_extraction_backend(PdfminerBackend)
+
+# Register PyMuPDF backend
+register_extraction_backend(PymupdfBackend)
 
 
 #
@@ -172,46 +922,160 @@ def parse_pdf(
     handler,
     npages=None,
     password=None,
+    page_nums=None,
+    running_line_index=None,
+    drop_running_lines=False,
+    line_merger=None,
+    log=None,
+    backend=None,
+    start_page_num=None,
+    page_done_func=None,
+    skip_textless=False,
+    page_handler=None,
 ):
     """
     Parse a PDF file.
 
     @param pdf_file: PDF file to parse.
 
-    @param handler: Textline handler.
+    @param handler: Textline handler. Unused if page handler is given.
 
     @param npages: Max number of pages to process. 0 or None means all pages.
     Default is all pages.
 
+    @param page_nums: A collection of page numbers to process. Other pages are
+    skipped. None means all pages.
+
     @param password: PDF file's password.
 
-    @return: None.
+    @param running_line_index: RunningLineIndex object from
+    "find_running_lines", used to flag running headers and footers.
+
+    @param drop_running_lines: Whether not pass running headers and footers
+    to the handler.
+
+    @param line_merger: LineMerger object that merges wrapped heading lines
+    before they are passed to the handler. None means not merging.
+
+    @param log: DiagnosticLog object passed to the handler as "info['log']".
+    None means dropping the handler's diagnostics.
+
+    @param backend: Extraction backend name or ExtractionBackend object. None
+    means the default backend, i.e. pdfminer.
+
+    @param start_page_num: Page number to begin parsing at, e.g. to resume
+    from a checkpoint. Pages before it are not interpreted. None means the
+    first page.
+
+    @param page_done_func: A function called after each page is completed,
+    with the page number and the page number to resume parsing at, which is
+    None if the handler stopped parsing.
+
+    @param skip_textless: Whether skip layout analysis of pages without
+    text-showing operators. Only pdfminer backend supports it; other backends
+    ignore it. Default is False.
+
+    @param page_handler: See class "TextlineDispatcher".
+
+    @return: Number of pages skipped because they have no text.
     """
-    # Create resource manager that caches shared resources.
-    resource_manager = PDFResourceManager(caching=True)
+    # If skipping pages without text, and using pdfminer backend
+    if skip_textless and backend in (None, PdfminerBackend.name):
+        # Create pdfminer backend that skips pages without text
+        backend = PdfminerBackend(skip_textless=True)
+
+    # Get extraction backend
+    backend = get_extraction_backend(backend)
 
-    # Create converter that handles parsed page items from PDFPageInterpreter
-    converter = TextlineConverter(
+    # Create dispatcher that passes textlines to the handler
+    dispatcher = TextlineDispatcher(
         handler=handler,
-        rsrcmgr=resource_manager,
+        running_line_index=running_line_index,
+        drop_running_lines=drop_running_lines,
+        line_merger=line_merger,
+        log=log,
+        page_handler=page_handler,
     )
 
-    # Create PDFPageInterpreter.
-    # Interpreter parses input PDF file into parsed page items.
-    # Converter converts these parsed page items to output data.
-    interpreter = PDFPageInterpreter(resource_manager, converter)
+    # Page number to resume parsing at, in a list so the page filter sees
+    # changes. None means not skipping.
+    skip_to_page_num_s = [start_page_num]
+
+    # If page numbers to process are given
+    if page_nums is not None:
+        # Convert to set for fast lookup
+        page_nums = set(page_nums)
+
+        # Get max page number to process
+        max_page_num = max(page_nums) if page_nums else 0
+
+        # If max page number is less than max number of pages
+        if not npages or max_page_num < npages:
+            # Stop parsing after max page number.
+            # Use a negative value so that "no pages" is not "all pages".
+            npages = max_page_num or -1
+
+    # If no pages to process
+    if npages is not None and npages < 0:
+        # Return no pages skipped
+        return 0
+
+    # Create a function that tests whether a page is to process
+    def page_filter(page_num):
+        # If page numbers to process are given, and the page number is not
+        # to process
+        if page_nums is not None and page_num not in page_nums:
+            # Skip the page
+            return False
+
+        # Get page number to resume parsing at
+        skip_to_page_num = skip_to_page_num_s[0]
+
+        # If skipping pages and the page is before the page to resume at
+        if skip_to_page_num is not None and page_num < skip_to_page_num:
+            # Skip the page
+            return False
 
-    # For each page in the PDF file
-    for page in PDFPage.get_pages(
+        # Process the page
+        return True
+
+    # For each page record from the backend
+    for page_record in backend.iter_pages(
         pdf_file,
-        pagenos=None,  # Specific pages to process. Unused.
-        maxpages=npages,  # Max number of pages to process
-        password=password if password is not None else '',
-        caching=True,
-        check_extractable=True,
+        npages=npages,
+        password=password,
+        page_filter=page_filter,
     ):
-        # Process the page
-        interpreter.process_page(page)
+        # Pass the page's textlines to the handler
+        dispatcher.process_page(page_record)
+
+        # Get page number
+        page_num = page_record.page_num
+
+        # Get parse control raised by user's handler
+        parse_control = dispatcher.parse_control
+
+        # Clear the parse control
+        dispatcher.parse_control = None
+
+        # If the parse control is to skip pages
+        if isinstance(parse_control, SkipToPage):
+            # Set page number to resume parsing at
+            skip_to_page_num_s[0] = parse_control.page_num
+
+        # If page done function is given
+        if page_done_func is not None:
+            # Call the function with the page number to resume parsing at
+            page_done_func(
+                page_num,
+                None if isinstance(parse_control, StopParsing)
+                else max(page_num + 1, skip_to_page_num_s[0] or 0),
+            )
+
+        # If the parse control is to stop parsing
+        if isinstance(parse_control, StopParsing):
+            # Stop parsing
+            break
 
-    # Close the converter
-    converter.close()
+    # Return number of pages skipped because they have no text
+    return getattr(backend, 'textless_page_count', 0)
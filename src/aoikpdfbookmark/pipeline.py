@@ -0,0 +1,398 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import multiprocessing
+import os
+import os.path
+import pickle
+import shutil
+import signal
+import sys
+import tempfile
+import traceback
+
+from .pdfmaker import IncrementalPdfWriter
+
+
+#
+def _send_error(conn):
+    """
+    Send current exception through connection. The exception is sent as is
+    if picklable, otherwise as RuntimeError with the traceback text.
+
+    @param conn: Connection object.
+
+    @return: None.
+    """
+    # Get exception info
+    exc = sys.exc_info()[1]
+
+    #
+    try:
+        # Test whether the exception is picklable
+        pickle.loads(pickle.dumps(exc))
+    # If the exception is not picklable
+    except Exception:
+        # Use RuntimeError with the traceback text
+        exc = RuntimeError(traceback.format_exc())
+
+    #
+    try:
+        # Send the error
+        conn.send(exc)
+    # If the other side has gone
+    except (EOFError, OSError):
+        # Nobody to tell
+        pass
+
+
+#
+def _sigterm_handler(signum, frame):
+    """
+    Signal handler that turns termination signal into "SystemExit", so the
+    worker removes its temporary file when terminated.
+
+    @param signum: Signal number.
+
+    @param frame: Current stack frame.
+
+    @return: None.
+    """
+    # Exit
+    raise SystemExit(1)
+
+
+#
+def _write_worker(
+    conn,
+    parent_conn,
+    input_file_path,
+    output_file_path,
+    writer_kwargs,
+):
+    """
+    Worker process function that copies input file's pages into a temporary
+    file, waits for bookmarks, finishes the temporary file, and renames it to
+    output file path.
+
+    @param conn: Worker side connection. Receives (bookmark specs, file
+    identifier) to finish, or None to cancel. Sends None on success, or the
+    error.
+
+    @param parent_conn: Parent side connection, closed here so that the
+    worker sees EOF if the parent exits without finishing or cancelling.
+
+    @param input_file_path: Input PDF file path. The file is not encrypted.
+
+    @param output_file_path: Output PDF file path.
+
+    @param writer_kwargs: A dict of keyword arguments of
+    "IncrementalPdfWriter".
+
+    @return: None.
+    """
+    # Close the parent side connection
+    parent_conn.close()
+
+    # Remove the temporary file when terminated
+    signal.signal(signal.SIGTERM, _sigterm_handler)
+
+    # Create temporary file in output file's directory, so it can be renamed
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(output_file_path)),
+        suffix='.tmp',
+    )
+
+    #
+    try:
+        # Open input file
+        with open(input_file_path, 'rb') as input_file:
+            # Open temporary file
+            with os.fdopen(fd, 'wb') as tmp_file:
+                # Create PDF writer
+                pdf_writer = IncrementalPdfWriter(
+                    input_file=input_file,
+                    output_file=tmp_file,
+                    **writer_kwargs
+                )
+
+                # Copy pages while bookmarks are being extracted
+                pdf_writer.copy_pages()
+
+                #
+                try:
+                    # Wait for bookmarks
+                    message = conn.recv()
+                # If the parent exits without finishing or cancelling
+                except EOFError:
+                    # Cancel
+                    message = None
+
+                # If cancelled
+                if message is None:
+                    # Remove the temporary file
+                    raise SystemExit(0)
+
+                # Get bookmark specs and file identifier
+                bookmark_spec_s, file_id = message
+
+                # Write bookmarks, cross-reference table, and trailer
+                pdf_writer.finish(bookmark_spec_s, file_id=file_id)
+
+        # Get file mode creation mask
+        umask = os.umask(0)
+
+        os.umask(umask)
+
+        # Give the temporary file the mode of a file created normally, instead
+        # of the owner-only mode "mkstemp" uses
+        os.chmod(tmp_path, 0o666 & ~umask)
+
+        # Rename the temporary file to output file path.
+        # "os.replace" overwrites existing file on Windows too.
+        getattr(os, 'replace', os.rename)(tmp_path, output_file_path)
+
+        # Send success
+        conn.send(None)
+    # If have error, or cancelled
+    except BaseException:
+        #
+        try:
+            # Remove the temporary file
+            os.remove(tmp_path)
+        # If the file is not removed
+        except OSError:
+            # Ignore
+            pass
+
+        # If not cancelled
+        if not isinstance(sys.exc_info()[1], SystemExit):
+            # Send the error
+            _send_error(conn)
+
+
+#
+class PdfWriterProcess(object):
+    """
+    Writes output PDF file in a worker process, pipelined with bookmark
+    extraction: the worker copies pages while bookmarks are being extracted,
+    then adds the outline and writes the cross-reference table once the
+    bookmarks are given via "finish". See "pdfmaker.IncrementalPdfWriter".
+
+    Output file is written to a temporary file and renamed when finished, so
+    an unfinished run leaves the old output file intact.
+    """
+
+    def __init__(
+        self,
+        input_file_path,
+        output_file_path,
+        npages=None,
+        strict=None,
+        page_mode=None,
+        input_file=None,
+        encrypt_password=None,
+        defer_encryption=False,
+    ):
+        """
+        Initialize object.
+
+        @param input_file_path: Input PDF file path. Used if "input_file" is
+        not given. The file must not be encrypted.
+
+        @param output_file_path: Output PDF file path.
+
+        @param npages: See "copy_pdf_add_bookmarks".
+
+        @param strict: See "copy_pdf_add_bookmarks".
+
+        @param page_mode: See "copy_pdf_add_bookmarks".
+
+        @param input_file: Decrypted copy of input PDF file, e.g. from
+        "open_decrypted_pdf". It is written once to a temporary file for the
+        worker to read, so the worker needs not decrypt input file again.
+
+        @param encrypt_password: See "copy_pdf_add_bookmarks".
+
+        @param defer_encryption: See "IncrementalPdfWriter".
+
+        @return: None.
+        """
+        # Input PDF file path
+        self.input_file_path = input_file_path
+
+        # Output PDF file path
+        self.output_file_path = output_file_path
+
+        # Decrypted copy of input PDF file. None means input file path is
+        # used.
+        self.input_file = input_file
+
+        # Keyword arguments of "IncrementalPdfWriter"
+        self.writer_kwargs = {
+            'npages': npages,
+            'strict': strict,
+            'page_mode': page_mode,
+            'password': None,
+            'encrypt_password': encrypt_password,
+            'defer_encryption': defer_encryption,
+        }
+
+        # Temporary file path of the decrypted copy. Created in "start".
+        self._input_tmp_path = None
+
+        # Parent side connection. Created in "start".
+        self._conn = None
+
+        # Worker process. Created in "start".
+        self._process = None
+
+    def start(self):
+        """
+        Start the worker process, which starts copying pages.
+
+        @return: None.
+        """
+        # If decrypted copy of input file is given
+        if self.input_file is not None:
+            # Create temporary file for the decrypted copy
+            fd, self._input_tmp_path = tempfile.mkstemp(suffix='.pdf')
+
+            # Get the copy's seek pointer
+            position = self.input_file.tell()
+
+            #
+            try:
+                # Open the temporary file
+                with os.fdopen(fd, 'wb') as input_tmp_file:
+                    # Set the copy's seek pointer to beginning
+                    self.input_file.seek(0)
+
+                    # Write the copy to the temporary file
+                    shutil.copyfileobj(self.input_file, input_tmp_file)
+            # If have error
+            except BaseException:
+                # Remove the temporary file
+                self._remove_input_tmp_file()
+
+                # Raise the error
+                raise
+            finally:
+                # Restore the copy's seek pointer
+                self.input_file.seek(position)
+
+        # Create connections
+        self._conn, worker_conn = multiprocessing.Pipe()
+
+        # Create worker process
+        self._process = multiprocessing.Process(
+            target=_write_worker,
+            args=(
+                worker_conn,
+                self._conn,
+                self._input_tmp_path or self.input_file_path,
+                self.output_file_path,
+                self.writer_kwargs,
+            ),
+        )
+
+        # Kill the worker if this process exits
+        self._process.daemon = True
+
+        # Start the worker
+        self._process.start()
+
+        # Close the worker side connection in this process
+        worker_conn.close()
+
+    def finish(self, bookmarks, file_id=None):
+        """
+        Give bookmarks to the worker process, wait for it to finish output
+        file.
+
+        @param bookmarks: Bookmark specs. See "copy_pdf_add_bookmarks".
+
+        @param file_id: See "copy_pdf_add_bookmarks".
+
+        @return: None.
+        """
+        #
+        try:
+            #
+            try:
+                # Send bookmarks
+                self._conn.send((list(bookmarks), file_id))
+            # If the worker has exited, e.g. failed to copy pages
+            except (EOFError, OSError):
+                # Receive its error below
+                pass
+
+            #
+            try:
+                # Wait for the result
+                error = self._conn.recv()
+            # If the worker exited without sending the result
+            except EOFError:
+                # Get the error
+                error = RuntimeError(
+                    'Error: Output file writer process exited with code {}.'
+                    .format(self._process.exitcode))
+        finally:
+            # Clean up
+            self._stop()
+
+        # If the worker failed
+        if error is not None:
+            # Raise the error
+            raise error
+
+    def cancel(self):
+        """
+        Stop the worker process without writing output file.
+
+        @return: None.
+        """
+        # If the worker is running
+        if self._process.is_alive():
+            # Stop the worker. It removes its temporary file on termination
+            # signal.
+            self._process.terminate()
+
+        # Clean up
+        self._stop()
+
+    def _stop(self):
+        """
+        Close the connection, wait for the worker process to exit.
+
+        @return: None.
+        """
+        # Close the connection
+        self._conn.close()
+
+        # Wait for the worker to exit
+        self._process.join()
+
+        # Remove the temporary file of the decrypted copy
+        self._remove_input_tmp_file()
+
+    def _remove_input_tmp_file(self):
+        """
+        Remove the temporary file of the decrypted copy, if created.
+
+        @return: None.
+        """
+        # If the temporary file is created
+        if self._input_tmp_path is not None:
+            #
+            try:
+                # Remove the temporary file
+                os.remove(self._input_tmp_path)
+            # If the file is not removed
+            except OSError:
+                # Ignore
+                pass
+
+            # Mark the temporary file removed
+            self._input_tmp_path = None
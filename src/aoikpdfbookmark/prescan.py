@@ -0,0 +1,373 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from pdfminer.pdfinterp import PDFContentParser
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import dict_value
+from pdfminer.pdftypes import PDFStream
+from pdfminer.pdftypes import resolve1
+from pdfminer.pdftypes import stream_value
+from pdfminer.psparser import keyword_name
+from pdfminer.psparser import literal_name
+from pdfminer.psparser import PSEOF
+from pdfminer.psparser import PSKeyword
+from pdfminer.psparser import PSLiteral
+
+
+# Names of operators that show text
+TEXT_SHOWING_OPERATORS = (b'Tj', b'TJ', b"'", b'"')
+
+# Max depth of nested form XObjects to scan
+_MAX_FORM_DEPTH = 8
+
+
+#
+class ContentScan(object):
+    """
+    Result of scanning a page's content streams, and content streams of form
+    XObjects it draws, without interpreting them.
+    """
+
+    def __init__(self):
+        """
+        Initialize object.
+
+        @return: None.
+        """
+        # Number of decoded content stream bytes scanned
+        self.content_size = 0
+
+        # Number of text-showing operators
+        self.text_op_count = 0
+
+        # Number of form XObjects drawn
+        self.form_count = 0
+
+        # Number of image XObjects and inline images drawn
+        self.image_count = 0
+
+        # A dict that maps (font name, declared font size) to the number of
+        # "Tf" operators setting it
+        self.font_size_count_s = {}
+
+
+#
+def _get_font_name(font_map, font_id):
+    """
+    Get a font resource's base font name.
+
+    @param font_map: Font resources dict.
+
+    @param font_id: Font resource name.
+
+    @return: Base font name, or the resource name if not found.
+    """
+    # Get font spec
+    font_spec = dict_value(font_map.get(font_id))
+
+    # Get base font name
+    base_font = resolve1(font_spec.get('BaseFont'))
+
+    # If base font name is a name object
+    if isinstance(base_font, PSLiteral):
+        # Return base font name
+        return literal_name(base_font)
+
+    # Return resource name
+    return font_id
+
+
+#
+def _scan_content(
+    content_scan,
+    resources,
+    streams,
+    stop_at_text,
+    visited_ids,
+    depth,
+):
+    """
+    Scan content streams, recursing into form XObjects.
+
+    @param content_scan: ContentScan object to add to.
+
+    @param resources: Resources dict of the content streams.
+
+    @param streams: A list of content streams or references to them.
+
+    @param stop_at_text: Whether stop at the first text-showing operator.
+
+    @param visited_ids: A set of object IDs of form XObjects scanned, to
+    avoid scanning shared or cyclic forms twice.
+
+    @param depth: Nesting depth of form XObjects.
+
+    @return: None.
+    """
+    # Resolve content streams
+    stream_s = [stream_value(stream) for stream in streams]
+
+    # Get decoded content data
+    data_s = [stream.get_data() for stream in stream_s]
+
+    # Add content size
+    content_scan.content_size += sum(len(data) for data in data_s)
+
+    # If no bytes that can be a text-showing, font or XObject operator.
+    # This skips tokenizing most image-only and graphics-only pages.
+    if not any(
+        b'T' in data or b"'" in data or b'"' in data or b'Do' in data
+        or b'BI' in data
+        for data in data_s
+    ):
+        # Nothing to count
+        return
+
+    # Get font resources
+    font_map = dict_value(resources.get('Font'))
+
+    # Get XObject resources
+    xobject_map = dict_value(resources.get('XObject'))
+
+    #
+    try:
+        # Create content parser
+        parser = PDFContentParser(stream_s)
+    # If the streams are empty
+    except PSEOF:
+        # Nothing to count
+        return
+
+    # A list of operands of the next operator
+    operand_s = []
+
+    # For each token
+    while True:
+        #
+        try:
+            # Get next object
+            _, obj = parser.nextobject()
+        # If no more objects
+        except PSEOF:
+            # Stop scanning
+            break
+
+        # If the object is an operand
+        if not isinstance(obj, PSKeyword):
+            # Add the operand
+            operand_s.append(obj)
+
+            # Get next object
+            continue
+
+        # Get operator name
+        op_name = keyword_name(obj)
+
+        # If the operator name is text.
+        # pdfminer gives bytes names on Python 3.
+        if not isinstance(op_name, bytes):
+            # Convert to bytes
+            op_name = op_name.encode('latin-1')
+
+        # If the operator shows text
+        if op_name in TEXT_SHOWING_OPERATORS:
+            # Increment text-showing operators count
+            content_scan.text_op_count += 1
+
+            # If stop at the first text-showing operator
+            if stop_at_text:
+                # Stop scanning
+                return
+        # If the operator sets font
+        elif op_name == b'Tf' and len(operand_s) >= 2 \
+                and isinstance(operand_s[-2], PSLiteral):
+            # Get font name
+            font_name = _get_font_name(
+                font_map, literal_name(operand_s[-2]))
+
+            # Get declared font size
+            font_size = resolve1(operand_s[-1])
+
+            # If the font size is a number
+            if isinstance(font_size, (int, float)):
+                # Get the key
+                key = (font_name, round(float(font_size), 2))
+
+                # Increment the key's count
+                content_scan.font_size_count_s[key] = \
+                    content_scan.font_size_count_s.get(key, 0) + 1
+        # If the operator draws an inline image
+        elif op_name == b'EI':
+            # Increment images count
+            content_scan.image_count += 1
+        # If the operator draws an XObject
+        elif op_name == b'Do' and operand_s \
+                and isinstance(operand_s[-1], PSLiteral):
+            # Get XObject reference
+            xobject_ref = xobject_map.get(literal_name(operand_s[-1]))
+
+            # Get XObject
+            xobject = resolve1(xobject_ref)
+
+            # If the XObject is a stream
+            if isinstance(xobject, PDFStream):
+                # Get XObject subtype
+                subtype = resolve1(xobject.get('Subtype'))
+
+                # Get XObject subtype name
+                subtype_name = literal_name(subtype) \
+                    if isinstance(subtype, PSLiteral) else None
+
+                # If the XObject is an image
+                if subtype_name == 'Image':
+                    # Increment images count
+                    content_scan.image_count += 1
+                # If the XObject is a form not scanned yet
+                elif subtype_name == 'Form' and depth < _MAX_FORM_DEPTH \
+                        and id(xobject) not in visited_ids:
+                    # Add to scanned forms
+                    visited_ids.add(id(xobject))
+
+                    # Increment forms count
+                    content_scan.form_count += 1
+
+                    # Scan the form's content stream.
+                    # Forms without own resources use the parent's.
+                    _scan_content(
+                        content_scan,
+                        dict_value(xobject.get('Resources')) or resources,
+                        [xobject],
+                        stop_at_text,
+                        visited_ids,
+                        depth + 1,
+                    )
+
+                    # If stop at the first text-showing operator, and the
+                    # form has shown text
+                    if stop_at_text and content_scan.text_op_count:
+                        # Stop scanning
+                        return
+
+        # Clear operands
+        operand_s = []
+
+
+#
+def scan_page_content(page, stop_at_text=False):
+    """
+    Scan a page's content streams without interpreting them.
+
+    @param page: PDFPage object.
+
+    @param stop_at_text: Whether stop at the first text-showing operator.
+    Used to test whether the page has text cheaply. Default is False.
+
+    @return: ContentScan object.
+    """
+    # Create result
+    content_scan = ContentScan()
+
+    # Scan the page's content streams
+    _scan_content(
+        content_scan,
+        dict_value(page.resources),
+        page.contents,
+        stop_at_text,
+        set(),
+        0,
+    )
+
+    # Return result
+    return content_scan
+
+
+#
+def page_has_text(page):
+    """
+    Test whether a page has text-showing operators, in its content streams or
+    form XObjects it draws.
+
+    @param page: PDFPage object.
+
+    @return: Boolean.
+    """
+    # Return whether the page has text-showing operators
+    return scan_page_content(page, stop_at_text=True).text_op_count > 0
+
+
+#
+def inspect_pdf(pdf_file, npages=None, password=None):
+    """
+    Pre-scan a PDF file without layout analysis, to estimate the cost of
+    parsing it and which fonts and sizes it uses.
+
+    Only the page tree, content streams, and font resources are read. Font
+    sizes are the sizes declared by "Tf" operators, not scaled by text or
+    transformation matrices.
+
+    @param pdf_file: PDF file to scan.
+
+    @param npages: Max number of pages to process. 0 or None means all pages.
+
+    @param password: PDF file's password.
+
+    @return: A JSON-serializable dict with keys:
+    - page_count: Number of pages scanned.
+    - content_size: Total decoded content stream bytes, the estimated cost
+      of interpreting the file.
+    - pages: A list of dicts, one per page, with keys "page_num",
+      "content_size", "text_op_count", "form_count", and "image_count".
+    - fonts: A list of dicts with keys "font", "size", and "count", sorted by
+      count descending.
+    - textless_pages: A list of page numbers of pages without text.
+    """
+    # A list of page info dicts
+    page_info_s = []
+
+    # A dict that maps (font name, font size) to count
+    font_size_count_s = {}
+
+    # For each page in the PDF file
+    for page_index, page in enumerate(PDFPage.get_pages(
+        pdf_file,
+        maxpages=npages or 0,
+        password=password if password is not None else '',
+        caching=True,
+        check_extractable=True,
+    )):
+        # Scan the page's content streams
+        content_scan = scan_page_content(page)
+
+        # Add page info
+        page_info_s.append({
+            'page_num': page_index + 1,
+            'content_size': content_scan.content_size,
+            'text_op_count': content_scan.text_op_count,
+            'form_count': content_scan.form_count,
+            'image_count': content_scan.image_count,
+        })
+
+        # For each font and size in the page
+        for key, count in content_scan.font_size_count_s.items():
+            # Add to the file's counts
+            font_size_count_s[key] = font_size_count_s.get(key, 0) + count
+
+    # Return result
+    return {
+        'page_count': len(page_info_s),
+        'content_size': sum(
+            page_info['content_size'] for page_info in page_info_s),
+        'pages': page_info_s,
+        'fonts': [
+            {'font': font_name, 'size': font_size, 'count': count}
+            for (font_name, font_size), count in sorted(
+                font_size_count_s.items(),
+                key=lambda item: (-item[1], item[0]),
+            )
+        ],
+        'textless_pages': [
+            page_info['page_num'] for page_info in page_info_s
+            if not page_info['text_op_count']
+        ],
+    }
@@ -0,0 +1,470 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import json
+import os.path
+import re
+
+from .bookmark import format_bookmark_line
+
+
+# Rule keys allowed in a rules file
+_RULE_KEYS = set([
+    'min_size',
+    'max_size',
+    'font',
+    'text',
+    'pages',
+    'min_y',
+    'max_y',
+    'level',
+    'exclude',
+])
+
+# Number types allowed for numeric rule values
+_NUMBER_TYPES = (int, float)
+
+# String types allowed for regex rule values
+_STRING_TYPES = (str, type(u''))
+
+
+#
+def _check_rule_value(rule_index, key, value, types, type_name):
+    """
+    Check a rule value's type.
+
+    @param rule_index: Rule index, used in error message.
+
+    @param key: Rule key, used in error message.
+
+    @param value: Rule value. None means not given, and passes.
+
+    @param types: A tuple of allowed types.
+
+    @param type_name: Description of allowed types, used in error message.
+
+    @return: The value.
+    """
+    # If the value is given but is not of the types.
+    # Booleans are integers but are not valid numbers.
+    if value is not None and (
+        not isinstance(value, types)
+        or (isinstance(value, bool) and bool not in types)
+    ):
+        # Raise error
+        raise ValueError('Error: Rule {} "{}" is not {}: {!r}'.format(
+            rule_index, key, type_name, value))
+
+    # Return the value
+    return value
+
+
+#
+class RuleSet(object):
+    """
+    Compiled bookmark rules.
+
+    A rules file is a JSON (or YAML, if PyYAML is installed) document:
+    {
+        "rules": [
+            {
+                "min_size": Min font size of line's first character.
+                "max_size": Max font size of line's first character.
+                "font": Regex searched in line's first character's font name.
+                "text": Regex searched in line text.
+                "pages": [first page number, last page number], null means
+                unbounded.
+                "min_y": Min vertical offset.
+                "max_y": Max vertical offset.
+                "level": Zero-based nesting level. Default is 0.
+                "exclude": Whether matched lines are rejected. Default is
+                false.
+            },
+            ...
+        ]
+    }
+    All keys of a rule are optional. A line matches a rule if it satisfies
+    all conditions given. The first matched rule decides the line. Lines
+    matched by no rule are rejected.
+
+    A RuleSet object can be used as a textline handler, or as a page handler
+    via "match_page" to decide all textlines of a page at once.
+    """
+
+    def __init__(self, rule_dicts):
+        """
+        Initialize object.
+
+        @param rule_dicts: A list of rule dicts. Format is explained above.
+
+        @return: None.
+        """
+        # A list of compiled rule tuples.
+        # Each tuple is (first page, last page, min size, max size, min y,
+        # max y, font regex, text regex, level, exclude).
+        self.rule_s = []
+
+        # For each rule dict
+        for rule_index, rule_dict in enumerate(rule_dicts):
+            # Add compiled rule tuple
+            self.rule_s.append(self.compile_rule(rule_index, rule_dict))
+
+        # A dict that maps (rule index, font name) to whether the font regex
+        # matches. Font names are few so each regex runs once per font.
+        self.font_match_s = {}
+
+        # Page number of cached applicable rules
+        self.cached_page_num = None
+
+        # Cached applicable rules of the page
+        self.cached_rule_s = []
+
+    @staticmethod
+    def compile_rule(rule_index, rule_dict):
+        """
+        Compile a rule dict into a rule tuple.
+
+        @param rule_index: Rule index, used in error message.
+
+        @param rule_dict: Rule dict.
+
+        @return: Compiled rule tuple.
+        """
+        # If the rule is not a dict
+        if not isinstance(rule_dict, dict):
+            # Raise error
+            raise ValueError(
+                'Error: Rule {} is not a dict.'.format(rule_index))
+
+        # Get unknown keys
+        unknown_key_s = set(rule_dict) - _RULE_KEYS
+
+        # If have unknown keys
+        if unknown_key_s:
+            # Raise error
+            raise ValueError('Error: Rule {} has unknown keys: {}'.format(
+                rule_index, ', '.join(sorted(unknown_key_s))))
+
+        # Get page band
+        page_band = rule_dict.get('pages') or [None, None]
+
+        # If the page band is not a pair
+        if not isinstance(page_band, (list, tuple)) or len(page_band) != 2:
+            # Raise error
+            raise ValueError(
+                'Error: Rule {} "pages" is not a [first, last] pair.'.format(
+                    rule_index))
+
+        # Get first and last page numbers
+        first_page, last_page = [
+            _check_rule_value(
+                rule_index, 'pages', page_num, (int,), 'an integer pair')
+            for page_num in page_band
+        ]
+
+        # If the page band is empty or has non-positive page numbers
+        if (first_page is not None and first_page < 1) \
+                or (last_page is not None and last_page < 1) \
+                or (first_page is not None and last_page is not None
+                    and first_page > last_page):
+            # Raise error
+            raise ValueError(
+                'Error: Rule {} "pages" is not a valid page range: {!r}'
+                .format(rule_index, page_band))
+
+        # A dict that maps numeric key to value
+        number_s = {}
+
+        # For each numeric key
+        for key in ('min_size', 'max_size', 'min_y', 'max_y'):
+            # Get the value
+            number_s[key] = _check_rule_value(
+                rule_index, key, rule_dict.get(key), _NUMBER_TYPES,
+                'a number')
+
+        # For each (min key, max key)
+        for min_key, max_key in (('min_size', 'max_size'), ('min_y', 'max_y')):
+            # If the min value is greater than the max value
+            if number_s[min_key] is not None \
+                    and number_s[max_key] is not None \
+                    and number_s[min_key] > number_s[max_key]:
+                # Raise error
+                raise ValueError(
+                    'Error: Rule {} "{}" is greater than "{}".'.format(
+                        rule_index, min_key, max_key))
+
+        # A dict that maps regex key to compiled regex
+        regex_s = {}
+
+        # For each regex key
+        for key, flags in (('font', 0), ('text', re.UNICODE)):
+            # Get the regex
+            regex = _check_rule_value(
+                rule_index, key, rule_dict.get(key), _STRING_TYPES,
+                'a string')
+
+            #
+            try:
+                # Compile the regex
+                regex_s[key] = re.compile(regex, flags) if regex else None
+            # If the regex is invalid
+            except re.error as exc:
+                # Raise error
+                raise ValueError(
+                    'Error: Rule {} "{}" is not a valid regex: {}'.format(
+                        rule_index, key, exc))
+
+        # Get nesting level
+        level = _check_rule_value(
+            rule_index, 'level', rule_dict.get('level', 0), (int,),
+            'an integer')
+
+        # If the level is not given or negative
+        if level is None or level < 0:
+            # Raise error
+            raise ValueError(
+                'Error: Rule {} "level" is not a non-negative integer: {!r}'
+                .format(rule_index, level))
+
+        # Return compiled rule tuple
+        return (
+            first_page,
+            last_page,
+            number_s['min_size'],
+            number_s['max_size'],
+            number_s['min_y'],
+            number_s['max_y'],
+            regex_s['font'],
+            regex_s['text'],
+            level,
+            _check_rule_value(
+                rule_index, 'exclude', rule_dict.get('exclude', False),
+                (bool,), 'a boolean') or False,
+        )
+
+    def get_page_rules(self, page_num):
+        """
+        Get rules applicable to a page.
+
+        @param page_num: Page number.
+
+        @return: A list of (rule index, rule tuple) tuples.
+        """
+        # If the page's rules are cached
+        if page_num == self.cached_page_num:
+            # Return cached rules
+            return self.cached_rule_s
+
+        # Get applicable rules
+        rule_s = [
+            (rule_index, rule) for rule_index, rule in enumerate(self.rule_s)
+            if (rule[0] is None or page_num >= rule[0])
+            and (rule[1] is None or page_num <= rule[1])
+        ]
+
+        # Cache the rules
+        self.cached_page_num = page_num
+
+        self.cached_rule_s = rule_s
+
+        # Return applicable rules
+        return rule_s
+
+    def match_line(self, info, rule_s):
+        """
+        Decide a textline using given rules.
+
+        @param info: Textline info dict.
+
+        @param rule_s: Applicable rules from "get_page_rules".
+
+        @return: A bookmark line, or None.
+        """
+        # Get first character item from the line item
+        char1 = next(iter(info['line_item']))
+
+        # Get font size
+        size = char1.size
+
+        # Get vertical offset
+        voffset = int(char1.y1)
+
+        # Get font name
+        fontname = char1.fontname
+
+        # Line text, get lazily because most lines fail on cheap conditions
+        line_text = None
+
+        # For each applicable rule
+        for rule_index, rule in rule_s:
+            # Get rule conditions
+            _, _, min_size, max_size, min_y, max_y, font_re, text_re, \
+                level, exclude = rule
+
+            # If size condition fails
+            if (min_size is not None and size < min_size) \
+                    or (max_size is not None and size > max_size):
+                # Try next rule
+                continue
+
+            # If vertical offset condition fails
+            if (min_y is not None and voffset < min_y) \
+                    or (max_y is not None and voffset > max_y):
+                # Try next rule
+                continue
+
+            # If font regex is given
+            if font_re is not None:
+                # Get cache key
+                cache_key = (rule_index, fontname)
+
+                # Get cached match result
+                font_match = self.font_match_s.get(cache_key)
+
+                # If not cached
+                if font_match is None:
+                    # Match and cache
+                    font_match = self.font_match_s[cache_key] = \
+                        font_re.search(fontname) is not None
+
+                # If not matched
+                if not font_match:
+                    # Try next rule
+                    continue
+
+            # If text regex is given
+            if text_re is not None:
+                # If line text is not got yet
+                if line_text is None:
+                    # Replace consecutive white spaces into one space
+                    line_text = ' '.join(info['line_text'].split())
+
+                # If not matched
+                if text_re.search(line_text) is None:
+                    # Try next rule
+                    continue
+
+            # If the rule rejects matched lines
+            if exclude:
+                # Return None
+                return None
+
+            # If line text is not got yet
+            if line_text is None:
+                # Replace consecutive white spaces into one space
+                line_text = ' '.join(info['line_text'].split())
+
+            # If the line is empty
+            if not line_text:
+                # Return None
+                return None
+
+            # Return bookmark line
+            return format_bookmark_line(
+                info['page_num'], voffset, line_text, level=level)
+
+        # Return None
+        return None
+
+    def match_page(self, info_s):
+        """
+        Decide all textlines of a page at once. Used as page handler.
+
+        @param info_s: Textline info dicts of the same page.
+
+        @return: A list of bookmark lines.
+        """
+        # If no textline
+        if not info_s:
+            # Return empty list
+            return []
+
+        # Get the page's rules
+        rule_s = self.get_page_rules(info_s[0]['page_num'])
+
+        # If no rule applies to the page
+        if not rule_s:
+            # Return empty list
+            return []
+
+        # A list of bookmark lines
+        bookmark_line_s = []
+
+        # For each textline
+        for info in info_s:
+            # Decide the line
+            bookmark_line = self.match_line(info, rule_s)
+
+            # If the line is a bookmark line
+            if bookmark_line is not None:
+                # Add to the list
+                bookmark_line_s.append(bookmark_line)
+
+        # Return the list of bookmark lines
+        return bookmark_line_s
+
+    def __call__(self, info):
+        """
+        Decide a textline. Used as textline handler.
+
+        @param info: Textline info dict.
+
+        @return: A bookmark line, or None.
+        """
+        # Decide the line using the page's rules
+        return self.match_line(info, self.get_page_rules(info['page_num']))
+
+
+#
+def load_rules(rules_path):
+    """
+    Load a rules file and compile it.
+
+    @param rules_path: Rules file path. YAML is used if the file extension is
+    ".yml" or ".yaml", otherwise JSON.
+
+    @return: RuleSet object.
+    """
+    # Get file extension
+    file_ext = os.path.splitext(rules_path)[1].lower()
+
+    # Open the rules file
+    with open(rules_path) as rules_file:
+        # If the file is YAML
+        if file_ext in ('.yml', '.yaml'):
+            #
+            try:
+                # Import YAML package
+                import yaml
+            except ImportError:
+                # Raise error
+                raise ValueError(
+                    'Error: Package "PyYAML" is not installed.'
+                    ' Try: "pip install PyYAML".'
+                )
+
+            # Load the file
+            data = yaml.safe_load(rules_file)
+        # If the file is JSON
+        else:
+            # Load the file
+            data = json.load(rules_file)
+
+    # If the data is a dict
+    if isinstance(data, dict):
+        # Get rule list
+        rule_dict_s = data.get('rules')
+    # If the data is a list
+    else:
+        # Use it as rule list
+        rule_dict_s = data
+
+    # If the rule list is not a list
+    if not isinstance(rule_dict_s, list):
+        # Raise error
+        raise ValueError(
+            'Error: Rules file has no "rules" list: {}'.format(rules_path))
+
+    # Return compiled rules
+    return RuleSet(rule_dict_s)
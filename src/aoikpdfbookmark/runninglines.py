@@ -0,0 +1,365 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import re
+
+from .textscan import scan_text
+
+
+# Regex that matches a run of digits
+_DIGITS_RE = re.compile(r'\d+', re.UNICODE)
+
+
+#
+def normalize_line_text(text, keep_digits=False):
+    """
+    Normalize line text for fingerprinting. Case and white spaces are
+    ignored.
+
+    @param text: Line text.
+
+    @param keep_digits: Whether keep digits. If False, digit runs are
+    replaced so that page numbers in running headers and footers do not make
+    lines differ.
+
+    @return: Normalized text.
+    """
+    # If not keeping digits
+    if not keep_digits:
+        # Replace digit runs
+        text = _DIGITS_RE.sub('#', text)
+
+    # Lower the case, replace consecutive white spaces into one space
+    return ' '.join(text.lower().split())
+
+
+#
+def get_line_numbers(text):
+    """
+    Get numbers in line text.
+
+    @param text: Line text.
+
+    @return: A set of integers.
+    """
+    # Return numbers of digit runs
+    return set(int(digits) for digits in _DIGITS_RE.findall(text))
+
+
+#
+def get_line_fingerprint(y, text, band=2.0, keep_digits=False):
+    """
+    Get fingerprint of a line.
+
+    @param y: Line's baseline vertical offset.
+
+    @param text: Line text.
+
+    @param band: Height of position bands. Lines whose baselines are in the
+    same band are at the same position.
+
+    @param keep_digits: See function "normalize_line_text".
+
+    @return: A (position band, normalized text) tuple, or None if the
+    normalized text is empty.
+    """
+    # Get normalized text
+    text = normalize_line_text(text, keep_digits=keep_digits)
+
+    # If the normalized text is empty
+    if not text:
+        # Return None
+        return None
+
+    # Return fingerprint
+    return (int(round(round(y, 1) / band)), text)
+
+
+#
+class RunningLineIndex(object):
+    """
+    Hash index of line fingerprints across pages, used to find running
+    headers and footers.
+
+    A line is running if its exact text recurs at the same position, e.g. a
+    book title. A line whose text differs only in numbers is running only if
+    one of its numbers follows the page number, e.g. "Page 12", so that
+    numbered headings like "Chapter 1" and "Chapter 2" at the same position
+    are not running lines.
+    """
+
+    def __init__(self, max_pages=3, min_density=0.4, band=2.0):
+        """
+        Initialize object.
+
+        @param max_pages: Lines recurring on more than this number of pages
+        are running lines, if they also satisfy "min_density".
+
+        @param min_density: Min ratio of the number of pages a running line
+        recurs on to the number of pages from its first page to its last page.
+        Running headers are on every page or every other page, while e.g.
+        chapter labels at fixed positions are sparse.
+
+        @param band: See function "get_line_fingerprint".
+
+        @return: None.
+        """
+        # Max number of pages a non-running line can recur on
+        self.max_pages = max_pages
+
+        # Min density of pages a running line recurs on
+        self.min_density = min_density
+
+        # Height of position bands
+        self.band = band
+
+        # A dict that maps fingerprint with digits kept to a set of page
+        # numbers
+        self.fingerprint_page_s = {}
+
+        # A dict that maps fingerprint with digits replaced to a dict that
+        # maps offset of a number in the line from the page number, to a set
+        # of page numbers
+        self.numbered_fingerprint_page_s = {}
+
+        # A set of fingerprints of running lines, with digits kept
+        self.running_fingerprint_s = set()
+
+        # A dict that maps fingerprint of running lines with digits replaced,
+        # to a set of offsets of their page numbers from the page number
+        self.running_numbered_offset_s = {}
+
+    def add_line(self, page_num, y, text):
+        """
+        Add a line to the index.
+
+        @param page_num: Page number.
+
+        @param y: Line's baseline vertical offset.
+
+        @param text: Line text.
+
+        @return: None.
+        """
+        # Get fingerprint with digits kept
+        fingerprint = get_line_fingerprint(
+            y, text, band=self.band, keep_digits=True)
+
+        # If the line has no fingerprint
+        if fingerprint is None:
+            # Ignore the line
+            return
+
+        # Add the page number to the fingerprint's page number set
+        self.fingerprint_page_s.setdefault(fingerprint, set()).add(page_num)
+
+        # Get numbers in the line
+        number_s = get_line_numbers(text)
+
+        # If the line has no numbers
+        if not number_s:
+            # No numbered fingerprint
+            return
+
+        # Get fingerprint with digits replaced
+        fingerprint = get_line_fingerprint(y, text, band=self.band)
+
+        # Get the fingerprint's dict of page number sets
+        offset_page_s = self.numbered_fingerprint_page_s.setdefault(
+            fingerprint, {})
+
+        # For each number in the line
+        for number in number_s:
+            # Add the page number to the set of the number's offset from the
+            # page number
+            offset_page_s.setdefault(number - page_num, set()).add(page_num)
+
+    def finish(self):
+        """
+        Find running lines after all lines are added.
+
+        @return: None.
+        """
+        # For each fingerprint's page number set
+        for fingerprint, page_num_s in self.fingerprint_page_s.items():
+            # If the pages are many and dense enough
+            if self._is_running_page_set(page_num_s):
+                # Mark the fingerprint as running line
+                self.running_fingerprint_s.add(fingerprint)
+
+        # For each numbered fingerprint's dict of page number sets
+        for fingerprint, offset_page_s in \
+                self.numbered_fingerprint_page_s.items():
+            # For each offset of a number from the page number
+            for offset, page_num_s in offset_page_s.items():
+                # If the number follows the page number on pages many and
+                # dense enough
+                if self._is_running_page_set(page_num_s):
+                    # Mark the fingerprint and offset as running line
+                    self.running_numbered_offset_s.setdefault(
+                        fingerprint, set()).add(offset)
+
+    def _is_running_page_set(self, page_num_s):
+        """
+        Test whether a line recurring on a set of pages is a running line.
+
+        @param page_num_s: A set of page numbers.
+
+        @return: Boolean.
+        """
+        # If the line recurs on no more than max number of pages
+        if len(page_num_s) <= self.max_pages:
+            # Not a running line
+            return False
+
+        # Get the number of pages from the first page to the last page
+        span = max(page_num_s) - min(page_num_s) + 1
+
+        # Return whether the pages are dense enough
+        return len(page_num_s) >= span * self.min_density
+
+    def is_running_line(self, y, text, page_num=None):
+        """
+        Test whether a line is a running header or footer.
+
+        @param y: Line's baseline vertical offset.
+
+        @param text: Line text.
+
+        @param page_num: Page number of the line. None means only lines with
+        exact text recurring are found.
+
+        @return: Boolean.
+        """
+        # If the line's fingerprint with digits kept is a running line's
+        if self.running_fingerprint_s and get_line_fingerprint(
+            y, text, band=self.band, keep_digits=True
+        ) in self.running_fingerprint_s:
+            # Return True
+            return True
+
+        # If no numbered running lines, or page number is not given
+        if not self.running_numbered_offset_s or page_num is None:
+            # Return False
+            return False
+
+        # Get offsets of page numbers of running lines with the same
+        # fingerprint
+        offset_s = self.running_numbered_offset_s.get(
+            get_line_fingerprint(y, text, band=self.band))
+
+        # If the fingerprint is not a running line's
+        if not offset_s:
+            # Return False
+            return False
+
+        # Return whether a number in the line follows the page number
+        return any(
+            number - page_num in offset_s
+            for number in get_line_numbers(text)
+        )
+
+
+#
+def find_running_lines(
+    pdf_file,
+    npages=None,
+    password=None,
+    max_pages=3,
+    min_density=0.4,
+    band=2.0,
+    margin=0.15,
+    font_cache=None,
+):
+    """
+    Find running headers and footers without layout analysis.
+
+    Text runs in the top and bottom margins of each page are fingerprinted by
+    normalized text and baseline position band. Both each text run and all
+    text runs on the same baseline are fingerprinted, so a layout textline
+    matches whether layout analysis splits the baseline or not.
+
+    @param pdf_file: PDF file to parse.
+
+    @param npages: Max number of pages to process. 0 or None means all pages.
+
+    @param password: PDF file's password.
+
+    @param max_pages: See class "RunningLineIndex".
+
+    @param min_density: See class "RunningLineIndex".
+
+    @param band: See function "get_line_fingerprint".
+
+    @param margin: Ratio of page height of top and bottom margins. None means
+    whole pages.
+
+    @param font_cache: See function "fontcache.create_resource_manager".
+
+    @return: RunningLineIndex object.
+    """
+    # Scan text runs without layout analysis
+    device = scan_text(
+        pdf_file=pdf_file,
+        npages=npages,
+        password=password,
+        collect_runs=True,
+        font_cache=font_cache,
+    )
+
+    # Create index
+    index = RunningLineIndex(
+        max_pages=max_pages,
+        min_density=min_density,
+        band=band,
+    )
+
+    # For each page's text runs
+    for page_num, run_s in device.page_run_s.items():
+        # If margin is given
+        if margin is not None:
+            # Get page box
+            _, page_y0, _, page_y1 = device.page_bbox_s[page_num]
+
+            # Get margin height
+            margin_height = (page_y1 - page_y0) * margin
+
+            # Get bottom margin's top
+            bottom_y = page_y0 + margin_height
+
+            # Get top margin's bottom
+            top_y = page_y1 - margin_height
+
+        # A dict that maps baseline to a list of (x, text) tuples
+        baseline_run_s = {}
+
+        # For each text run
+        for x, y, _, text in run_s:
+            # If the run is not in the margins
+            if margin is not None and bottom_y < y < top_y:
+                # Ignore the run
+                continue
+
+            # Add the run
+            index.add_line(page_num, y, text)
+
+            # Add to the baseline's runs
+            baseline_run_s.setdefault(y, []).append((x, text))
+
+        # For each baseline's runs
+        for y, x_text_s in baseline_run_s.items():
+            # If the baseline has more than one run
+            if len(x_text_s) > 1:
+                # Add all runs on the baseline as one line
+                index.add_line(
+                    page_num,
+                    y,
+                    ' '.join(text for _, text in sorted(x_text_s)),
+                )
+
+    # Find running lines
+    index.finish()
+
+    # Return the index
+    return index
@@ -0,0 +1,754 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import re
+
+from pdfminer.converter import PDFLayoutAnalyzer
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfdocument import PDFNoOutlines
+from pdfminer.pdfinterp import PDFPageInterpreter
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import PDFObjRef
+from pdfminer.pdftypes import resolve1
+from pdfminer.psparser import PSLiteral
+from pdfminer.utils import decode_text
+
+from .bookmark import format_bookmark_line
+from .fontcache import create_resource_manager
+from .pdfparser import parse_pdf
+
+
+# Structure type names of headings, mapped to zero-based nesting level.
+# "H" is generic heading whose level is inferred from "Sect" ancestors.
+_HEADING_TYPE_TO_LEVEL = {
+    'H': None,
+    'H1': 0,
+    'H2': 1,
+    'H3': 2,
+    'H4': 3,
+    'H5': 4,
+    'H6': 5,
+}
+
+# Fit modes whose destination array has "top" at the given index
+_FIT_MODE_TO_TOP_INDEX = {
+    'XYZ': 3,
+    'FitH': 2,
+    'FitBH': 2,
+}
+
+# Regex that matches bookmark line's page number and vertical offset
+_BOOKMARK_LINE_RE = re.compile(r'^\s*(\d+)\|(-?\d+)\|')
+
+
+#
+class MarkedContentCollector(PDFLayoutAnalyzer):
+    """
+    PDFPageInterpreter passes rendered characters to MarkedContentCollector.
+    MarkedContentCollector collects each marked-content sequence's text and
+    top position by its MCID, without layout analysis.
+    """
+
+    def __init__(self, rsrcmgr):
+        """
+        Initialize object.
+
+        @param rsrcmgr: Resource manager object.
+
+        @return: None.
+        """
+        # Call super method.
+        # No converter parameters means no layout analysis.
+        PDFLayoutAnalyzer.__init__(self, rsrcmgr, pageno=0, laparams=None)
+
+        # A stack of (MCID, container item, start index) tuples
+        self.tag_s = []
+
+        # A dict that maps page number to a dict that maps MCID to
+        # (text, top) tuple
+        self.page_mcid_s = {}
+
+    def begin_tag(self, tag, props=None):
+        """
+        Callback called when a marked-content sequence begins.
+
+        @param tag: Tag name.
+
+        @param props: Properties dict.
+
+        @return: None.
+        """
+        # Get MCID. None means the sequence has no MCID.
+        mcid = props.get('MCID') if isinstance(props, dict) else None
+
+        # Push the MCID and current position in current container item
+        self.tag_s.append(
+            (mcid, self.cur_item, len(self.cur_item._objs)))
+
+    def end_tag(self):
+        """
+        Callback called when a marked-content sequence ends.
+
+        @return: None.
+        """
+        # If the stack is empty, the content stream is malformed
+        if not self.tag_s:
+            # Ignore
+            return
+
+        # Pop the MCID and start position
+        mcid, container_item, start_index = self.tag_s.pop()
+
+        # If the sequence has no MCID
+        if mcid is None:
+            # Ignore
+            return
+
+        # Get character items rendered in the sequence
+        char_s = [
+            item for item in container_item._objs[start_index:]
+            if hasattr(item, 'get_text')
+        ]
+
+        # If no character is rendered
+        if not char_s:
+            # Ignore
+            return
+
+        # Get text
+        text = ''.join(char.get_text() for char in char_s)
+
+        # Get top position
+        top = max(char.y1 for char in char_s)
+
+        # Store the text and top position.
+        # Page number is incremented at page end so add 1.
+        self.page_mcid_s.setdefault(self.pageno + 1, {})[mcid] = (text, top)
+
+
+#
+def _get_name(obj):
+    """
+    Get name string of a PDF name object.
+
+    @param obj: PDF name object.
+
+    @return: Name string, or None.
+    """
+    # Resolve the object
+    obj = resolve1(obj)
+
+    # If the object is a PDF name
+    if isinstance(obj, PSLiteral):
+        # Get name
+        name = obj.name
+
+        # Return name string
+        return name.decode('latin-1') if isinstance(name, bytes) else name
+
+    # Return None
+    return None
+
+
+#
+def _get_text(obj):
+    """
+    Get text of a PDF string object.
+
+    @param obj: PDF string object.
+
+    @return: Text, or None.
+    """
+    # Resolve the object
+    obj = resolve1(obj)
+
+    # If the object is a PDF string
+    if isinstance(obj, bytes):
+        # Return decoded text
+        return decode_text(obj)
+
+    # Return None
+    return None
+
+
+#
+def _get_objid(obj):
+    """
+    Get object ID of a PDF object reference.
+
+    @param obj: PDF object reference.
+
+    @return: Object ID, or None.
+    """
+    # Return object ID
+    return obj.objid if isinstance(obj, PDFObjRef) else None
+
+
+#
+def get_page_infos(document, npages=None):
+    """
+    Get page info of each page, without parsing page contents.
+
+    @param document: PDFDocument object.
+
+    @param npages: Max number of pages to process. 0 or None means all pages.
+
+    @return: A dict that maps page object ID to (page number, page top,
+    whether the page is tagged) tuple.
+    """
+    # A dict that maps page object ID to page info tuple
+    page_info_s = {}
+
+    # For each page
+    for page_index, page in enumerate(PDFPage.create_pages(document)):
+        # If max number of pages to process is given,
+        # and the zero-based page index is GE the max number.
+        if npages and page_index >= npages:
+            # Stop
+            break
+
+        # Get media box
+        x0, y0, x1, y1 = page.mediabox
+
+        # Store page info
+        page_info_s[page.pageid] = (
+            page_index + 1,
+            int(y1 - y0),
+            'StructParents' in page.attrs,
+        )
+
+    # Return the dict
+    return page_info_s
+
+
+#
+def get_outline_entries(document, page_info_s):
+    """
+    Get existing outline entries.
+
+    @param document: PDFDocument object.
+
+    @param page_info_s: Page info dict from "get_page_infos".
+
+    @return: A list of (page number, vertical offset, title, level) tuples.
+    """
+    # A list of entry tuples
+    entry_s = []
+
+    #
+    try:
+        # Get outlines iterator
+        outline_s = document.get_outlines()
+    # If the document has no outlines
+    except PDFNoOutlines:
+        # Return empty list
+        return entry_s
+
+    # For each outline item
+    for level, title, dest, action, _ in outline_s:
+        # If destination is not given but action is given
+        if dest is None and action is not None:
+            # Get action dict
+            action = resolve1(action)
+
+            # If the action is a go-to action
+            if isinstance(action, dict) and _get_name(action.get('S')) == \
+                    'GoTo':
+                # Get destination
+                dest = action.get('D')
+
+        # Resolve destination
+        dest = resolve1(dest)
+
+        # If the destination is named
+        if isinstance(dest, (bytes, PSLiteral)):
+            #
+            try:
+                # Get the named destination
+                dest = resolve1(document.get_dest(
+                    dest.name if isinstance(dest, PSLiteral) else dest))
+            # If the named destination is not found
+            except Exception:
+                # Ignore the outline item
+                continue
+
+        # If the destination is a dict
+        if isinstance(dest, dict):
+            # Get destination array
+            dest = resolve1(dest.get('D'))
+
+        # If the destination is not an array
+        if not isinstance(dest, list) or not dest:
+            # Ignore the outline item
+            continue
+
+        # Get page info
+        page_info = page_info_s.get(_get_objid(dest[0]))
+
+        # If the page is not found
+        if page_info is None:
+            # Ignore the outline item
+            continue
+
+        # Get page number and page top
+        page_num, page_top, _ = page_info
+
+        # Get "top" index in the destination array
+        top_index = _FIT_MODE_TO_TOP_INDEX.get(
+            _get_name(dest[1]) if len(dest) > 1 else None)
+
+        # Get "top" value. Can be None.
+        top = resolve1(dest[top_index]) \
+            if top_index is not None and len(dest) > top_index else None
+
+        # Get vertical offset
+        voffset = int(top) if isinstance(top, (int, float)) else page_top
+
+        # Add entry tuple.
+        # Outline levels are one-based.
+        entry_s.append((page_num, voffset, title, max(level - 1, 0)))
+
+    # Return the list of entry tuples
+    return entry_s
+
+
+#
+def get_struct_headings(document, page_info_s):
+    """
+    Get headings from the structure tree of a tagged PDF.
+
+    @param document: PDFDocument object.
+
+    @param page_info_s: Page info dict from "get_page_infos".
+
+    @return: A list of heading dicts:
+    {
+        'page_num': Page number.
+        'level': Zero-based nesting level.
+        'title': Title from "/ActualText", "/Alt" or "/T". Can be None.
+        'mcids': A list of MCIDs of the heading's marked content.
+    }
+    """
+    # A list of heading dicts
+    heading_s = []
+
+    # Get structure tree root
+    struct_root = resolve1(document.catalog.get('StructTreeRoot'))
+
+    # If the document is not tagged
+    if not isinstance(struct_root, dict):
+        # Return empty list
+        return heading_s
+
+    # Get role map that maps custom structure types to standard ones
+    role_map = resolve1(struct_root.get('RoleMap')) or {}
+
+    # Get standard structure type name
+    def get_type_name(elem):
+        # Get structure type name
+        type_name = _get_name(elem.get('S'))
+
+        # Map custom type names. Limit depth in case of circular mapping.
+        for _ in range(10):
+            # Get mapped type name
+            mapped_name = _get_name(role_map.get(type_name)) \
+                if type_name is not None else None
+
+            # If not mapped
+            if mapped_name is None:
+                # Stop mapping
+                break
+
+            # Use mapped type name
+            type_name = mapped_name
+
+        # Return standard type name
+        return type_name
+
+    # IDs of visited objects, to avoid circular references
+    visited_objid_s = set()
+
+    # Walk structure elements.
+    # Use a stack instead of recursion for deep trees.
+    # Each item is (kid object, inherited page object ID, Sect depth).
+    stack = [(struct_root.get('K'), None, 0)]
+
+    while stack:
+        # Pop an item
+        kid, page_objid, sect_depth = stack.pop()
+
+        # Get object ID of the kid
+        objid = _get_objid(kid)
+
+        # If the kid is an object reference
+        if objid is not None:
+            # If the object is visited
+            if objid in visited_objid_s:
+                # Ignore the kid
+                continue
+
+            # Mark the object as visited
+            visited_objid_s.add(objid)
+
+        # Resolve the kid
+        kid = resolve1(kid)
+
+        # If the kid is a list
+        if isinstance(kid, list):
+            # Push kids in reversed order to keep document order
+            for sub_kid in reversed(kid):
+                stack.append((sub_kid, page_objid, sect_depth))
+
+            # Continue to next item
+            continue
+
+        # If the kid is not a structure element dict
+        if not isinstance(kid, dict) or 'S' not in kid:
+            # Ignore the kid
+            continue
+
+        # Get page object ID. Inherit from ancestors if not given.
+        page_objid = _get_objid(kid.get('Pg')) or page_objid
+
+        # Get standard structure type name
+        type_name = get_type_name(kid)
+
+        # If the element is a section
+        if type_name == 'Sect':
+            # Push kids with incremented section depth
+            stack.append((kid.get('K'), page_objid, sect_depth + 1))
+
+            # Continue to next item
+            continue
+
+        # If the element is not a heading
+        if type_name not in _HEADING_TYPE_TO_LEVEL:
+            # Push kids
+            stack.append((kid.get('K'), page_objid, sect_depth))
+
+            # Continue to next item
+            continue
+
+        # Get nesting level.
+        # Generic heading's level is inferred from section depth.
+        level = _HEADING_TYPE_TO_LEVEL[type_name]
+
+        if level is None:
+            level = max(sect_depth - 1, 0)
+
+        # Get MCIDs of the heading's marked content, and the page of the first
+        # marked content.
+        mcid_s = []
+
+        # Page object ID of the marked content
+        mc_page_objid = None
+
+        # Kids of the heading element
+        heading_kid_s = resolve1(kid.get('K'))
+
+        # If the kids is not a list
+        if not isinstance(heading_kid_s, list):
+            # Make it a list
+            heading_kid_s = [heading_kid_s]
+
+        # For each kid of the heading element
+        for heading_kid in heading_kid_s:
+            # Resolve the kid
+            heading_kid = resolve1(heading_kid)
+
+            # If the kid is an MCID
+            if isinstance(heading_kid, int):
+                # If the marked content is not on the heading's page
+                if mc_page_objid not in (None, page_objid):
+                    # Ignore the kid
+                    continue
+
+                # Use the heading's page
+                mc_page_objid = page_objid
+
+                # Add the MCID
+                mcid_s.append(heading_kid)
+
+            # If the kid is a marked-content reference dict
+            elif isinstance(heading_kid, dict) and 'MCID' in heading_kid:
+                # Get the reference's page
+                kid_page_objid = _get_objid(heading_kid.get('Pg')) or \
+                    page_objid
+
+                # If the marked content is not on the first page
+                if mc_page_objid not in (None, kid_page_objid):
+                    # Ignore the kid
+                    continue
+
+                # Use the reference's page
+                mc_page_objid = kid_page_objid
+
+                # Add the MCID
+                mcid_s.append(resolve1(heading_kid['MCID']))
+
+        # Get page info
+        page_info = page_info_s.get(mc_page_objid or page_objid)
+
+        # If the page is not found
+        if page_info is None:
+            # Ignore the heading
+            continue
+
+        # Get title
+        title = _get_text(kid.get('ActualText')) or \
+            _get_text(kid.get('Alt')) or _get_text(kid.get('T'))
+
+        # Add heading dict
+        heading_s.append({
+            'page_num': page_info[0],
+            'level': level,
+            'title': title,
+            'mcids': mcid_s,
+        })
+
+    # Return the list of heading dicts
+    return heading_s
+
+
+#
+def resolve_struct_headings(document, heading_s, page_info_s):
+    """
+    Resolve headings' titles and vertical offsets by collecting marked content
+    in heading pages only, without layout analysis.
+
+    @param document: PDFDocument object.
+
+    @param heading_s: Heading dicts from "get_struct_headings".
+
+    @param page_info_s: Page info dict from "get_page_infos".
+
+    @return: A list of (page number, vertical offset, title, level) tuples.
+    """
+    # Get heading page numbers
+    page_num_s = set(heading['page_num'] for heading in heading_s)
+
+    # Create resource manager that caches shared resources.
+    # It shares font objects across documents if font cache is installed.
+    resource_manager = create_resource_manager()
+
+    # Create marked content collector
+    collector = MarkedContentCollector(rsrcmgr=resource_manager)
+
+    # Create PDFPageInterpreter
+    interpreter = PDFPageInterpreter(resource_manager, collector)
+
+    # For each page
+    for page_index, page in enumerate(PDFPage.create_pages(document)):
+        # Get page number
+        page_num = page_index + 1
+
+        # If the page is after the last heading page
+        if page_num > max(page_num_s):
+            # Stop
+            break
+
+        # If the page has no heading
+        if page_num not in page_num_s:
+            # Skip the page
+            continue
+
+        # Set collector's page number
+        collector.pageno = page_index
+
+        # Clear tag stack
+        del collector.tag_s[:]
+
+        # Collect marked content in the page
+        interpreter.process_page(page)
+
+    # A dict that maps page number to page top
+    page_top_s = dict(
+        (page_num, page_top) for page_num, page_top, _ in page_info_s.values()
+    )
+
+    # A list of resolved tuples
+    result_s = []
+
+    # For each heading
+    for heading in heading_s:
+        # Get page number
+        page_num = heading['page_num']
+
+        # Get the page's marked content dict
+        mcid_s = collector.page_mcid_s.get(page_num, {})
+
+        # Get (text, top) tuples of the heading's marked content
+        content_s = [
+            mcid_s[mcid] for mcid in heading['mcids'] if mcid in mcid_s
+        ]
+
+        # Get title
+        title = heading['title'] or \
+            ''.join(text for text, _ in content_s)
+
+        # Replace consecutive white spaces into one space
+        title = ' '.join(title.split())
+
+        # If the title is empty
+        if not title:
+            # Ignore the heading
+            continue
+
+        # Get vertical offset.
+        # Use page top if the marked content is not found.
+        voffset = int(max(top for _, top in content_s)) if content_s \
+            else page_top_s.get(page_num, 0)
+
+        # Add the tuple
+        result_s.append((page_num, voffset, title, heading['level']))
+
+    # Return the list of resolved tuples
+    return result_s
+
+
+#
+def get_bookmark_line_sort_key(bookmark_line):
+    """
+    Get sort key of a bookmark line that sorts by page number ascending then
+    vertical offset descending.
+
+    @param bookmark_line: A bookmark line.
+
+    @return: Sort key.
+    """
+    # Match page number and vertical offset
+    match = _BOOKMARK_LINE_RE.match(bookmark_line)
+
+    # If not matched
+    if match is None:
+        # Sort malformed line to the end
+        return (float('inf'), 0)
+
+    # Return sort key
+    return (int(match.group(1)), -int(match.group(2)))
+
+
+#
+def extract_tagged_bookmarks(
+    pdf_file,
+    handler=None,
+    source='auto',
+    npages=None,
+    password=None,
+    log=None,
+    backend=None,
+):
+    """
+    Generate bookmark lines from the structure tree of a tagged PDF or from
+    existing outlines, without layout analysis. Fall back to layout analysis
+    with the textline handler for documents or pages without that
+    information.
+
+    @param pdf_file: PDF file to parse.
+
+    @param handler: Textline handler for layout analysis fallback. Its
+    returned bookmark lines are merged. None means no fallback.
+
+    @param source: One of the following source names:
+    - auto      Structure tree, then outlines, then layout analysis.
+    - struct    Structure tree, then layout analysis.
+    - outline   Outlines, then layout analysis.
+    Default is "auto".
+
+    @param npages: Max number of pages to process. 0 or None means all pages.
+
+    @param password: PDF file's password.
+
+    @param log: DiagnosticLog object passed to the handler. None means
+    dropping the handler's diagnostics.
+
+    @param backend: Extraction backend name or object for layout analysis
+    fallback. None means the default backend.
+
+    @return: A list of bookmark lines, indented by nesting level.
+    """
+    # Create PDF parser
+    parser = PDFParser(pdf_file)
+
+    # Create PDF document
+    document = PDFDocument(
+        parser, password=password if password is not None else '')
+
+    # Get page infos
+    page_info_s = get_page_infos(document, npages=npages)
+
+    # A list of (page number, vertical offset, title, level) tuples
+    result_s = []
+
+    # Page numbers to run layout analysis. None means all pages.
+    fallback_page_num_s = None
+
+    # If structure tree is allowed
+    if source in ('auto', 'struct'):
+        # Get structure headings
+        heading_s = get_struct_headings(document, page_info_s)
+
+        # If have headings
+        if heading_s:
+            # Resolve titles and vertical offsets
+            result_s = resolve_struct_headings(
+                document, heading_s, page_info_s)
+
+            # Run layout analysis only for pages not tagged
+            fallback_page_num_s = [
+                page_num for page_num, _, is_tagged in page_info_s.values()
+                if not is_tagged
+            ]
+
+    # If no result, and outlines are allowed
+    if not result_s and source in ('auto', 'outline'):
+        # Get outline entries
+        result_s = get_outline_entries(document, page_info_s)
+
+        # If have outline entries
+        if result_s:
+            # No need to run layout analysis
+            fallback_page_num_s = []
+
+    # Get bookmark lines
+    bookmark_line_s = [
+        format_bookmark_line(page_num, voffset, title, level=level)
+        for page_num, voffset, title, level in result_s
+    ]
+
+    # If have pages to run layout analysis, and handler is given
+    if handler is not None and fallback_page_num_s != []:
+        # Create a wrapping function to collect bookmark lines generated by
+        # the handler.
+        def collect_handler(info):
+            # Call the handler
+            bookmark_line = handler(info)
+
+            # If the result is not None
+            if bookmark_line is not None:
+                # Add the bookmark line
+                bookmark_line_s.append(bookmark_line)
+
+        # Set input file seek pointer to beginning
+        pdf_file.seek(0)
+
+        # Run layout analysis
+        parse_pdf(
+            pdf_file=pdf_file,
+            handler=collect_handler,
+            npages=npages,
+            password=password,
+            page_nums=fallback_page_num_s,
+            log=log,
+            backend=backend,
+        )
+
+        # If both sources have bookmark lines
+        if result_s and len(bookmark_line_s) > len(result_s):
+            # Sort bookmark lines in page order
+            bookmark_line_s.sort(key=get_bookmark_line_sort_key)
+
+    # Return bookmark lines
+    return bookmark_line_s
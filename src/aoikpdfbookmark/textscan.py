@@ -0,0 +1,263 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from pdfminer.converter import PDFTextDevice
+from pdfminer.pdffont import PDFUnicodeNotDefined
+from pdfminer.pdfinterp import PDFPageInterpreter
+from pdfminer.pdfpage import PDFPage
+
+from .fontcache import create_resource_manager
+
+
+#
+class TextScanDevice(PDFTextDevice):
+    """
+    PDFPageInterpreter passes each rendered character to TextScanDevice.
+    TextScanDevice collects font size statistics, and optionally text runs,
+    without creating layout items or running layout analysis.
+
+    Font sizes are computed the same way as "LTChar.size", so they can be
+    compared with sizes of characters from TextlineConverter.
+    """
+
+    def __init__(self, rsrcmgr, collect_runs=False):
+        """
+        Initialize object.
+
+        @param rsrcmgr: Resource manager object.
+
+        @param collect_runs: Whether collect text runs. Default is False.
+
+        @return: None.
+        """
+        # Call super method
+        PDFTextDevice.__init__(self, rsrcmgr)
+
+        # Whether collect text runs
+        self.collect_runs = collect_runs
+
+        # Current page number
+        self.page_num = 0
+
+        # A dict that maps font size to character count
+        self.size_char_count_s = {}
+
+        # A dict that maps (font name, font size) to character count
+        self.font_char_count_s = {}
+
+        # A dict that maps page number to a set of font sizes in the page
+        self.page_size_s = {}
+
+        # A dict that maps page number to the page's (x0, y0, x1, y1) box
+        self.page_bbox_s = {}
+
+        # A dict that maps page number to a list of text runs in the page.
+        # Each text run is a [x, y, font size, text] list.
+        # Consecutive characters on the same baseline with the same font size
+        # are in the same text run.
+        self.page_run_s = {}
+
+        # A stack of current transformation matrices saved at figure begin
+        self.ctm_s = []
+
+    def begin_page(self, page, ctm):
+        """
+        Callback called when a page begins.
+
+        @param page: PDFPage object.
+
+        @param ctm: Current transformation matrix.
+
+        @return: None.
+        """
+        # Call super method
+        PDFTextDevice.begin_page(self, page, ctm)
+
+        # Create the page's font size set
+        self.page_size_s.setdefault(self.page_num, set())
+
+        # Store the page's box
+        self.page_bbox_s[self.page_num] = tuple(page.mediabox)
+
+        # If collect text runs
+        if self.collect_runs:
+            # Create the page's text run list
+            self.page_run_s.setdefault(self.page_num, [])
+
+    def begin_figure(self, name, bbox, matrix):
+        """
+        Callback called when a form XObject begins.
+
+        @param name: XObject name.
+
+        @param bbox: XObject bounding box.
+
+        @param matrix: XObject matrix.
+
+        @return: None.
+        """
+        # Save current transformation matrix.
+        # The form's interpreter changes it.
+        self.ctm_s.append(self.ctm)
+
+    def end_figure(self, name):
+        """
+        Callback called when a form XObject ends.
+
+        @param name: XObject name.
+
+        @return: None.
+        """
+        # If have saved transformation matrix
+        if self.ctm_s:
+            # Restore current transformation matrix
+            self.ctm = self.ctm_s.pop()
+
+    def render_char(self, matrix, font, fontsize, scaling, rise, cid, *args):
+        """
+        Callback called for each rendered character.
+
+        @param matrix: Character's transformation matrix.
+
+        @param font: PDFFont object.
+
+        @param fontsize: Font size in text space.
+
+        @param scaling: Horizontal scaling.
+
+        @param rise: Text rise.
+
+        @param cid: Character ID.
+
+        @return: Character's advance in text space.
+        """
+        # Get matrix components
+        a, b, c, d, e, f = matrix
+
+        # Get font size the same way as "LTChar.size"
+        if font.is_vertical():
+            size = abs(font.get_width() * fontsize * a)
+        else:
+            size = abs(font.get_height() * fontsize * d)
+
+        # Round the size
+        size = round(size, 1)
+
+        # Increment character count of the size
+        self.size_char_count_s[size] = self.size_char_count_s.get(size, 0) + 1
+
+        # Get font key
+        font_key = (font.fontname, size)
+
+        # Increment character count of the font
+        self.font_char_count_s[font_key] = \
+            self.font_char_count_s.get(font_key, 0) + 1
+
+        # Add the size to the page's size set
+        self.page_size_s[self.page_num].add(size)
+
+        # If collect text runs
+        if self.collect_runs:
+            #
+            try:
+                # Get character text
+                text = font.to_unichr(cid)
+            # If the character has no unicode mapping
+            except PDFUnicodeNotDefined:
+                # Use empty text
+                text = ''
+
+            # Get the page's text run list
+            run_s = self.page_run_s[self.page_num]
+
+            # Get baseline position
+            y = round(f, 1)
+
+            # If the character continues the last text run
+            if run_s and run_s[-1][1] == y and run_s[-1][2] == size:
+                # Append the text to the last text run
+                run_s[-1][3] += text
+            # If the character begins a new text run
+            else:
+                # Add a new text run
+                run_s.append([round(e, 1), y, size, text])
+
+        # Return character's advance
+        return font.char_width(cid) * fontsize * scaling
+
+
+#
+def scan_text(
+    pdf_file,
+    npages=None,
+    password=None,
+    page_nums=None,
+    collect_runs=False,
+    font_cache=None,
+):
+    """
+    Scan a PDF file's text without layout analysis.
+
+    @param pdf_file: PDF file to parse.
+
+    @param npages: Max number of pages to process. 0 or None means all pages.
+    Default is all pages.
+
+    @param password: PDF file's password.
+
+    @param page_nums: A collection of page numbers to process. Other pages are
+    skipped. None means all pages.
+
+    @param collect_runs: Whether collect text runs. Default is False.
+
+    @param font_cache: See function "fontcache.create_resource_manager".
+
+    @return: TextScanDevice object containing the statistics.
+    """
+    # Create resource manager that caches shared resources.
+    # It shares font objects across documents if font cache is given or
+    # installed.
+    resource_manager = create_resource_manager(font_cache=font_cache)
+
+    # Create text scan device
+    device = TextScanDevice(
+        rsrcmgr=resource_manager,
+        collect_runs=collect_runs,
+    )
+
+    # Create PDFPageInterpreter
+    interpreter = PDFPageInterpreter(resource_manager, device)
+
+    # If page numbers to process are given
+    if page_nums is not None:
+        # Convert to set for fast lookup
+        page_nums = set(page_nums)
+
+    # For each page in the PDF file
+    for page_index, page in enumerate(PDFPage.get_pages(
+        pdf_file,
+        maxpages=npages,
+        password=password if password is not None else '',
+        caching=True,
+        check_extractable=True,
+    )):
+        # Get page number
+        page_num = page_index + 1
+
+        # If the page number is not to process
+        if page_nums is not None and page_num not in page_nums:
+            # Skip the page
+            continue
+
+        # Set device's page number
+        device.page_num = page_num
+
+        # Process the page
+        interpreter.process_page(page)
+
+    # Close the device
+    device.close()
+
+    # Return the device
+    return device
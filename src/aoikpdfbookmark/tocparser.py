@@ -0,0 +1,567 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import re
+
+from .bookmark import format_bookmark_line
+from .pdfparser import StopParsing
+from .pdfparser import parse_pdf
+
+
+# Regex that matches a printed table of contents entry line, e.g.
+# "1.2 Foo ........ 37", "Chapter 3 Bar . . . 120", "Appendix A Baz 301".
+_TOC_ENTRY_RE = re.compile(
+    r'^(?P<title>.*?\S)'
+    r'(?P<leader>\s*(?:[.\u2026\u00b7_]\s*){2,}|\s+)'
+    r'(?P<page>\d{1,5})\s*$',
+    re.UNICODE,
+)
+
+# Regex that matches a dot leader in a TOC entry line
+_DOT_LEADER_RE = re.compile(r'(?:[.\u2026\u00b7_]\s*){2,}', re.UNICODE)
+
+# Regex that matches a section number prefix, e.g. "1.2.3 ".
+_SECTION_NUM_RE = re.compile(r'^(\d+(?:\.\d+)*)\.?\s', re.UNICODE)
+
+# Regex that matches a top level prefix, e.g. "Chapter 3", "Part II".
+_TOP_LEVEL_RE = re.compile(
+    r'^(?:chapter|part|appendix|book)\b', re.UNICODE | re.IGNORECASE)
+
+# Regex that matches characters ignored when comparing titles
+_NON_WORD_RE = re.compile(r'\W+', re.UNICODE)
+
+
+#
+def normalize_title(title):
+    """
+    Normalize a title for comparison.
+
+    @param title: Title text.
+
+    @return: Lowercased title with non-word characters removed.
+    """
+    # Return normalized title
+    return _NON_WORD_RE.sub('', title).lower()
+
+
+#
+def parse_toc_line(line_text):
+    """
+    Parse a printed table of contents entry line.
+
+    @param line_text: Line text.
+
+    @return: A (title, page number, has dot leader) tuple, or None if the line
+    is not a TOC entry line.
+    """
+    # Match TOC entry
+    match = _TOC_ENTRY_RE.match(line_text.strip())
+
+    # If not matched
+    if match is None:
+        # Return None
+        return None
+
+    # Get title.
+    # Replace consecutive white spaces into one space.
+    title = ' '.join(match.group('title').split())
+
+    # If the title has no word character
+    if not normalize_title(title):
+        # Return None
+        return None
+
+    # Get whether the entry has dot leader
+    has_leader = _DOT_LEADER_RE.search(match.group('leader')) is not None
+
+    # Return the tuple
+    return title, int(match.group('page')), has_leader
+
+
+#
+def get_toc_entry_level(title, x0, indent_x0_s):
+    """
+    Get TOC entry's nesting level.
+    Section numbers like "1.2.3" take precedence over indentation.
+
+    @param title: Entry title.
+
+    @param x0: Entry line's left position.
+
+    @param indent_x0_s: Sorted distinct left positions of all entries.
+
+    @return: Zero-based nesting level.
+    """
+    # Match section number prefix
+    match = _SECTION_NUM_RE.match(title)
+
+    # If have section number prefix
+    if match is not None:
+        # Return number of dots in the section number as level
+        return match.group(1).count('.')
+
+    # If have top level prefix
+    if _TOP_LEVEL_RE.match(title):
+        # Return top level
+        return 0
+
+    # Get indentation level.
+    # The level is the number of distinct left positions less than this one.
+    level = 0
+
+    # For each distinct left position
+    for indent_x0 in indent_x0_s:
+        # If the left position is less than this one
+        if indent_x0 < x0:
+            # Increment level
+            level += 1
+
+    # Return indentation level
+    return level
+
+
+#
+def find_toc_entries(
+    pdf_file,
+    scan_npages=30,
+    min_entries=3,
+    password=None,
+):
+    """
+    Find printed table of contents pages among the first pages, and parse
+    their entry lines.
+
+    @param pdf_file: PDF file to parse.
+
+    @param scan_npages: Number of first pages to scan for TOC pages.
+
+    @param min_entries: Min number of entry lines for a page to be considered
+    a TOC page.
+
+    @param password: PDF file's password.
+
+    @return: A (entries, last TOC page number) tuple. Each entry is a dict:
+    {
+        'title': Entry title.
+        'printed_page_num': Printed page number.
+        'level': Zero-based nesting level.
+    }
+    """
+    # A dict that maps page number to a list of (title, printed page number,
+    # x0) tuples
+    page_entry_s = {}
+
+    # A dict that maps page number to number of entries with dot leader
+    page_leader_count_s = {}
+
+    # A dict that maps page number to pending title text of wrapped entry
+    pending_title_s = {}
+
+    # A list of found TOC page numbers
+    toc_page_num_s = []
+
+    # Create textline handler
+    def handler(info):
+        # Get page number
+        page_num = info['page_num']
+
+        # If found TOC pages before and current page is two pages after the
+        # last TOC page, the TOC has ended.
+        if toc_page_num_s and page_num > toc_page_num_s[-1] + 1:
+            # Stop parsing
+            raise StopParsing(finish_page=False)
+
+        # Get line text
+        line_text = info['line_text']
+
+        # Parse TOC entry line
+        entry = parse_toc_line(line_text)
+
+        # Get entry list of the page
+        entry_s = page_entry_s.setdefault(page_num, [])
+
+        # If the line is not a TOC entry line
+        if entry is None:
+            # Keep the text as a possible first part of a wrapped entry
+            pending_title_s[page_num] = ' '.join(line_text.split())
+
+            # Return None
+            return None
+
+        # Get title, page number, whether has dot leader
+        title, printed_page_num, has_leader = entry
+
+        # Get pending title text of wrapped entry
+        pending_title = pending_title_s.pop(page_num, None)
+
+        # If have pending title that starts with section number, and the
+        # entry does not start with section number, the entry is the second
+        # part of a wrapped entry.
+        if pending_title and _SECTION_NUM_RE.match(pending_title) \
+                and not _SECTION_NUM_RE.match(title) \
+                and not _TOP_LEVEL_RE.match(title):
+            # Join the wrapped entry title
+            title = pending_title + ' ' + title
+
+        # Get the line's left position
+        x0 = int(info['line_item'].x0)
+
+        # Add the entry to the page's list
+        entry_s.append((title, printed_page_num, x0))
+
+        # If the entry has dot leader
+        if has_leader:
+            # Increment the page's dot leader count
+            page_leader_count_s[page_num] = \
+                page_leader_count_s.get(page_num, 0) + 1
+
+        # If the page has enough dot leader entries,
+        # or enough entries in total.
+        if page_leader_count_s.get(page_num, 0) >= min_entries \
+                or len(entry_s) >= min_entries * 3:
+            # If the page is not marked as a TOC page yet
+            if not toc_page_num_s or toc_page_num_s[-1] != page_num:
+                # Mark the page as a TOC page
+                toc_page_num_s.append(page_num)
+
+    # Parse the first pages
+    parse_pdf(
+        pdf_file=pdf_file,
+        handler=handler,
+        npages=scan_npages,
+        password=password,
+    )
+
+    # A list of (title, printed page number, x0) tuples in TOC pages
+    raw_entry_s = []
+
+    # For each TOC page number
+    for page_num in toc_page_num_s:
+        # Add the page's entries
+        raw_entry_s.extend(page_entry_s.get(page_num, []))
+
+    # Get sorted distinct left positions.
+    # Positions within 3 points are considered the same.
+    indent_x0_s = []
+
+    # For each left position
+    for x0 in sorted(set(entry[2] for entry in raw_entry_s)):
+        # If the position is not close to the last one
+        if not indent_x0_s or x0 - indent_x0_s[-1] > 3:
+            # Add the position
+            indent_x0_s.append(x0)
+
+    # A list of entry dicts
+    toc_entry_s = []
+
+    # For each raw entry
+    for title, printed_page_num, x0 in raw_entry_s:
+        # Align the left position to the distinct position it is close to
+        for indent_x0 in indent_x0_s:
+            # If close
+            if abs(x0 - indent_x0) <= 3:
+                # Use the distinct position
+                x0 = indent_x0
+
+                # Stop aligning
+                break
+
+        # Add entry dict
+        toc_entry_s.append({
+            'title': title,
+            'printed_page_num': printed_page_num,
+            'level': get_toc_entry_level(title, x0, indent_x0_s),
+        })
+
+    # Get last TOC page number
+    last_toc_page_num = toc_page_num_s[-1] if toc_page_num_s else 0
+
+    # Return the entries and the last TOC page number
+    return toc_entry_s, last_toc_page_num
+
+
+#
+def title_matches_line(norm_title, line_text):
+    """
+    Check whether a textline is the heading of a TOC entry.
+
+    @param norm_title: Normalized entry title.
+
+    @param line_text: Line text.
+
+    @return: True if matches, otherwise False.
+    """
+    # Get normalized line text
+    norm_line = normalize_title(line_text)
+
+    # If the line is empty
+    if not norm_line:
+        # Return False
+        return False
+
+    # If the line starts with the title
+    if norm_line.startswith(norm_title):
+        # Return True
+        return True
+
+    # If the title starts with the line, i.e. the heading is wrapped, and the
+    # line is long enough not to be a coincidence.
+    if norm_title.startswith(norm_line) and len(norm_line) >= 8:
+        # Return True
+        return True
+
+    # Return False
+    return False
+
+
+#
+def find_toc_page_offset(
+    pdf_file,
+    toc_entries,
+    last_toc_page_num,
+    probe_npages=30,
+    password=None,
+):
+    """
+    Find the offset from printed page number to physical page number by
+    looking for the first entry's heading in pages after TOC pages.
+
+    @param pdf_file: PDF file to parse.
+
+    @param toc_entries: TOC entries from "find_toc_entries".
+
+    @param last_toc_page_num: Last TOC page number.
+
+    @param probe_npages: Max number of pages to probe.
+
+    @param password: PDF file's password.
+
+    @return: Page offset, or None if not found.
+    """
+    # If no entries
+    if not toc_entries:
+        # Return None
+        return None
+
+    # Get the first entry
+    entry = toc_entries[0]
+
+    # Get normalized title
+    norm_title = normalize_title(entry['title'])
+
+    # Found physical page numbers
+    found_page_num_s = []
+
+    # Create textline handler
+    def handler(info):
+        # If the line is the first entry's heading
+        if title_matches_line(norm_title, info['line_text']):
+            # Store the page number
+            found_page_num_s.append(info['page_num'])
+
+            # Stop parsing
+            raise StopParsing(finish_page=False)
+
+    # Parse pages after TOC pages
+    parse_pdf(
+        pdf_file=pdf_file,
+        handler=handler,
+        password=password,
+        page_nums=range(
+            last_toc_page_num + 1, last_toc_page_num + 1 + probe_npages),
+    )
+
+    # If not found
+    if not found_page_num_s:
+        # Return None
+        return None
+
+    # Return page offset
+    return found_page_num_s[0] - entry['printed_page_num']
+
+
+#
+def resolve_toc_voffsets(
+    pdf_file,
+    toc_entries,
+    page_offset,
+    npages=None,
+    password=None,
+):
+    """
+    Resolve TOC entries' physical page numbers and vertical offsets by
+    interpreting only the target pages.
+
+    @param pdf_file: PDF file to parse.
+
+    @param toc_entries: TOC entries from "find_toc_entries".
+
+    @param page_offset: Offset from printed page number to physical page
+    number.
+
+    @param npages: Max number of pages to process. 0 or None means all pages.
+
+    @param password: PDF file's password.
+
+    @return: A list of (page number, vertical offset, title, level) tuples.
+    """
+    # A dict that maps page number to a list of (normalized title, entry
+    # index) tuples not resolved yet
+    page_title_s = {}
+
+    # A list of vertical offsets, None means not resolved yet
+    voffset_s = [None] * len(toc_entries)
+
+    # A dict that maps page number to page top
+    page_top_s = {}
+
+    # For each TOC entry
+    for entry_index, entry in enumerate(toc_entries):
+        # Get physical page number
+        page_num = entry['printed_page_num'] + page_offset
+
+        # Add to the page's list
+        page_title_s.setdefault(page_num, []).append(
+            (normalize_title(entry['title']), entry_index))
+
+    # Create textline handler
+    def handler(info):
+        # Get page number
+        page_num = info['page_num']
+
+        # Store page top
+        page_top_s[page_num] = int(info['page_item'].y1)
+
+        # Get not resolved titles of the page
+        title_s = page_title_s.get(page_num)
+
+        # If no title to resolve
+        if not title_s:
+            # Ignore the line
+            return None
+
+        # For each not resolved title
+        for title_index, (norm_title, entry_index) in enumerate(title_s):
+            # If the line is the entry's heading
+            if title_matches_line(norm_title, info['line_text']):
+                # Get first character item from the line item
+                char1 = next(iter(info['line_item']))
+
+                # Store vertical offset
+                voffset_s[entry_index] = int(char1.y1)
+
+                # Remove the title from not resolved list
+                del title_s[title_index]
+
+                # Stop matching
+                break
+
+    # Parse target pages only
+    parse_pdf(
+        pdf_file=pdf_file,
+        handler=handler,
+        npages=npages,
+        password=password,
+        page_nums=list(page_title_s.keys()),
+    )
+
+    # A list of resolved tuples
+    result_s = []
+
+    # For each TOC entry
+    for entry_index, entry in enumerate(toc_entries):
+        # Get physical page number
+        page_num = entry['printed_page_num'] + page_offset
+
+        # If the page is out of range
+        if page_num < 1 or (npages and page_num > npages):
+            # Ignore the entry
+            continue
+
+        # Get vertical offset
+        voffset = voffset_s[entry_index]
+
+        # If the heading is not found in the page
+        if voffset is None:
+            # Use page top.
+            # The page has no textline if its top is not known.
+            voffset = page_top_s.get(page_num, 0)
+
+        # Add the tuple
+        result_s.append((page_num, voffset, entry['title'], entry['level']))
+
+    # Return the list of resolved tuples
+    return result_s
+
+
+#
+def extract_toc_bookmarks(
+    pdf_file,
+    scan_npages=30,
+    page_offset=None,
+    npages=None,
+    password=None,
+):
+    """
+    Generate bookmark lines from the printed table of contents, without
+    layout analysis of the whole document.
+
+    @param pdf_file: PDF file to parse.
+
+    @param scan_npages: Number of first pages to scan for TOC pages.
+
+    @param page_offset: Offset from printed page number to physical page
+    number. None means finding it by looking for the first entry's heading.
+
+    @param npages: Max number of pages to process. 0 or None means all pages.
+
+    @param password: PDF file's password.
+
+    @return: A list of bookmark lines, indented by nesting level.
+    """
+    # Find TOC entries
+    toc_entry_s, last_toc_page_num = find_toc_entries(
+        pdf_file=pdf_file,
+        scan_npages=scan_npages,
+        password=password,
+    )
+
+    # If no TOC entries found
+    if not toc_entry_s:
+        # Return empty list
+        return []
+
+    # If page offset is not given
+    if page_offset is None:
+        # Find page offset
+        page_offset = find_toc_page_offset(
+            pdf_file=pdf_file,
+            toc_entries=toc_entry_s,
+            last_toc_page_num=last_toc_page_num,
+            password=password,
+        )
+
+        # If page offset is not found
+        if page_offset is None:
+            # Assume printed page numbers are physical page numbers
+            page_offset = 0
+
+    # Resolve physical page numbers and vertical offsets
+    result_s = resolve_toc_voffsets(
+        pdf_file=pdf_file,
+        toc_entries=toc_entry_s,
+        page_offset=page_offset,
+        npages=npages,
+        password=password,
+    )
+
+    # Get min level, used as the top level
+    min_level = min(result[3] for result in result_s) if result_s else 0
+
+    # Return bookmark lines
+    return [
+        format_bookmark_line(
+            page_num, voffset, title, level=level - min_level)
+        for page_num, voffset, title, level in result_s
+    ]
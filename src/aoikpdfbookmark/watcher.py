@@ -0,0 +1,270 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import difflib
+import os.path
+import sys
+import time
+import traceback
+
+from .aoikimportutil import load_obj
+from .pdfparser import ParseControl
+from .pdfparser import StopParsing
+
+
+#
+def run_handler(handler, info_s):
+    """
+    Run textline handler over cached textline info dicts.
+
+    @param handler: Textline handler.
+
+    @param info_s: A list of cached textline info dicts.
+
+    @return: A list of bookmark lines generated by the handler.
+    """
+    # A list of bookmark lines
+    bookmark_line_s = []
+
+    # Parse control raised by the handler. None means no control.
+    parse_control = None
+
+    # Page number the parse control is raised at
+    control_page_num = None
+
+    # For each cached textline info dict
+    for info in info_s:
+        # Get page number
+        page_num = info['page_num']
+
+        # If a parse control is raised
+        if parse_control is not None:
+            # If still on the page the parse control is raised at
+            if page_num == control_page_num:
+                # If the parse control says not to finish current page
+                if not parse_control.finish_page:
+                    # Ignore the textline
+                    continue
+            # If the parse control is to stop parsing
+            elif isinstance(parse_control, StopParsing):
+                # Stop running the handler
+                break
+            # If the page is before the page to resume at
+            elif page_num < parse_control.page_num:
+                # Ignore the textline
+                continue
+            # If the page is the page to resume at or after it
+            else:
+                # Clear the parse control
+                parse_control = None
+
+        #
+        try:
+            # Call the handler.
+            # Get result returned.
+            bookmark_line = handler(info)
+        # Catch parse control raised by the handler
+        except ParseControl as exc:
+            # If the parse control is not stopping parsing already set
+            if not isinstance(parse_control, StopParsing):
+                # Store the parse control
+                parse_control = exc
+
+                # Store the page number
+                control_page_num = page_num
+
+            # Continue to next textline
+            continue
+
+        # If the result is not None,
+        # it means it is a bookmark line
+        if bookmark_line is not None:
+            # Add the bookmark line to list
+            bookmark_line_s.append(bookmark_line)
+
+    # Return the list of bookmark lines
+    return bookmark_line_s
+
+
+#
+def diff_bookmark_lines(old_line_s, new_line_s):
+    """
+    Get added and removed bookmark lines between two runs.
+
+    @param old_line_s: Bookmark lines of previous run.
+
+    @param new_line_s: Bookmark lines of current run.
+
+    @return: A list of diff lines. Added lines start with "+ ", removed lines
+    start with "- ".
+    """
+    # A list of diff lines
+    diff_line_s = []
+
+    # Create sequence matcher
+    matcher = difflib.SequenceMatcher(
+        None, old_line_s, new_line_s, autojunk=False)
+
+    # For each change between the two runs
+    for tag, old_beg, old_end, new_beg, new_end in matcher.get_opcodes():
+        # If the range is unchanged
+        if tag == 'equal':
+            # Ignore the range
+            continue
+
+        # For each removed line
+        for line in old_line_s[old_beg:old_end]:
+            # Add diff line
+            diff_line_s.append('- ' + line)
+
+        # For each added line
+        for line in new_line_s[new_beg:new_end]:
+            # Add diff line
+            diff_line_s.append('+ ' + line)
+
+    # Return the list of diff lines
+    return diff_line_s
+
+
+#
+def get_module_mtime(mod_path):
+    """
+    Get module file's modification time.
+
+    @param mod_path: Module file path.
+
+    @return: Modification time, or None if the file not exists.
+    """
+    try:
+        # Return modification time
+        return os.path.getmtime(mod_path)
+    except OSError:
+        # Return None
+        return None
+
+
+#
+def watch_handler(
+    handler_uri,
+    mod_path,
+    mod_name,
+    info_s,
+    bookmark_line_s,
+    interval=0.5,
+    max_rounds=None,
+    output_func=None,
+    log=None,
+):
+    """
+    Watch the module that defines the textline handler. When the module file
+    changes, re-import the module and re-run the handler over cached textline
+    info dicts, then output added and removed bookmark lines.
+
+    @param handler_uri: Textline handler URI, e.g. "gen.py::generate_bookmark".
+
+    @param mod_path: Module file path to watch.
+
+    @param mod_name: Module name to import the module as.
+
+    @param info_s: A list of cached textline info dicts.
+
+    @param bookmark_line_s: Bookmark lines of the initial run.
+
+    @param interval: Polling interval in seconds.
+
+    @param max_rounds: Max number of evaluation rounds. None means forever.
+
+    @param output_func: A function that outputs a text. Default is writing to
+    stdout.
+
+    @param log: DiagnosticLog object in the cached textline info dicts. Its
+    buffered records are written after each round. None means not writing.
+
+    @return: None.
+    """
+    # If output function is not given
+    if output_func is None:
+        # Use a function that writes to stdout
+        def output_func(text):
+            # Write to stdout
+            sys.stdout.write(text)
+
+            # Flush so that each round is shown immediately
+            sys.stdout.flush()
+
+    # Get module file's modification time
+    last_mtime = get_module_mtime(mod_path)
+
+    # Evaluation rounds count
+    round_count = 0
+
+    # Bookmark lines of previous run
+    old_line_s = list(bookmark_line_s)
+
+    # Output message
+    output_func('# Watching {}\n'.format(mod_path))
+
+    # Loop until max rounds reached.
+    # Keyboard interrupt is handled by the upper context.
+    while max_rounds is None or round_count < max_rounds:
+        # Sleep for a while
+        time.sleep(interval)
+
+        # Get module file's modification time
+        mtime = get_module_mtime(mod_path)
+
+        # If the file not exists, or is not changed
+        if mtime is None or mtime == last_mtime:
+            # Wait for next change
+            continue
+
+        # Store the modification time
+        last_mtime = mtime
+
+        # Increment rounds count
+        round_count += 1
+
+        # Get start time
+        start_time = time.time()
+
+        #
+        try:
+            # Re-import the module to get the new handler
+            handler = load_obj(handler_uri, mod_name=mod_name, sys_use=False)
+
+            # Re-run the handler over cached textline info dicts
+            new_line_s = run_handler(handler, info_s)
+
+            # If diagnostics log is given
+            if log is not None:
+                # Write the handler's buffered diagnostics records
+                log.flush()
+        # Catch errors in user's module
+        except Exception:
+            # Output message
+            output_func('# Error\n---\n{}---\n'.format(
+                traceback.format_exc()))
+
+            # Wait for next change
+            continue
+
+        # Get duration
+        duration = time.time() - start_time
+
+        # Get diff lines
+        diff_line_s = diff_bookmark_lines(old_line_s, new_line_s)
+
+        # Output round summary
+        output_func(
+            '# Round {}: {} bookmarks, {} changes, {:.3f}s\n'.format(
+                round_count, len(new_line_s), len(diff_line_s), duration)
+        )
+
+        # If have diff lines
+        if diff_line_s:
+            # Output diff lines
+            output_func('\n'.join(diff_line_s) + '\n')
+
+        # Store bookmark lines for next round
+        old_line_s = new_line_s
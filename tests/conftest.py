@@ -0,0 +1,11 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import os.path
+import sys
+
+
+# Import the package from the source directory without installing it
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
@@ -0,0 +1,287 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import hashlib
+import os
+import os.path
+import shutil
+import tempfile
+import threading
+import unittest
+
+from aoikpdfbookmark.aoikimportutil import compile_code_cached
+from aoikpdfbookmark.aoikimportutil import fetch_http_cached
+from aoikpdfbookmark.aoikimportutil import get_bytecode_cache_tag
+from aoikpdfbookmark.aoikimportutil import import_module_by_http
+
+try:
+    from http.server import BaseHTTPRequestHandler
+    from http.server import HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler
+    from BaseHTTPServer import HTTPServer
+
+
+#
+class _ModuleServer(object):
+    """
+    Local stand-in HTTP server that serves one module file with an ETag, and
+    answers conditional requests with "304 Not Modified".
+    """
+
+    def __init__(self, source):
+        """
+        Initialize object, start serving.
+
+        @param source: Module source bytes.
+
+        @return: None.
+        """
+        # Module source bytes
+        self.source = source
+
+        # A list of (request headers, response status) tuples
+        self.request_s = []
+
+        # Get the server object
+        server = self
+
+        #
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                # Get ETag of current source
+                etag = '"{}"'.format(hashlib.sha1(server.source).hexdigest())
+
+                # Get status, not modified if the client's cached copy is
+                # current
+                status = 304 \
+                    if self.headers.get('If-None-Match') == etag else 200
+
+                # Record the request before responding, so the client sees it
+                # once the response arrives
+                server.request_s.append((dict(self.headers), status))
+
+                # If the client's cached copy is current
+                if status == 304:
+                    # Send not modified
+                    self.send_response(status)
+
+                    self.end_headers()
+                # If the client has no current copy
+                else:
+                    # Send the source
+                    self.send_response(status)
+
+                    self.send_header('ETag', etag)
+
+                    self.send_header(
+                        'Last-Modified', 'Mon, 19 Oct 2026 00:00:00 GMT')
+
+                    self.send_header('Content-Length', len(server.source))
+
+                    self.end_headers()
+
+                    self.wfile.write(server.source)
+
+            def log_message(self, *args):
+                # Be quiet
+                pass
+
+        # Create HTTP server on a free local port
+        self.http_server = HTTPServer(('127.0.0.1', 0), Handler)
+
+        # Get module URI
+        self.uri = 'http://127.0.0.1:{}/mod.py'.format(
+            self.http_server.server_address[1])
+
+        # Serve in a thread
+        self.thread = threading.Thread(target=self.http_server.serve_forever)
+
+        self.thread.daemon = True
+
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop serving, close the port.
+
+        @return: None.
+        """
+        # Stop serving
+        self.http_server.shutdown()
+
+        # Close the port
+        self.http_server.server_close()
+
+        # Wait for the thread to exit
+        self.thread.join()
+
+
+#
+class FetchHttpCachedTest(unittest.TestCase):
+
+    def setUp(self):
+        # Create cache directory
+        self.cache_dir = tempfile.mkdtemp()
+
+        # Start server
+        self.server = _ModuleServer(b'VALUE = 1\n')
+
+        # Whether the server is stopped
+        self.server_is_stopped = False
+
+    def tearDown(self):
+        # If the server is running
+        if not self.server_is_stopped:
+            # Stop server
+            self.server.stop()
+
+        # Remove cache directory
+        shutil.rmtree(self.cache_dir)
+
+    def test_revalidate_and_offline(self):
+        # Get HTTP cache directory
+        http_cache_dir = os.path.join(self.cache_dir, 'http')
+
+        # First fetch downloads the module and stores it
+        self.assertEqual(
+            fetch_http_cached(self.server.uri, http_cache_dir),
+            (b'VALUE = 1\n', False),
+        )
+
+        self.assertEqual(len(os.listdir(http_cache_dir)), 2)
+
+        # Second fetch revalidates, gets 304, and uses the cached source
+        self.assertEqual(
+            fetch_http_cached(self.server.uri, http_cache_dir),
+            (b'VALUE = 1\n', True),
+        )
+
+        # Get the second request's headers and status
+        header_s, status = self.server.request_s[-1]
+
+        self.assertEqual(status, 304)
+
+        self.assertIn('If-None-Match', header_s)
+
+        self.assertIn('If-Modified-Since', header_s)
+
+        # Change the served source
+        self.server.source = b'VALUE = 2\n'
+
+        # Changed source invalidates the cache
+        self.assertEqual(
+            fetch_http_cached(self.server.uri, http_cache_dir),
+            (b'VALUE = 2\n', False),
+        )
+
+        # Import the module, caching its bytecode
+        mod_obj = import_module_by_http(
+            self.server.uri,
+            mod_name='_aoikimportutil_test_mod',
+            sys_use=False,
+            sys_add=False,
+            cache_dir=self.cache_dir,
+        )
+
+        self.assertEqual(mod_obj.VALUE, 2)
+
+        # Bytecode is cached
+        self.assertEqual(
+            len(os.listdir(os.path.join(self.cache_dir, 'bytecode'))), 1)
+
+        # Stop server
+        self.server.stop()
+
+        self.server_is_stopped = True
+
+        # Offline mode uses the cache without the server
+        self.assertEqual(
+            fetch_http_cached(self.server.uri, http_cache_dir, offline=True),
+            (b'VALUE = 2\n', True),
+        )
+
+        mod_obj = import_module_by_http(
+            self.server.uri,
+            mod_name='_aoikimportutil_test_mod',
+            sys_use=False,
+            sys_add=False,
+            cache_dir=self.cache_dir,
+            offline=True,
+        )
+
+        self.assertEqual(mod_obj.VALUE, 2)
+
+        # Offline mode fails for a module not cached
+        with self.assertRaises(IOError):
+            fetch_http_cached(
+                self.server.uri + '?other', http_cache_dir, offline=True)
+
+
+#
+class CompileCodeCachedTest(unittest.TestCase):
+
+    def setUp(self):
+        # Create cache directory
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        # Remove cache directory
+        shutil.rmtree(self.cache_dir)
+
+    def test_bytecode_header_is_checked(self):
+        # Get cached bytecode file path
+        code_file_path = os.path.join(
+            self.cache_dir, 'mod.{}.pyc'.format(get_bytecode_cache_tag()))
+
+        # Compile and cache
+        code_obj = compile_code_cached(
+            'VALUE = 1\n', 'mod.py', cache_dir=self.cache_dir,
+            cache_name='mod')
+
+        self.assertTrue(os.path.isfile(code_file_path))
+
+        # Get namespace of the code
+        namespace = {}
+
+        exec(code_obj, namespace)
+
+        self.assertEqual(namespace['VALUE'], 1)
+
+        # Compile changed code under the same cache name. The cached file's
+        # header has the old code hash, so it is not used.
+        code_obj = compile_code_cached(
+            'VALUE = 2\n', 'mod.py', cache_dir=self.cache_dir,
+            cache_name='mod')
+
+        namespace = {}
+
+        exec(code_obj, namespace)
+
+        self.assertEqual(namespace['VALUE'], 2)
+
+        # Write a file with a foreign header
+        with open(code_file_path, 'wb') as code_file:
+            code_file.write(b'\0' * 64)
+
+        # The foreign file is not used, and is replaced
+        code_obj = compile_code_cached(
+            'VALUE = 2\n', 'mod.py', cache_dir=self.cache_dir,
+            cache_name='mod')
+
+        namespace = {}
+
+        exec(code_obj, namespace)
+
+        self.assertEqual(namespace['VALUE'], 2)
+
+        with open(code_file_path, 'rb') as code_file:
+            self.assertNotEqual(code_file.read(64), b'\0' * 64)
+
+
+# If this module is the main module
+if __name__ == '__main__':
+    # Run tests
+    unittest.main()
@@ -0,0 +1,195 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import io
+import unittest
+
+from aoikpdfbookmark.backends import check_backend_conformance
+from aoikpdfbookmark.backends import get_extraction_backend
+from aoikpdfbookmark.backends import get_extraction_backend_names
+from aoikpdfbookmark.backends import get_line_record
+from aoikpdfbookmark.pdfparser import PdfminerBackend
+
+
+#
+def _create_pdf(page_count=3):
+    """
+    Create a small PDF file with a heading and body lines on each page.
+
+    @param page_count: Number of pages.
+
+    @return: PDF file bytes.
+    """
+    # A list of object bytes. Object number is index plus 1.
+    obj_s = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+
+    # A list of page object numbers
+    page_id_s = []
+
+    # For each page
+    for page_index in range(page_count):
+        # Get content stream
+        content = b'\n'.join([
+            b'BT /F1 18 Tf 72 720 Td (Chapter %d) Tj ET' % (page_index + 1),
+            b'BT /F1 10 Tf 72 680 Td (Body text of page %d) Tj ET'
+            % (page_index + 1),
+            b'BT /F1 10 Tf 72 660 Td (More body text) Tj ET',
+        ])
+
+        # Add content stream object
+        obj_s.append(
+            b'<< /Length %d >>\nstream\n' % len(content)
+            + content + b'\nendstream')
+
+        # Add page object
+        obj_s.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792]'
+            b' /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>'
+            % len(obj_s))
+
+        page_id_s.append(len(obj_s))
+
+    # Set pages object
+    obj_s[1] = b'<< /Type /Pages /Count %d /Kids [%s] >>' % (
+        page_count, b' '.join(b'%d 0 R' % page_id for page_id in page_id_s))
+
+    # Write header
+    data = bytearray(b'%PDF-1.4\n')
+
+    # A list of object offsets
+    offset_s = []
+
+    # For each object
+    for obj_index, obj in enumerate(obj_s):
+        # Store the offset
+        offset_s.append(len(data))
+
+        # Write the object
+        data += b'%d 0 obj\n' % (obj_index + 1) + obj + b'\nendobj\n'
+
+    # Get cross-reference table offset
+    xref_offset = len(data)
+
+    # Write cross-reference table
+    data += b'xref\n0 %d\n0000000000 65535 f \n' % (len(obj_s) + 1)
+
+    for offset in offset_s:
+        data += b'%010d 00000 n \n' % offset
+
+    # Write trailer
+    data += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' \
+        % (len(obj_s) + 1, xref_offset)
+
+    # Return PDF file bytes
+    return bytes(data)
+
+
+#
+def _get_line_records(backend, pdf_data):
+    """
+    Get line records of a PDF file extracted by a backend.
+
+    @param backend: ExtractionBackend object.
+
+    @param pdf_data: PDF file bytes.
+
+    @return: A list of (page number, line record) tuples.
+    """
+    # Return line records
+    return [
+        (page_record.page_num, get_line_record(line_item))
+        for page_record in backend.iter_pages(io.BytesIO(pdf_data))
+        for line_item, _ in page_record.line_s
+    ]
+
+
+#
+class _FilterIgnoringBackend(PdfminerBackend):
+    """
+    Backend that does not respect page filter.
+    """
+
+    def iter_pages(
+        self, pdf_file, npages=None, password=None, page_filter=None
+    ):
+        # Yield page records of all pages
+        return PdfminerBackend.iter_pages(
+            self, pdf_file, npages=npages, password=password)
+
+
+#
+class BackendConformanceTest(unittest.TestCase):
+
+    def test_available_backends_conform(self):
+        # Create PDF file
+        pdf_data = _create_pdf()
+
+        # Get reference line records from pdfminer backend
+        reference_record_s = _get_line_records(PdfminerBackend(), pdf_data)
+
+        # The file's lines are found
+        self.assertEqual(len(reference_record_s), 9)
+
+        # Get available backend names
+        backend_name_s = get_extraction_backend_names()
+
+        self.assertIn(PdfminerBackend.name, backend_name_s)
+
+        # For each available backend
+        for backend_name in backend_name_s:
+            # Get the backend
+            backend = get_extraction_backend(backend_name)
+
+            # The backend follows the interface
+            self.assertEqual(
+                check_backend_conformance(backend, io.BytesIO(pdf_data)), [],
+                backend_name)
+
+            # Get the backend's line records
+            record_s = _get_line_records(backend, pdf_data)
+
+            # Same lines are found
+            self.assertEqual(len(record_s), len(reference_record_s))
+
+            # For each line's records of the backend and pdfminer
+            for (page_num, record), (ref_page_num, ref_record) in zip(
+                record_s, reference_record_s
+            ):
+                # Get the records' texts, font names, sizes, and bboxes
+                text, fontname, size, bbox = record
+
+                ref_text, ref_fontname, ref_size, ref_bbox = ref_record
+
+                # Page, text, and font match
+                self.assertEqual(
+                    (page_num, text, fontname),
+                    (ref_page_num, ref_text, ref_fontname),
+                    backend_name)
+
+                # Size matches
+                self.assertAlmostEqual(size, ref_size, delta=0.01)
+
+                # Bounding box matches within a point
+                for value, ref_value in zip(bbox, ref_bbox):
+                    self.assertAlmostEqual(value, ref_value, delta=1.0)
+
+    def test_page_filter_problem_is_found(self):
+        # Check a backend not respecting page filter
+        problem_s = check_backend_conformance(
+            _FilterIgnoringBackend(), io.BytesIO(_create_pdf()))
+
+        # The problem is found
+        self.assertEqual(len(problem_s), 1)
+
+        self.assertTrue(problem_s[0].startswith('Page filter not respected'))
+
+
+# If this module is the main module
+if __name__ == '__main__':
+    # Run tests
+    unittest.main()
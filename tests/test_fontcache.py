@@ -0,0 +1,114 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import os.path
+import shutil
+import tempfile
+import unittest
+import zlib
+
+from pdfminer.pdftypes import PDFStream
+from pdfminer.psparser import LIT
+
+from aoikpdfbookmark.fontcache import _read_marshal_file
+from aoikpdfbookmark.fontcache import _write_marshal_file
+from aoikpdfbookmark.fontcache import FontCache
+from aoikpdfbookmark.fontcache import get_font_key
+
+
+#
+def _create_font_spec(font_program):
+    """
+    Create spec of a subset font with embedded font program.
+
+    @param font_program: Font program bytes.
+
+    @return: Font spec dict.
+    """
+    # Compress the font program
+    data = zlib.compress(font_program)
+
+    # Create font program stream
+    font_file = PDFStream(
+        {'Filter': LIT('FlateDecode'), 'Length': len(data)}, data)
+
+    # Return font spec
+    return {
+        'Type': LIT('Font'),
+        'Subtype': LIT('TrueType'),
+        'BaseFont': LIT('ABCDEF+Serif'),
+        'FontDescriptor': {'FontFile2': font_file},
+    }
+
+
+#
+class FontCacheTest(unittest.TestCase):
+
+    def test_font_objects_are_bounded(self):
+        # Create font cache keeping two font objects
+        font_cache = FontCache(None, max_fonts=2)
+
+        # Get three fonts
+        font_s = [
+            font_cache.get_font({'Name': name}, object)
+            for name in ('F1', 'F2', 'F3')
+        ]
+
+        # Only two font objects are kept
+        self.assertEqual(len(font_cache.font_s), 2)
+
+        # Recently used font is reused
+        self.assertIs(font_cache.get_font({'Name': 'F3'}, object), font_s[2])
+
+        # Evicted font is created again
+        self.assertIsNot(
+            font_cache.get_font({'Name': 'F1'}, object), font_s[0])
+
+    def test_font_keys_of_decoded_font_programs_differ(self):
+        # Create specs of subsets with the same name and different programs
+        spec_s = [_create_font_spec(b'glyphs A'), _create_font_spec(b'B')]
+
+        # For each spec
+        for spec in spec_s:
+            # Decode the font program, like pdfminer does when creating the
+            # font. Raw data is dropped.
+            spec['FontDescriptor']['FontFile2'].get_data()
+
+        # Keys differ by font program
+        self.assertNotEqual(get_font_key(spec_s[0]), get_font_key(spec_s[1]))
+
+        # Key does not depend on whether the font program is decoded
+        self.assertEqual(
+            get_font_key(spec_s[0]),
+            get_font_key(_create_font_spec(b'glyphs A')),
+        )
+
+    def test_marshal_file_round_trip(self):
+        # Create temporary directory
+        dir_path = tempfile.mkdtemp()
+
+        #
+        try:
+            # Get file path in a sub directory created on write
+            file_path = os.path.join(dir_path, 'cmap', 'a.marshal')
+
+            # Write data
+            _write_marshal_file(file_path, {'CODE2CID': {1: 2}})
+
+            # Data read equals data written
+            self.assertEqual(
+                _read_marshal_file(file_path), {'CODE2CID': {1: 2}})
+
+            # Missing file reads as None
+            self.assertIsNone(
+                _read_marshal_file(os.path.join(dir_path, 'b.marshal')))
+        finally:
+            # Remove temporary directory
+            shutil.rmtree(dir_path)
+
+
+# If this module is the main module
+if __name__ == '__main__':
+    # Run tests
+    unittest.main()
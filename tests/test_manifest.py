@@ -0,0 +1,112 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import hashlib
+import os.path
+import shutil
+import tempfile
+import unittest
+
+from aoikpdfbookmark.manifest import Manifest
+
+
+#
+class ManifestPasswordTest(unittest.TestCase):
+    """
+    Test recording of output passwords in manifest.
+    """
+
+    def setUp(self):
+        # Create temporary directory
+        self.dir_path = tempfile.mkdtemp()
+
+        # Get manifest file path
+        self.manifest_path = os.path.join(self.dir_path, 'manifest.json')
+
+        # Get output file path
+        self.output_path = os.path.join(self.dir_path, 'out.pdf')
+
+        # Create output file
+        with open(self.output_path, 'wb') as output_file:
+            output_file.write(b'%PDF-1.4\n')
+
+    def tearDown(self):
+        # Remove temporary directory
+        shutil.rmtree(self.dir_path)
+
+    def _record(self, password):
+        """
+        Record the output file in a new manifest file, then load it back.
+
+        @param password: Output password.
+
+        @return: Loaded manifest.
+        """
+        # Record the output file
+        manifest = Manifest(self.manifest_path)
+
+        manifest.update(
+            self.output_path, 'in', 'bm', {}, password=password)
+
+        manifest.save()
+
+        # Load the manifest file
+        manifest = Manifest(self.manifest_path)
+
+        manifest.load()
+
+        # Return the manifest
+        return manifest
+
+    def test_password_hash_is_salted(self):
+        # Record the output file twice with the same password
+        entry_1 = dict(
+            self._record('secret').entry_s[self.output_path])
+
+        entry_2 = self._record('secret').entry_s[self.output_path]
+
+        # Read the manifest file
+        with open(self.manifest_path, 'rb') as manifest_file:
+            text = manifest_file.read().decode('utf-8')
+
+        # The password and its unsalted hash are not stored
+        self.assertNotIn('secret', text)
+
+        self.assertNotIn(
+            hashlib.sha1(b'secret').hexdigest(), text)
+
+        # Each record has its own salt, so the hashes differ
+        self.assertNotEqual(entry_1['passwd_salt'], entry_2['passwd_salt'])
+
+        self.assertNotEqual(entry_1['passwd_hash'], entry_2['passwd_hash'])
+
+    def test_password_is_compared(self):
+        # Record the output file with password
+        manifest = self._record('secret')
+
+        # Only the same password is up to date
+        self.assertTrue(manifest.is_up_to_date(
+            self.output_path, 'in', 'bm', {}, password='secret'))
+
+        self.assertFalse(manifest.is_up_to_date(
+            self.output_path, 'in', 'bm', {}, password='other'))
+
+        self.assertFalse(manifest.is_up_to_date(
+            self.output_path, 'in', 'bm', {}))
+
+        # Record the output file without password
+        manifest = self._record(None)
+
+        # Only no password is up to date
+        self.assertTrue(manifest.is_up_to_date(
+            self.output_path, 'in', 'bm', {}))
+
+        self.assertFalse(manifest.is_up_to_date(
+            self.output_path, 'in', 'bm', {}, password='secret'))
+
+
+# If this module is the main module
+if __name__ == '__main__':
+    # Run tests
+    unittest.main()
@@ -0,0 +1,93 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import random
+import unittest
+
+from aoikpdfbookmark.pdfparser import PageLineIndex
+
+
+#
+class _Line(object):
+    """
+    Line item stub with a bounding box.
+    """
+
+    def __init__(self, x0, y0, x1, y1):
+        # Bounding box
+        self.x0, self.y0, self.x1, self.y1 = x0, y0, x1, y1
+
+
+#
+def _get_gap_above_by_scan(line_s, line):
+    """
+    Get vertical gap to the nearest horizontally overlapping line above by
+    scanning all lines.
+
+    @param line_s: Lines.
+
+    @param line: Line to get gap above.
+
+    @return: Gap, or None.
+    """
+    # Get gaps to overlapping lines above
+    gap_s = [
+        other.y0 - line.y1 for other in line_s
+        if other.y0 >= line.y1 and other.x0 < line.x1 and line.x0 < other.x1
+    ]
+
+    # Return the nearest gap
+    return min(gap_s) if gap_s else None
+
+
+#
+class PageLineIndexTest(unittest.TestCase):
+
+    def test_gap_above_matches_scan(self):
+        # Use fixed seed
+        rand = random.Random(0)
+
+        # For each page layout
+        for _ in range(20):
+            # Create lines in two columns with random widths
+            line_s = []
+
+            for _ in range(rand.randint(1, 80)):
+                # Get column's left
+                x0 = rand.choice([50, 320]) + rand.uniform(0, 100)
+
+                # Get line's bottom
+                y0 = rand.uniform(40, 760)
+
+                line_s.append(_Line(
+                    x0, y0, x0 + rand.uniform(2, 400), y0 + 10))
+
+            # Create index
+            index = PageLineIndex(line_s)
+
+            # For each line
+            for line in line_s:
+                # Strip index gives the same gap as scanning
+                self.assertEqual(
+                    index.get_gap_above(line),
+                    _get_gap_above_by_scan(line_s, line),
+                )
+
+    def test_gap_above_without_lines_above(self):
+        # Create index of side by side lines
+        line_s = [_Line(50, 700, 200, 710), _Line(300, 720, 500, 730)]
+
+        index = PageLineIndex(line_s)
+
+        # No overlapping line is above the left line
+        self.assertIsNone(index.get_gap_above(line_s[0]))
+
+        # Gap to any line above if overlapping is not required
+        self.assertEqual(index.get_gap_above(line_s[0], overlap=False), 10)
+
+
+# If this module is the main module
+if __name__ == '__main__':
+    # Run tests
+    unittest.main()
@@ -0,0 +1,83 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import unittest
+
+from aoikpdfbookmark.rules import RuleSet
+
+
+#
+class _Char(object):
+    """
+    Character item stub.
+    """
+
+    def __init__(self, size, y1, fontname):
+        # Font size, top, and font name
+        self.size, self.y1, self.fontname = size, y1, fontname
+
+
+#
+def _create_info(page_num, size, y1, fontname, text):
+    """
+    Create textline info dict of a line with one character item.
+
+    @param page_num: Page number.
+
+    @param size: Font size.
+
+    @param y1: Top.
+
+    @param fontname: Font name.
+
+    @param text: Line text.
+
+    @return: Info dict.
+    """
+    # Return info dict
+    return {
+        'page_num': page_num,
+        'line_item': [_Char(size, y1, fontname)],
+        'line_text': text + '\n',
+    }
+
+
+#
+class RuleSetTest(unittest.TestCase):
+
+    def test_match_page_equals_per_line_matching(self):
+        # Create rules
+        rule_set = RuleSet([
+            {'text': '^Page \\d+$', 'exclude': True},
+            {'min_size': 18, 'level': 0},
+            {'min_size': 14, 'font': 'Bold', 'level': 1},
+            {'pages': [2, 2], 'text': '^Appendix', 'level': 0},
+        ])
+
+        # For each page number
+        for page_num in (1, 2, 3):
+            # Create the page's lines
+            info_s = [
+                _create_info(page_num, 20, 700, 'Times-Bold', 'Chapter'),
+                _create_info(page_num, 14, 650, 'Times-Bold', 'Section'),
+                _create_info(page_num, 14, 600, 'Times-Roman', 'Not bold'),
+                _create_info(page_num, 10, 550, 'Times-Roman', 'Appendix A'),
+                _create_info(page_num, 20, 40, 'Times-Roman', 'Page 1'),
+                _create_info(page_num, 10, 500, 'Times-Roman', 'Body'),
+            ]
+
+            # Page matching gives the same bookmark lines as line matching
+            self.assertEqual(
+                rule_set.match_page(info_s),
+                [line for line in map(rule_set, info_s) if line is not None],
+            )
+
+        # No lines give no bookmark lines
+        self.assertEqual(rule_set.match_page([]), [])
+
+
+# If this module is the main module
+if __name__ == '__main__':
+    # Run tests
+    unittest.main()
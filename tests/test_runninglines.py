@@ -0,0 +1,78 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import unittest
+
+from aoikpdfbookmark.runninglines import RunningLineIndex
+
+
+#
+def _create_index(page_count=8):
+    """
+    Create running line index of a document with a title header and a page
+    number footer on every page, and a numbered chapter heading at the same
+    position on every other page.
+
+    @param page_count: Number of pages.
+
+    @return: RunningLineIndex object.
+    """
+    # Create index with default arguments
+    index = RunningLineIndex()
+
+    # For each page number
+    for page_num in range(1, page_count + 1):
+        # Add title header
+        index.add_line(page_num, 770, 'My Book Title')
+
+        # If the page starts a chapter
+        if page_num % 2 == 1:
+            # Add chapter heading
+            index.add_line(
+                page_num, 720, 'Chapter {} Intro'.format(page_num // 2 + 1))
+
+        # Add page number footer
+        index.add_line(page_num, 40, 'Page {}'.format(page_num))
+
+    # Find running lines
+    index.finish()
+
+    # Return the index
+    return index
+
+
+#
+class RunningLineIndexTest(unittest.TestCase):
+
+    def test_numbered_headings_are_not_running(self):
+        # Create index
+        index = _create_index()
+
+        # For each chapter
+        for chapter_num in range(1, 5):
+            # Chapter headings differing only in numbers are kept
+            self.assertFalse(index.is_running_line(
+                720,
+                'Chapter {} Intro'.format(chapter_num),
+                page_num=chapter_num * 2 - 1,
+            ))
+
+    def test_headers_and_page_numbers_are_running(self):
+        # Create index
+        index = _create_index()
+
+        # Title header recurring with exact text is running
+        self.assertTrue(index.is_running_line(770, 'My Book Title', 3))
+
+        # Footer whose number follows the page number is running
+        self.assertTrue(index.is_running_line(40, 'Page 5', page_num=5))
+
+        # Same footer text on another page does not follow the page number
+        self.assertFalse(index.is_running_line(40, 'Page 5', page_num=6))
+
+
+# If this module is the main module
+if __name__ == '__main__':
+    # Run tests
+    unittest.main()